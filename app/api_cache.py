@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# YouTube Data API v3 quota cost per call
+QUOTA_COSTS = {"/search": 100, "/videos": 1}
+
+
+@dataclass
+class CacheEntry:
+    body: Dict[str, Any]
+    etag: Optional[str]
+    stored_at: float
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT,"
+            " stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "used_at" not in columns:
+            # files written before eviction became LRU
+            self._conn.execute("ALTER TABLE responses ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE responses SET used_at = stored_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return CacheEntry(body=json.loads(row[0]), etag=row[1], stored_at=row[2])
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, etag, stored_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(entry.body, ensure_ascii=False), entry.etag, entry.stored_at, time.time()),
+            )
+            # least recently used first, like MemoryBackend
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY used_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+class ResponseCache:
+    """Per-endpoint TTL cache of YouTube Data API responses.
+
+    Stale entries are kept so endpoints listed in ``revalidate`` can be
+    refreshed with ``If-None-Match`` instead of a full download.
+    """
+
+    def __init__(self, backend, ttls: Dict[str, float], revalidate: frozenset = frozenset()):
+        self.backend = backend
+        self.ttls = ttls
+        self.revalidate = revalidate
+
+    @staticmethod
+    def key(path: str, params: Dict[str, Any]) -> str:
+        raw = json.dumps([path, sorted((k, str(v)) for k, v in params.items())], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self.backend.get(key)
+
+    def is_fresh(self, path: str, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttls.get(path, 0)
+
+    def conditional_headers(self, path: str, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        if entry is not None and entry.etag and path in self.revalidate:
+            return {"If-None-Match": entry.etag}
+        return {}
+
+    def store(self, key: str, body: Dict[str, Any], etag: Optional[str]) -> None:
+        self.backend.set(key, CacheEntry(body=body, etag=etag, stored_at=time.time()))
+
+    def refresh(self, key: str, entry: CacheEntry) -> None:
+        self.store(key, entry.body, entry.etag)
+
+
+@dataclass
+class _EndpointQuota:
+    calls: int = 0
+    cache_hits: int = 0
+    revalidated: int = 0
+    failed: int = 0
+    units_spent: int = 0
+    units_saved: int = 0
+
+
+@dataclass
+class QuotaLedger:
+    endpoints: Dict[str, _EndpointQuota] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def _endpoint(self, path: str) -> _EndpointQuota:
+        return self.endpoints.setdefault(path, _EndpointQuota())
+
+    def spend(self, path: str, revalidated: bool = False, failed: bool = False) -> None:
+        with self._lock:
+            quota = self._endpoint(path)
+            quota.calls += 1
+            quota.units_spent += QUOTA_COSTS.get(path, 1)
+            if revalidated:
+                quota.revalidated += 1
+            if failed:
+                quota.failed += 1
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            quota = self._endpoint(path)
+            quota.cache_hits += 1
+            quota.units_saved += QUOTA_COSTS.get(path, 1)
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {path: dict(vars(quota)) for path, quota in self.endpoints.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.endpoints.clear()
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from .ffmpeg_tools import FFmpegError, decode_pcm, run_ffmpeg, write_wav
+from .media_probe import MediaCache, content_digest
+from .schemas import Segment, Transcript
+from .settings import settings
+from .vad import sound_bounds
+
+logger = logging.getLogger(__name__)
+
+PREP_RATE = 16000
+# codec -> (file extension, ffmpeg encoder args); both are accepted by the Whisper API
+CODECS = {
+    "opus": ("ogg", ["-c:a", "libopus", "-application", "voip"]),
+    "flac": ("flac", ["-c:a", "flac", "-compression_level", "8"]),
+}
+
+
+@dataclass
+class PreparedAudio:
+    path: str
+    # seconds cut from the start; add it back to transcript timestamps
+    offset: float
+    source_bytes: int
+    prepared_bytes: int
+    release: Callable[[], None] = field(default=lambda: None, repr=False)
+
+
+@dataclass
+class PrepStats:
+    files: int = 0
+    cache_hits: int = 0
+    source_bytes: int = 0
+    prepared_bytes: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, audio: PreparedAudio, cached: bool) -> None:
+        with self._lock:
+            self.files += 1
+            self.cache_hits += int(cached)
+            self.source_bytes += audio.source_bytes
+            self.prepared_bytes += audio.prepared_bytes
+
+    def report(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": self.files,
+                "cache_hits": self.cache_hits,
+                "source_bytes": self.source_bytes,
+                "prepared_bytes": self.prepared_bytes,
+                "bytes_saved": self.source_bytes - self.prepared_bytes,
+            }
+
+
+prep_stats = PrepStats()
+
+_cache: Optional[MediaCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_prep_cache() -> Optional[MediaCache]:
+    global _cache
+    if settings.AUDIO_PREP_CACHE_MAX_BYTES <= 0 or not settings.AUDIO_PREP_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = MediaCache(settings.AUDIO_PREP_CACHE_DIR, settings.AUDIO_PREP_CACHE_MAX_BYTES)
+    return _cache
+
+
+def enabled() -> bool:
+    # chunked STT already decodes to 16 kHz mono PCM itself
+    return settings.STT_AUDIO_CODEC in CODECS and not settings.STT_CHUNKED
+
+
+def _cache_key(source: str) -> str:
+    raw = "|".join(
+        [content_digest(source), settings.STT_AUDIO_CODEC, settings.STT_AUDIO_BITRATE, str(settings.STT_TRIM_SILENCE)]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _encode(source: str, dest_dir: str) -> tuple[str, float]:
+    ext, codec_args = CODECS[settings.STT_AUDIO_CODEC]
+    dest = os.path.join(dest_dir, f"audio.{ext}")
+    offset = 0.0
+    if settings.STT_TRIM_SILENCE:
+        samples = decode_pcm(source, PREP_RATE)
+        start, end = sound_bounds(samples, PREP_RATE)
+        offset = start
+        source = os.path.join(dest_dir, "trimmed.wav")
+        write_wav(source, samples[int(start * PREP_RATE): int(end * PREP_RATE)], PREP_RATE)
+    bitrate = ["-b:a", settings.STT_AUDIO_BITRATE] if settings.STT_AUDIO_CODEC == "opus" else []
+    run_ffmpeg(["-y", "-i", source, "-vn", "-ac", "1", "-ar", str(PREP_RATE), *codec_args, *bitrate, dest])
+    if settings.STT_TRIM_SILENCE:
+        os.remove(source)
+    with open(os.path.join(dest_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"file": os.path.basename(dest), "offset": offset}, f)
+    return dest, offset
+
+
+def _load(entry: str) -> tuple[str, float]:
+    with open(os.path.join(entry, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return os.path.join(entry, meta["file"]), meta["offset"]
+
+
+def _prepare(audio_path: str) -> PreparedAudio:
+    source_bytes = os.path.getsize(audio_path)
+    cache = get_prep_cache()
+    cached = False
+    if cache is None:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path, offset = _encode(audio_path, tmpdir)
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        release = lambda: shutil.rmtree(tmpdir, ignore_errors=True)
+    else:
+        key = _cache_key(audio_path)
+        hit = cache.lookup(key)
+        cached = hit is not None
+        if hit is None:
+            staging = cache.staging_dir()
+            try:
+                _encode(audio_path, staging)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            hit = cache.commit(key, staging)
+        entry, release = hit
+        try:
+            path, offset = _load(entry)
+        except BaseException:
+            release()
+            raise
+    audio = PreparedAudio(path, offset, source_bytes, os.path.getsize(path), release)
+    prep_stats.record(audio, cached)
+    logger.info(
+        "Prepared audio for STT%s: %d -> %d bytes, %.2fs trimmed from the start",
+        " (cached)" if cached else "", source_bytes, audio.prepared_bytes, offset,
+    )
+    return audio
+
+
+def _original(audio_path: str) -> PreparedAudio:
+    size = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
+    return PreparedAudio(audio_path, 0.0, size, size)
+
+
+def _prepare_or_original(audio_path: str) -> PreparedAudio:
+    try:
+        return _prepare(audio_path)
+    except FFmpegError as exc:
+        # the original file is still a valid upload, only a bigger one
+        logger.warning("Audio preparation failed, uploading the original: %s", exc)
+        return _original(audio_path)
+
+
+def shift(transcript: Transcript, offset: float) -> Transcript:
+    if not offset:
+        return transcript
+    return Transcript(
+        segments=[
+            Segment(text=s.text, start=s.start + offset, end=s.end + offset) for s in transcript.segments
+        ]
+    )
+
+
+_prep_executor = ThreadPoolExecutor(
+    max_workers=settings.AUDIO_PREP_MAX_WORKERS,
+    thread_name_prefix="audio-prep",
+)
+
+
+@contextmanager
+def prepared(audio_path: str):
+    if not enabled():
+        yield _original(audio_path)
+        return
+    # ffmpeg runs on the bounded pool so concurrent analyses cannot fork
+    # an unbounded number of encoders
+    audio = _prep_executor.submit(_prepare_or_original, audio_path).result()
+    try:
+        yield audio
+    finally:
+        audio.release()
+
+
+def _release_when_done(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().release()
+
+
+@asynccontextmanager
+async def prepared_async(audio_path: str):
+    if not enabled():
+        yield _original(audio_path)
+        return
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_prep_executor, _prepare_or_original, audio_path)
+    try:
+        audio = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_release_when_done)
+        raise
+    try:
+        yield audio
+    finally:
+        audio.release()
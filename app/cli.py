@@ -1,52 +1,105 @@
 import argparse
 import json
-from . import youtube_client, media_probe, stt, vision_shots, llm_scenario, llm_storyboard
-from .schemas import Transcript, Shot, Scenario
+import sys
+from .llm_cache import CACHE_MODES
+from .settings import settings
+
+# command modules are imported inside each command so that e.g. `storyboard`
+# never loads yt-dlp or the Google Cloud client
+
+
+def _print_json(args, value, adapter=None):
+    # pydantic writes the JSON itself in one pass; non-ASCII text stays readable
+    indent = 2 if args.pretty else None
+    if adapter is not None:
+        print(adapter.dump_json(value, indent=indent).decode('utf-8'))
+    else:
+        print(value.model_dump_json(indent=indent))
 
 
 def cmd_search(args):
-    res = youtube_client.search_trending(args.topic, args.n, args.region, args.after, args.shorts)
-    print(json.dumps([c.model_dump() for c in res], ensure_ascii=False, indent=2))
+    from pydantic import TypeAdapter
+
+    from . import trending_index, youtube_client
+    from .schemas import Candidate
+
+    if args.ndjson:
+        for candidate in youtube_client.iter_trending(args.topic, args.n, args.region, args.after, args.shorts):
+            print(candidate.model_dump_json(), flush=True)
+        return
+    res = trending_index.search_trending(args.topic, args.n, args.region, args.after, args.shorts, args.live)
+    _print_json(args, res, TypeAdapter(list[Candidate]))
+
+
+def cmd_refresh_index(args):
+    from . import trending_index
+
+    polled = trending_index.refresh(max_age_seconds=args.max_age)
+    print(json.dumps({'polled': polled}))
 
 
 def cmd_analyze(args):
-    with media_probe.pull_transient(args.video_id) as (audio_path, video_path):
-        transcript = stt.transcribe(audio_path)
-        if video_path:
-            shots, key_objects = vision_shots.detect_shots(video_path)
-        else:
-            shots, key_objects = [], []
-    print(
-        json.dumps(
-            {
-                "transcript": transcript.model_dump(),
-                "shots": [s.model_dump() for s in shots],
-                "key_objects": [ko.model_dump() for ko in key_objects],
-            },
-            ensure_ascii=False,
-            indent=2,
-        )
-    )
+    from . import pipeline
+
+    analysis = pipeline.analyze_video(args.video_id, force_refresh=args.force_refresh)
+    _print_json(args, analysis)
 
 
 def cmd_scenario(args):
-    with media_probe.pull_transient(args.video_id) as (audio_path, video_path):
-        transcript = stt.transcribe(audio_path)
-        shots, _ = vision_shots.detect_shots(video_path) if video_path else ([], [])
-    scn = llm_scenario.make_ru_scenario(transcript, shots, args.topic)
-    print(scn.model_dump_json(indent=2, ensure_ascii=False))
+    from . import llm_scenario, pipeline
+
+    analysis = pipeline.analyze_video(args.video_id, force_refresh=args.force_refresh)
+    scn = llm_scenario.make_ru_scenario(
+        analysis.transcript, analysis.shots, args.topic, cache_mode=args.llm_cache
+    )
+    _print_json(args, scn)
 
 
 def cmd_storyboard(args):
+    from . import llm_storyboard
+    from .schemas import Scenario
+
     with open(args.scenario, 'r', encoding='utf-8') as f:
         scn_data = json.load(f)
     scn = Scenario.model_validate(scn_data)
-    board = llm_storyboard.plan_timeline(scn, args.target)
-    print(board.model_dump_json(indent=2, ensure_ascii=False))
+    board = llm_storyboard.plan_timeline(scn, args.target, cache_mode=args.llm_cache)
+    _print_json(args, board)
+
+
+def _add_llm_cache_flag(parser):
+    parser.add_argument(
+        '--llm-cache',
+        choices=CACHE_MODES,
+        default='use',
+        help='Кэш ответов LLM: use — читать и писать, refresh — перезапросить, bypass — не использовать'
+    )
+
+
+def _run(args):
+    if not getattr(args, 'youtube', False):
+        args.func(args)
+        return
+    from . import youtube_client
+
+    youtube_client.startup()
+    try:
+        args.func(args)
+    finally:
+        youtube_client.shutdown()
 
 
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help='По завершении вывести в stderr JSON-сводку метрик (время этапов, байты, токены, квота)'
+    )
+    parser.add_argument(
+        '--pretty',
+        action='store_true',
+        help='Выводить JSON с отступами (по умолчанию — компактно, одной строкой)'
+    )
     sub = parser.add_subparsers(dest='command')
 
     p_search = sub.add_parser('search')
@@ -66,27 +119,66 @@ def main():
         action='store_false',
         help='Исключить YouTube Shorts из результатов'
     )
-    p_search.set_defaults(func=cmd_search)
+    p_search.add_argument(
+        '--ndjson',
+        action='store_true',
+        help='Выводить кандидатов построчно (NDJSON) по мере получения'
+    )
+    p_search.add_argument(
+        '--live',
+        action='store_true',
+        help='Не отвечать из локального индекса трендов, всегда идти в search.list'
+    )
+    p_search.set_defaults(func=cmd_search, requires=('YOUTUBE_API_KEY',), youtube=True)
+
+    p_refresh = sub.add_parser('refresh-index')
+    p_refresh.add_argument(
+        '--max-age',
+        type=float,
+        default=None,
+        help='Обновлять статистику старше стольких секунд (по умолчанию TRENDING_REFRESH_SECONDS)'
+    )
+    p_refresh.set_defaults(func=cmd_refresh_index, requires=('YOUTUBE_API_KEY',), youtube=True)
 
     p_an = sub.add_parser('analyze')
     p_an.add_argument('--video-id', required=True)
-    p_an.set_defaults(func=cmd_analyze)
+    p_an.add_argument(
+        '--force-refresh',
+        action='store_true',
+        help='Игнорировать сохранённый результат анализа'
+    )
+    p_an.set_defaults(func=cmd_analyze, requires=settings.analysis_requirements())
 
     p_scn = sub.add_parser('scenario')
     p_scn.add_argument('--video-id', required=True)
     p_scn.add_argument('--topic', required=True)
-    p_scn.set_defaults(func=cmd_scenario)
+    p_scn.add_argument(
+        '--force-refresh',
+        action='store_true',
+        help='Игнорировать сохранённый результат анализа'
+    )
+    _add_llm_cache_flag(p_scn)
+    p_scn.set_defaults(func=cmd_scenario, requires=settings.analysis_requirements())
 
     p_sb = sub.add_parser('storyboard')
     p_sb.add_argument('--scenario', required=True)
     p_sb.add_argument('--target', choices=['shorts', 'youtube'], required=True)
-    p_sb.set_defaults(func=cmd_storyboard)
+    _add_llm_cache_flag(p_sb)
+    p_sb.set_defaults(func=cmd_storyboard, requires=('OPENAI_API_KEY',))
 
     args = parser.parse_args()
     if not hasattr(args, 'func'):
         parser.print_help()
         return
-    args.func(args)
+    settings.require(*args.requires)
+    try:
+        _run(args)
+    finally:
+        if args.metrics:
+            from . import metrics
+
+            summary = metrics.registry.summary()
+            print(json.dumps(summary, ensure_ascii=False, indent=2 if args.pretty else None), file=sys.stderr)
 
 
 if __name__ == '__main__':
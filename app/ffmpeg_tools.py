@@ -0,0 +1,53 @@
+import subprocess
+import wave
+from typing import List
+
+import numpy as np
+
+from .settings import settings
+
+
+class FFmpegError(RuntimeError):
+    """Raised when an ffmpeg subprocess exits with an error."""
+
+
+def run_ffmpeg(args: List[str], timeout: float = 300) -> bytes:
+    cmd = [settings.FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", *args]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, timeout=timeout, check=False)
+    except FileNotFoundError as exc:
+        raise FFmpegError(f"ffmpeg binary '{settings.FFMPEG_BIN}' not found") from exc
+    if proc.returncode != 0:
+        raise FFmpegError(proc.stderr.decode("utf-8", errors="replace").strip() or "ffmpeg failed")
+    return proc.stdout
+
+
+def decode_video_frames(path: str, fps: float, width: int, height: int) -> np.ndarray:
+    """Decode ``path`` into an ``(n, height, width, 3)`` uint8 RGB array sampled at ``fps``."""
+    raw = run_ffmpeg(
+        [
+            "-i", path,
+            "-an",
+            "-vf", f"fps={fps},scale={width}:{height}:flags=area",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-",
+        ]
+    )
+    frame_size = width * height * 3
+    count = len(raw) // frame_size
+    return np.frombuffer(raw[: count * frame_size], dtype=np.uint8).reshape(count, height, width, 3)
+
+
+def decode_pcm(path: str, rate: int) -> np.ndarray:
+    """Decode the audio track of ``path`` into mono int16 samples at ``rate`` Hz."""
+    raw = run_ffmpeg(["-i", path, "-vn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "-"])
+    return np.frombuffer(raw[: len(raw) // 2 * 2], dtype=np.int16)
+
+
+def write_wav(path: str, samples: np.ndarray, rate: int) -> None:
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
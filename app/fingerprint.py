@@ -0,0 +1,325 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import metrics
+from .ffmpeg_tools import decode_pcm, decode_video_frames
+from .schemas import AnalysisResult, Segment, Shot, Transcript
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# bump when compute() changes; rows of other versions are never matched
+FINGERPRINT_VERSION = 1
+
+# audio: Haitsma-Kalker style sub-fingerprints, one 32-bit word per frame from
+# the signs of energy differences between 33 bands over 300-2000 Hz
+AUDIO_RATE = 11025
+AUDIO_FRAME = 4096
+AUDIO_HOP = AUDIO_FRAME // 3
+AUDIO_BANDS = 33
+# frames per FFT block, so memory stays around 100 MB however long the track is
+_AUDIO_BLOCK = 1024
+FRAME_SECONDS = AUDIO_HOP / AUDIO_RATE
+# video: 64-bit dHash of a 9x8 grayscale thumbnail, one per second
+VIDEO_FPS = 1.0
+# a candidate needs this many exact sub-fingerprint hits at one offset to be verified
+_MIN_VOTES = 3
+_CANDIDATES = 3
+# silence and clipping produce these words everywhere; they say nothing about the track
+_UNINFORMATIVE = (0, 0xFFFFFFFF)
+
+
+@dataclass
+class Fingerprint:
+    audio: np.ndarray  # uint32 per audio frame
+    frames: np.ndarray  # uint64 per sampled video frame
+    duration: float
+
+
+@dataclass
+class Match:
+    video_id: str
+    # seconds into the matched video where this one starts; negative when
+    # this one starts with material the matched video lacks
+    offset: float
+    audio_similarity: float
+    frame_similarity: Optional[float]
+
+
+def audio_fingerprint(samples: np.ndarray, rate: int = AUDIO_RATE) -> np.ndarray:
+    if len(samples) < AUDIO_FRAME + 2 * AUDIO_HOP:
+        return np.zeros(0, dtype=np.uint32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples.astype(np.float32, copy=False), AUDIO_FRAME)[::AUDIO_HOP]
+    window = np.hanning(AUDIO_FRAME).astype(np.float32)
+    edges = np.geomspace(300, 2000, AUDIO_BANDS + 1) * AUDIO_FRAME / rate
+    band = np.searchsorted(edges, np.arange(AUDIO_FRAME // 2 + 1), side="right") - 1
+    bands = (band[:, None] == np.arange(AUDIO_BANDS)).astype(np.float32)
+    shifts = np.arange(AUDIO_BANDS - 1, dtype=np.uint64)
+    words = []
+    # spectra are computed _AUDIO_BLOCK frames at a time; each word also needs
+    # the frame before it, so consecutive blocks share one frame
+    for start in range(0, len(frames) - 1, _AUDIO_BLOCK):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + _AUDIO_BLOCK + 1] * window, axis=1))
+        spectrum **= 2
+        energy = spectrum @ bands
+        across = energy[:, :-1] - energy[:, 1:]
+        bits = (across[1:] - across[:-1]) > 0
+        words.append((bits.astype(np.uint64) << shifts).sum(axis=1).astype(np.uint32))
+    return np.concatenate(words)
+
+
+def frame_hashes(frames: np.ndarray) -> np.ndarray:
+    """dHash of ``(n, 8, 9, 3)`` RGB thumbnails."""
+    if len(frames) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    gray = frames.astype(np.float32).mean(axis=3)
+    bits = (gray[:, :, 1:] > gray[:, :, :-1]).reshape(len(frames), 64)
+    return (bits.astype(np.uint64) << np.arange(64, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+
+
+def compute(audio_path: str, video_path: Optional[str]) -> Fingerprint:
+    samples = decode_pcm(audio_path, AUDIO_RATE)
+    frames = decode_video_frames(video_path, VIDEO_FPS, 9, 8) if video_path else np.zeros((0, 8, 9, 3), np.uint8)
+    return Fingerprint(audio_fingerprint(samples), frame_hashes(frames), len(samples) / AUDIO_RATE)
+
+
+def _bit_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    if len(a) == 0:
+        return 0.0
+    differing = np.unpackbits(np.bitwise_xor(a, b).view(np.uint8)).sum()
+    return 1.0 - differing / (a.size * a.itemsize * 8)
+
+
+def _overlap(query: np.ndarray, stored: np.ndarray, shift: int):
+    """Aligned slices where ``query[i]`` lines up with ``stored[i + shift]``."""
+    start = max(0, -shift)
+    end = min(len(query), len(stored) - shift)
+    if end <= start:
+        return query[:0], stored[:0]
+    return query[start:end], stored[start + shift:end + shift]
+
+
+class FingerprintIndex:
+    """SQLite index of audio and frame fingerprints for near-duplicate lookup.
+
+    Every audio sub-fingerprint is indexed by value; a query votes for
+    (video, alignment) pairs with exact hits and the best few are verified
+    by bit error rate over the whole overlap, then by frame hashes.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " video_id TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " duration REAL NOT NULL,"
+            " audio BLOB NOT NULL,"
+            " frames BLOB NOT NULL,"
+            " created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS audio_hashes ("
+            " hash INTEGER NOT NULL,"
+            " video_id TEXT NOT NULL,"
+            " position INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS audio_hashes_hash ON audio_hashes (hash);"
+            "CREATE INDEX IF NOT EXISTS audio_hashes_video ON audio_hashes (video_id);"
+        )
+        self._conn.commit()
+
+    def add(self, video_id: str, prints: Fingerprint) -> None:
+        with self._lock:
+            self._delete(video_id)
+            self._conn.execute(
+                "INSERT INTO fingerprints (video_id, version, duration, audio, frames, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, FINGERPRINT_VERSION, prints.duration, prints.audio.tobytes(), prints.frames.tobytes(), time.time()),
+            )
+            self._conn.executemany(
+                "INSERT INTO audio_hashes (hash, video_id, position) VALUES (?, ?, ?)",
+                [
+                    (int(word), video_id, position)
+                    for position, word in enumerate(prints.audio)
+                    if word not in _UNINFORMATIVE
+                ],
+            )
+            for (stale,) in self._conn.execute(
+                "SELECT video_id FROM fingerprints ORDER BY created_at DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+            ).fetchall():
+                self._delete(stale)
+            self._conn.commit()
+
+    def delete(self, video_id: str) -> None:
+        with self._lock:
+            self._delete(video_id)
+            self._conn.commit()
+
+    def _delete(self, video_id: str) -> None:
+        self._conn.execute("DELETE FROM fingerprints WHERE video_id = ?", (video_id,))
+        self._conn.execute("DELETE FROM audio_hashes WHERE video_id = ?", (video_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def _votes(self, video_id: str, audio: np.ndarray) -> Counter:
+        positions: Dict[int, List[int]] = {}
+        for position, word in enumerate(audio.tolist()):
+            if word not in _UNINFORMATIVE:
+                positions.setdefault(word, []).append(position)
+        words = list(positions)
+        votes: Counter = Counter()
+        with self._lock:
+            for i in range(0, len(words), 500):
+                chunk = words[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT hash, video_id, position FROM audio_hashes"
+                    f" WHERE hash IN ({','.join('?' * len(chunk))}) AND video_id != ?",
+                    (*chunk, video_id),
+                ).fetchall()
+                for word, other, stored_position in rows:
+                    for position in positions[word]:
+                        votes[(other, stored_position - position)] += 1
+        return votes
+
+    def _load(self, video_id: str) -> Optional[Fingerprint]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT duration, audio, frames FROM fingerprints WHERE video_id = ? AND version = ?",
+                (video_id, FINGERPRINT_VERSION),
+            ).fetchone()
+        if row is None:
+            return None
+        return Fingerprint(np.frombuffer(row[1], dtype=np.uint32), np.frombuffer(row[2], dtype=np.uint64), row[0])
+
+    def match(
+        self,
+        video_id: str,
+        prints: Fingerprint,
+        threshold: float,
+        frame_threshold: float,
+        min_overlap: float,
+    ) -> Optional[Match]:
+        """Best stored video whose audio matches ``prints`` with a similarity of
+        at least ``threshold`` over ``min_overlap`` of this video, and whose
+        frames (when both have them) match at ``frame_threshold``."""
+        if len(prints.audio) == 0:
+            return None
+        best: Optional[Match] = None
+        for (other, shift), votes in self._votes(video_id, prints.audio).most_common(_CANDIDATES):
+            if votes < _MIN_VOTES:
+                break
+            stored = self._load(other)
+            if stored is None:
+                continue
+            query, aligned = _overlap(prints.audio, stored.audio, shift)
+            if len(query) < min_overlap * len(prints.audio):
+                continue
+            similarity = _bit_similarity(query, aligned)
+            if similarity < threshold or (best is not None and similarity <= best.audio_similarity):
+                continue
+            offset = shift * FRAME_SECONDS
+            frame_similarity = None
+            if len(prints.frames) and len(stored.frames):
+                query_frames, stored_frames = _overlap(prints.frames, stored.frames, round(offset * VIDEO_FPS))
+                frame_similarity = _bit_similarity(query_frames, stored_frames)
+                # the same trending sound under different footage is not a re-upload
+                if frame_similarity < frame_threshold:
+                    continue
+            best = Match(other, offset, similarity, frame_similarity)
+        return best
+
+
+def shift_result(result: AnalysisResult, offset: float, duration: float) -> AnalysisResult:
+    """``result`` of a video that starts ``offset`` seconds into it, cut to ``duration``."""
+
+    def clip(start: float, end: float):
+        start, end = start - offset, end - offset
+        if end <= 0 or start >= duration:
+            return None
+        return max(start, 0.0), min(end, duration)
+
+    segments = []
+    for s in result.transcript.segments:
+        span = clip(s.start, s.end)
+        if span is not None:
+            segments.append(Segment(text=s.text, start=span[0], end=span[1]))
+    shots = []
+    for shot in result.shots:
+        span = clip(shot.start_sec, shot.end_sec)
+        if span is not None:
+            shots.append(Shot(start_sec=span[0], end_sec=span[1]))
+    return AnalysisResult(
+        transcript=Transcript(segments=segments),
+        shots=shots,
+        key_objects=result.key_objects.shifted(-offset, duration),
+    )
+
+
+@dataclass
+class DedupeStats:
+    checked: int = 0
+    duplicates: int = 0
+    errors: int = 0
+    reused_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, match: Optional[Match], duration: float = 0.0) -> None:
+        with self._lock:
+            self.checked += 1
+            if match is not None:
+                self.duplicates += 1
+                self.reused_seconds += duration
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def report(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "errors": self.errors,
+                "hit_rate": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+                "reused_seconds": round(self.reused_seconds, 3),
+            }
+
+
+dedupe_stats = DedupeStats()
+
+
+def _dedupe_samples():
+    report = dedupe_stats.report()
+    yield "dedupe_checks_total", {"result": "duplicate"}, report["duplicates"]
+    yield "dedupe_checks_total", {"result": "unique"}, report["checked"] - report["duplicates"]
+    yield "dedupe_checks_total", {"result": "error"}, report["errors"]
+    yield "dedupe_reused_seconds_total", {}, report["reused_seconds"]
+
+
+metrics.registry.add_collector(_dedupe_samples)
+
+_index: Optional[FingerprintIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_fingerprint_index() -> Optional[FingerprintIndex]:
+    global _index
+    if settings.FINGERPRINT_MATCH_THRESHOLD <= 0 or not settings.FINGERPRINT_INDEX_PATH:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex(settings.FINGERPRINT_INDEX_PATH, settings.RESULT_STORE_MAX_ENTRIES)
+    return _index
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .schemas import Job
+from .settings import settings
+
+JOB_KINDS = ("analyze", "scenario")
+# WAL keeps its index in shared memory, so it only works for processes on one
+# host; the rollback journals work over a network filesystem with file locking.
+JOURNAL_MODES = ("WAL", "DELETE", "TRUNCATE", "PERSIST")
+
+
+class JobQueue:
+    """Durable job queue in a SQLite file shared by API and worker processes.
+
+    Workers claim jobs under a lease; a job whose lease runs out (crashed or
+    stuck worker) becomes claimable again until ``max_attempts`` is spent.
+    Workers on other hosts need a rollback ``journal_mode`` such as DELETE.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 600,
+        max_attempts: int = 3,
+        retry_backoff_seconds: float = 30,
+        journal_mode: str = "WAL",
+    ):
+        journal_mode = journal_mode.upper()
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode '{journal_mode}', expected one of {JOURNAL_MODES}")
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " batch_id TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " max_attempts INTEGER NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " worker TEXT,"
+            " lease_until REAL,"
+            " available_at REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at, created_at)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id)")
+
+    def enqueue_many(self, kind: str, payloads: List[Dict[str, Any]]) -> List[Job]:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}', expected one of {JOB_KINDS}")
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        rows = [
+            (uuid.uuid4().hex, batch_id, kind, json.dumps(payload, ensure_ascii=False), self.max_attempts, now, now, now)
+            for payload in payloads
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO jobs (id, batch_id, kind, payload, status, max_attempts,"
+                    " available_at, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [self.get(row[0]) for row in rows]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row is not None else None
+
+    def list_batch(self, batch_id: str) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at, rowid", (batch_id,)
+            ).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def claim(self, worker: str) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # leases that ran out on their last attempt will never be retried
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired', updated_at = ?"
+                    " WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs"
+                    " WHERE (status = 'queued' AND available_at <= ?)"
+                    " OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY created_at, rowid LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?,"
+                    " lease_until = ?, updated_at = ? WHERE id = ?",
+                    (worker, now + self.lease_seconds, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (now + self.lease_seconds, now, job_id, worker),
+        )
+
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        return self._update(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL, updated_at = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker),
+        )
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET"
+            " status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,"
+            " available_at = ? + ? * attempts,"
+            " error = ?, lease_until = NULL, updated_at = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (now, self.retry_backoff_seconds, error, now, job_id, worker),
+        )
+
+    def _update(self, sql: str, params: tuple) -> bool:
+        # the worker check makes updates from a worker that lost its lease no-ops
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        return cursor.rowcount == 1
+
+
+def _job_from_row(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"],
+        batch_id=row["batch_id"],
+        kind=row["kind"],
+        payload=json.loads(row["payload"]),
+        status=row["status"],
+        attempts=row["attempts"],
+        max_attempts=row["max_attempts"],
+        result=json.loads(row["result"]) if row["result"] is not None else None,
+        error=row["error"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+    )
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(
+                settings.JOB_DB_PATH,
+                lease_seconds=settings.JOB_LEASE_SECONDS,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                retry_backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+                journal_mode=settings.JOB_DB_JOURNAL_MODE,
+            )
+        return _queue
@@ -0,0 +1,88 @@
+import json
+from typing import Any, List, Optional
+
+
+class ArrayItemStream:
+    """Pull finished elements of one top-level array field out of a JSON object
+    that arrives in pieces, e.g. ``{"scenes": [{...}, {...}], ...}`` streamed by an LLM.
+
+    Only complete elements are returned, each exactly once, as soon as their
+    closing brace has been fed. Elements that are not valid JSON are skipped;
+    the caller still sees them in ``text``.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._in_array = False
+        self._in_item = False
+        # a top-level key or array element being captured: the part from
+        # earlier chunks and where it starts in the current one
+        self._parts: List[str] = []
+        self._start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _captured(self, chunk: str, end: int) -> str:
+        self._parts.append(chunk[self._start:end])
+        captured = "".join(self._parts)
+        self._parts = []
+        self._start = None
+        return captured
+
+    def feed(self, chunk: str) -> List[Any]:
+        self._chunks.append(chunk)
+        items: List[Any] = []
+        if self._start is not None:
+            self._start = 0
+        for i, c in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        try:
+                            self._last_string = json.loads(self._captured(chunk, i + 1))
+                        except json.JSONDecodeError:
+                            self._last_string = None
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._start = i
+            elif c == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif c == "," and self._depth == 1:
+                self._key = None
+            elif c in "{[":
+                self._depth += 1
+                if c == "[" and self._depth == 2 and self._key == self.field:
+                    self._in_array = True
+                elif c == "{" and self._in_array and self._depth == 3:
+                    self._in_item = True
+                    self._start = i
+            elif c in "}]":
+                if c == "}" and self._in_array and self._depth == 3 and self._in_item:
+                    self._in_item = False
+                    try:
+                        items.append(json.loads(self._captured(chunk, i + 1)))
+                    except json.JSONDecodeError:
+                        pass
+                elif c == "]" and self._in_array and self._depth == 2:
+                    self._in_array = False
+                self._depth -= 1
+        if self._start is not None:
+            self._parts.append(chunk[self._start:])
+        return items
@@ -0,0 +1,232 @@
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic_core import core_schema
+
+if TYPE_CHECKING:
+    from .schemas import KeyObject, Shot
+
+# schemas.AnalysisResult holds a KeyObjectTable, so KeyObject is imported
+# where it is used rather than at module level
+
+
+class KeyObjectBuilder:
+    """Accumulates label segments straight into columns, interning strings."""
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self.category_sets: List[Tuple[str, ...]] = []
+        self._label_ids: Dict[str, int] = {}
+        self._category_ids: Dict[Tuple[str, ...], int] = {}
+        self._label = array("i")
+        self._categories = array("i")
+        self._start = array("d")
+        self._end = array("d")
+        self._confidence = array("d")
+
+    def add(
+        self,
+        description: str,
+        categories: Sequence[str],
+        start: float,
+        end: float,
+        confidence: Optional[float],
+    ) -> None:
+        categories = tuple(categories)
+        self._label.append(self._label_ids.setdefault(description, len(self._label_ids)))
+        self._categories.append(self._category_ids.setdefault(categories, len(self._category_ids)))
+        if len(self.labels) < len(self._label_ids):
+            self.labels.append(description)
+        if len(self.category_sets) < len(self._category_ids):
+            self.category_sets.append(categories)
+        self._start.append(start)
+        self._end.append(end)
+        self._confidence.append(np.nan if confidence is None else confidence)
+
+    def build(self) -> "KeyObjectTable":
+        return KeyObjectTable(
+            self.labels,
+            self.category_sets,
+            np.frombuffer(self._label, dtype=np.int32).copy(),
+            np.frombuffer(self._categories, dtype=np.int32).copy(),
+            np.frombuffer(self._start, dtype=np.float64).copy(),
+            np.frombuffer(self._end, dtype=np.float64).copy(),
+            np.frombuffer(self._confidence, dtype=np.float64).copy(),
+        )
+
+
+class KeyObjectTable:
+    """Array-backed, read-only sequence of ``KeyObject``.
+
+    Labels and category lists are interned, so a row is five numbers. Models
+    are only built when an item is accessed; serialization writes rows
+    straight from the columns. A missing confidence is stored as NaN.
+    """
+
+    def __init__(
+        self,
+        labels: List[str],
+        category_sets: List[Tuple[str, ...]],
+        label: np.ndarray,
+        categories: np.ndarray,
+        start: np.ndarray,
+        end: np.ndarray,
+        confidence: np.ndarray,
+    ):
+        self.labels = labels
+        self.category_sets = category_sets
+        self.label = label
+        self.categories = categories
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+
+    @classmethod
+    def empty(cls) -> "KeyObjectTable":
+        return KeyObjectBuilder().build()
+
+    @classmethod
+    def from_models(cls, objects: Sequence["KeyObject"]) -> "KeyObjectTable":
+        builder = KeyObjectBuilder()
+        for obj in objects:
+            builder.add(obj.description, obj.categories, obj.start_sec, obj.end_sec, obj.confidence)
+        return builder.build()
+
+    def _take(self, rows: np.ndarray) -> "KeyObjectTable":
+        return KeyObjectTable(
+            self.labels,
+            self.category_sets,
+            self.label[rows],
+            self.categories[rows],
+            self.start[rows],
+            self.end[rows],
+            self.confidence[rows],
+        )
+
+    def __len__(self) -> int:
+        return len(self.label)
+
+    def _confidence_at(self, i: int) -> Optional[float]:
+        value = self.confidence[i]
+        return None if np.isnan(value) else float(value)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {
+            "description": self.labels[self.label[i]],
+            "start_sec": float(self.start[i]),
+            "end_sec": float(self.end[i]),
+            "confidence": self._confidence_at(i),
+            "categories": list(self.category_sets[self.categories[i]]),
+        }
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in range(len(self))]
+
+    def __getitem__(self, i: int) -> "KeyObject":
+        from .schemas import KeyObject
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("key object index out of range")
+        return KeyObject.model_construct(**self.row(i))
+
+    def __iter__(self) -> Iterator["KeyObject"]:
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, KeyObjectTable):
+            return self.rows() == other.rows()
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"KeyObjectTable({len(self)} rows, {len(self.labels)} labels)"
+
+    def above(self, threshold: float) -> "KeyObjectTable":
+        """Drop rows below ``threshold``; rows without a confidence are kept."""
+        keep = np.isnan(self.confidence) | (self.confidence >= threshold)
+        return self._take(np.flatnonzero(keep))
+
+    def merged(self, gap: float = 0.0) -> "KeyObjectTable":
+        """Merge intervals of the same label and categories that overlap or
+        are at most ``gap`` seconds apart, keeping the highest confidence."""
+        if len(self) < 2:
+            return self
+        group = self.label.astype(np.int64) * len(self.category_sets) + self.categories
+        order = np.lexsort((self.start, group))
+        group, start, end = group[order], self.start[order], self.end[order]
+        # shifting every group past the previous one lets a single running
+        # maximum over all rows act as a per-group one
+        rank = np.concatenate(([0], np.cumsum(group[1:] != group[:-1])))
+        shift = rank * (float(end.max()) + gap + 1.0)
+        reach = np.maximum.accumulate(end + shift)
+        first = np.concatenate(([True], start[1:] + shift[1:] > reach[:-1] + gap))
+        heads = np.flatnonzero(first)
+        return KeyObjectTable(
+            self.labels,
+            self.category_sets,
+            self.label[order][heads],
+            self.categories[order][heads],
+            start[heads],
+            np.maximum.reduceat(end, heads),
+            np.fmax.reduceat(self.confidence[order], heads),
+        )
+
+    def shifted(self, delta: float, duration: float) -> "KeyObjectTable":
+        """Move rows by ``delta`` seconds, dropping those outside ``[0, duration]``
+        and clipping the rest to it."""
+        start, end = self.start + delta, self.end + delta
+        rows = np.flatnonzero((end > 0) & (start < duration))
+        return KeyObjectTable(
+            self.labels,
+            self.category_sets,
+            self.label[rows],
+            self.categories[rows],
+            np.clip(start[rows], 0.0, duration),
+            np.clip(end[rows], 0.0, duration),
+            self.confidence[rows],
+        )
+
+    def top_per_shot(self, shots: Sequence["Shot"], k: int) -> "KeyObjectTable":
+        """Keep the ``k`` most confident rows overlapping each shot; rows that
+        overlap no shot are kept as they are."""
+        if k <= 0 or not shots or not len(self):
+            return self
+        score = np.nan_to_num(self.confidence, nan=-1.0)
+        keep = np.zeros(len(self), dtype=bool)
+        covered = np.zeros(len(self), dtype=bool)
+        for shot in shots:
+            inside = np.flatnonzero((self.start < shot.end_sec) & (self.end > shot.start_sec))
+            covered[inside] = True
+            keep[inside[np.argsort(-score[inside], kind="stable")[:k]]] = True
+        return self._take(np.flatnonzero(keep | ~covered))
+
+    def compact(
+        self, shots: Sequence["Shot"], min_confidence: float, per_shot: int, merge_gap: float
+    ) -> "KeyObjectTable":
+        table = self.above(min_confidence).merged(merge_gap).top_per_shot(shots, per_shot)
+        # chronological order reads best in responses and prompts
+        return table._take(np.lexsort((table.label, table.start)))
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        from .schemas import KeyObject
+
+        from_list = core_schema.no_info_after_validator_function(
+            cls.from_models, handler.generate_schema(List[KeyObject])
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_list,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_list]),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda table: table.rows()),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema: core_schema.CoreSchema, handler: Any) -> Dict[str, Any]:
+        from .schemas import KeyObject
+
+        # documented as the list of KeyObject it serializes to, in both modes
+        return handler(core_schema.list_schema(KeyObject.__pydantic_core_schema__))
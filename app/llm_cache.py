@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from . import metrics
+from .settings import settings
+
+# "use" reads and writes the cache, "refresh" skips the read but stores the
+# new result, "bypass" neither reads nor writes
+CACHE_MODES = ("use", "refresh", "bypass")
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class CompletionCache:
+    """Content-addressed cache of validated LLM results.
+
+    A small in-process LRU sits in front of an optional SQLite file so results
+    survive restarts and are shared between the API and workers. Entries older
+    than ``ttl_seconds`` are treated as missing.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        memory_entries: int = 256,
+        disk_entries: int = 10_000,
+        ttl_seconds: float = 7 * 86400,
+    ):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self.path = os.path.abspath(os.path.expanduser(path))
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def key(model: str, messages: list, **params: Any) -> str:
+        raw = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                value, stored_at = hit
+                if now - stored_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM completions WHERE key = ? AND stored_at > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE completions SET used_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM completions WHERE stored_at <= ? OR key IN ("
+                " SELECT key FROM completions ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl_seconds, self.disk_entries),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM completions")
+                self._conn.commit()
+
+    def _remember(self, key: str, value: Dict[str, Any], stored_at: float) -> None:
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[CompletionCache]:
+    global _cache
+    if settings.LLM_CACHE_MAX_ENTRIES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompletionCache(
+                settings.LLM_CACHE_PATH or None,
+                memory_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                disk_entries=settings.LLM_CACHE_DISK_MAX_ENTRIES,
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            )
+    return _cache
+
+
+def lookup(
+    schema: Type[T], model: str, messages: list, mode: str = "use", **params: Any
+) -> Tuple[Optional[str], Optional[T]]:
+    """Return ``(key, result)``; ``key`` is ``None`` when nothing should be stored.
+
+    Call before the retry loop appends correction messages, so the key only
+    covers the original request.
+    """
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+    cache = get_llm_cache()
+    if cache is None or mode == "bypass":
+        return None, None
+    key = cache.key(model, messages, **params)
+    if mode == "refresh":
+        return key, None
+    value = cache.get(key)
+    result = None
+    if value is not None:
+        try:
+            result = schema.model_validate(value)
+        except ValidationError:
+            # written by an older schema, overwrite it with a fresh answer
+            pass
+    metrics.registry.inc("cache_requests_total", cache="llm", result="miss" if result is None else "hit")
+    return key, result
+
+
+def store(key: Optional[str], result: BaseModel) -> None:
+    cache = get_llm_cache()
+    if key is not None and cache is not None:
+        cache.put(key, result.model_dump(mode="json"))
+
+
+async def lookup_async(
+    schema: Type[T], model: str, messages: list, mode: str = "use", **params: Any
+) -> Tuple[Optional[str], Optional[T]]:
+    """``lookup`` in a worker thread, so the SQLite read stays off the event loop."""
+    return await asyncio.to_thread(lookup, schema, model, messages, mode, **params)
+
+
+async def store_async(key: Optional[str], result: BaseModel) -> None:
+    await asyncio.to_thread(store, key, result)
@@ -1,45 +1,153 @@
-import json
-from typing import List
-from openai import OpenAI
+import logging
+import time
+from typing import AsyncIterator, List, Optional, Union
 from pydantic import ValidationError
-from .schemas import Transcript, Shot, Scenario
+from . import llm_cache, metrics, openai_client, prompt_context, schema_repair
+from .json_stream import ArrayItemStream
+from .schemas import Transcript, Shot, Scene, Scenario
 from .settings import settings
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
+
+MODEL = "gpt-5-mini"
+MAX_ATTEMPTS = 2
+COMPLETION_PARAMS = {"temperature": 0, "response_format": {"type": "json_object"}}
+
+client = openai_client.client
+async_client = openai_client.async_client
 
 SYSTEM_PROMPT = (
     "Ты сценарист коротких вирусных видео. Верни STRICT JSON по схеме Scenario. "
-    "Перескажи с локализацией под русскую ЦА 18–35. Без цитирования исходника"
+    "Перескажи с локализацией под русскую ЦА 18–35. Без цитирования исходника. "
+    "Исходник дан таблицей t0|t1|text: шоты (секунды) и речь в них"
 )
 
 
-def make_ru_scenario(transcript: Transcript, shots: List[Shot], topic: str) -> Scenario:
-    messages = [
+def _build_messages(transcript: Transcript, shots: List[Shot], topic: str) -> list[dict]:
+    context, report = prompt_context.build_scenario_context(
+        transcript, shots, topic, settings.SCENARIO_CONTEXT_TOKENS
+    )
+    logger.info(
+        "Scenario context: ~%s tokens raw, ~%s compact (budget %s%s)",
+        report.raw_tokens,
+        report.compact_tokens,
+        report.budget or "unlimited",
+        ", truncated" if report.truncated else "",
+    )
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": json.dumps(
-                {"transcript": transcript.model_dump(), "shots": [s.model_dump() for s in shots], "topic": topic},
-                ensure_ascii=False,
-            ),
-        },
+        {"role": "user", "content": context},
     ]
-    for attempt in range(2):
-        resp = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=messages,
-            temperature=0,
-            response_format={"type": "json_object"},
+
+
+def _parse_scenario(raw: str, messages: list[dict]) -> Scenario | None:
+    result = schema_repair.parse(raw, Scenario)
+    if result.fixes:
+        logger.info("Repaired scenario locally: %s", "; ".join(result.fixes))
+    if result.value is None:
+        # only what the repair stage could not fix goes back to the model
+        messages.append(
+            {
+                "role": "system",
+                "content": f"Validation error: {'; '.join(result.errors)}. Return STRICT JSON matching Scenario schema.",
+            }
         )
-        raw = resp.choices[0].message.content
-        try:
-            data = json.loads(raw)
-            return Scenario.model_validate(data)
-        except (json.JSONDecodeError, ValidationError) as e:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": f"Validation error: {e}. Return STRICT JSON matching Scenario schema.",
-                }
-            )
+    return result.value
+
+
+def _lookup(messages: list[dict], cache_mode: str) -> tuple[Optional[str], Optional[Scenario]]:
+    return llm_cache.lookup(Scenario, MODEL, messages, cache_mode, **COMPLETION_PARAMS)
+
+
+async def _lookup_async(messages: list[dict], cache_mode: str) -> tuple[Optional[str], Optional[Scenario]]:
+    return await llm_cache.lookup_async(Scenario, MODEL, messages, cache_mode, **COMPLETION_PARAMS)
+
+
+def make_ru_scenario(
+    transcript: Transcript, shots: List[Shot], topic: str, cache_mode: str = "use"
+) -> Scenario:
+    messages = _build_messages(transcript, shots, topic)
+    key, cached = _lookup(messages, cache_mode)
+    if cached is not None:
+        return cached
+    for attempt in range(MAX_ATTEMPTS):
+        started = time.perf_counter()
+        resp = client.chat.completions.create(model=MODEL, messages=messages, **COMPLETION_PARAMS)
+        metrics.record_completion("scenario", MODEL, time.perf_counter() - started, getattr(resp, "usage", None))
+        scenario = _parse_scenario(resp.choices[0].message.content, messages)
+        if scenario is not None:
+            llm_cache.store(key, scenario)
+            return scenario
     raise RuntimeError("Failed to create scenario")
+
+
+async def make_ru_scenario_async(
+    transcript: Transcript, shots: List[Shot], topic: str, cache_mode: str = "use"
+) -> Scenario:
+    messages = _build_messages(transcript, shots, topic)
+    key, cached = await _lookup_async(messages, cache_mode)
+    if cached is not None:
+        return cached
+    scenario = await _complete_async(messages, MAX_ATTEMPTS)
+    await llm_cache.store_async(key, scenario)
+    return scenario
+
+
+async def _complete_async(messages: list[dict], attempts: int) -> Scenario:
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        resp = await async_client.chat.completions.create(
+            model=MODEL, messages=messages, **COMPLETION_PARAMS
+        )
+        metrics.record_completion("scenario", MODEL, time.perf_counter() - started, getattr(resp, "usage", None))
+        scenario = _parse_scenario(resp.choices[0].message.content, messages)
+        if scenario is not None:
+            return scenario
+    raise RuntimeError("Failed to create scenario")
+
+
+async def stream_ru_scenario_async(
+    transcript: Transcript, shots: List[Shot], topic: str, cache_mode: str = "use"
+) -> AsyncIterator[Union[Scene, Scenario]]:
+    """Yield each ``Scene`` as soon as the model closes it, then the validated ``Scenario``.
+
+    Streamed scenes are a preview: a scene that is not valid JSON or fails
+    validation is skipped, and if the full answer fails validation the
+    retry's ``Scenario`` is authoritative and may differ from them.
+    """
+    messages = _build_messages(transcript, shots, topic)
+    key, cached = await _lookup_async(messages, cache_mode)
+    if cached is not None:
+        for scene in cached.scenes:
+            yield scene
+        yield cached
+        return
+    started = time.perf_counter()
+    stream = await async_client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **COMPLETION_PARAMS,
+    )
+    scenes = ArrayItemStream("scenes")
+    usage = None
+    async for chunk in stream:
+        if not chunk.choices:
+            # with include_usage the last chunk carries only the token counts
+            usage = getattr(chunk, "usage", None) or usage
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        for item in scenes.feed(delta):
+            try:
+                yield Scene.model_validate(item)
+            except ValidationError:
+                continue
+    metrics.record_completion("scenario", MODEL, time.perf_counter() - started, usage)
+    scenario = _parse_scenario(scenes.text, messages)
+    if scenario is None:
+        scenario = await _complete_async(messages, MAX_ATTEMPTS - 1)
+    await llm_cache.store_async(key, scenario)
+    yield scenario
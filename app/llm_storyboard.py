@@ -1,32 +1,170 @@
+import asyncio
 import json
-from typing import Literal
-from openai import OpenAI
-from pydantic import ValidationError
-from .schemas import Scenario, Storyboard
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from . import llm_cache, metrics, openai_client, schema_repair
+from .schemas import Scene, Scenario, StoryScene, Storyboard
 from .settings import settings
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+MODEL = "gpt-5"
+COMPLETION_PARAMS = {"temperature": 0, "response_format": {"type": "json_object"}}
+WINDOW_ATTEMPTS = 2
+
+client = openai_client.client
+async_client = openai_client.async_client
 
 SYSTEM_PROMPT = (
-    "Ты режиссер монтажа. На основе сценария верни STRICT JSON по схеме Storyboard."
-    " Учитывай темп, b-roll и транзишны."
+    "Ты режиссер монтажа. Тебе дан фрагмент сценария (scenes) и общий контекст ролика."
+    " Верни STRICT JSON {\"scenes\": [StoryScene, ...]} — ровно по одной StoryScene на каждую"
+    " сцену фрагмента в том же порядке. Учитывай темп, b-roll и транзишны;"
+    " transitions — переход к следующей сцене, в том числе к next_scene за пределами фрагмента."
 )
 
 
-def plan_timeline(scn: Scenario, target: Literal["shorts", "youtube"]) -> Storyboard:
-    messages = [
+class WindowPlan(BaseModel):
+    scenes: List[StoryScene]
+
+
+def _windows(scenes: List[Scene]) -> List[range]:
+    size = max(1, settings.STORYBOARD_WINDOW_SCENES)
+    return [range(i, min(i + size, len(scenes))) for i in range(0, len(scenes), size)]
+
+
+def _build_messages(scn: Scenario, target: str, window: range) -> list[dict]:
+    scenes = scn.scenes
+    pacing = {
+        "topic": scn.meta.topic,
+        "target": target,
+        "total_scenes": len(scenes),
+        "total_duration_sec": sum(s.duration_sec for s in scenes),
+        "first_scene_index": window.start,
+        "previous_scene": scenes[window.start - 1].visual_description if window.start > 0 else None,
+        "next_scene": scenes[window.stop].visual_description if window.stop < len(scenes) else None,
+    }
+    payload = {"context": pacing, "scenes": [scenes[i].model_dump() for i in window]}
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": json.dumps({"scenario": scn.model_dump(), "target": target}, ensure_ascii=False)},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
     ]
-    resp = client.chat.completions.create(
-        model="gpt-5",
-        messages=messages,
-        temperature=0,
-        response_format={"type": "json_object"},
+
+
+def _parse_window(raw: str, expected: int) -> WindowPlan:
+    result = schema_repair.parse(raw, WindowPlan)
+    if result.value is None:
+        raise RuntimeError(f"Storyboard validation failed: {'; '.join(result.errors)}")
+    if len(result.value.scenes) != expected:
+        raise RuntimeError(
+            f"Storyboard validation failed: expected {expected} scenes, got {len(result.value.scenes)}"
+        )
+    return result.value
+
+
+def _retry_note(messages: list[dict], error: RuntimeError) -> list[dict]:
+    return messages + [
+        {"role": "system", "content": f"{error}. Return STRICT JSON matching the requested schema."}
+    ]
+
+
+def _read_answer(
+    resp, started: float, messages: list[dict], window: range, attempt: int
+) -> tuple[Optional[WindowPlan], list[dict]]:
+    """The plan in ``resp``, or None and the request for the next attempt;
+    raises once ``WINDOW_ATTEMPTS`` answers failed validation."""
+    metrics.record_completion("storyboard", MODEL, time.perf_counter() - started, getattr(resp, "usage", None))
+    try:
+        return _parse_window(resp.choices[0].message.content, len(window)), messages
+    except RuntimeError as e:
+        if attempt + 1 == WINDOW_ATTEMPTS:
+            raise
+        return None, _retry_note(messages, e)
+
+
+def _plan_window(scn: Scenario, target: str, window: range, cache_mode: str) -> List[StoryScene]:
+    messages = _build_messages(scn, target, window)
+    key, cached = llm_cache.lookup(WindowPlan, MODEL, messages, cache_mode, **COMPLETION_PARAMS)
+    if cached is not None:
+        return cached.scenes
+    request = messages
+    for attempt in range(WINDOW_ATTEMPTS):
+        started = time.perf_counter()
+        resp = client.chat.completions.create(model=MODEL, messages=request, **COMPLETION_PARAMS)
+        plan, request = _read_answer(resp, started, messages, window, attempt)
+        if plan is not None:
+            llm_cache.store(key, plan)
+            return plan.scenes
+
+
+async def _plan_window_async(scn: Scenario, target: str, window: range, cache_mode: str) -> List[StoryScene]:
+    messages = _build_messages(scn, target, window)
+    key, cached = await llm_cache.lookup_async(WindowPlan, MODEL, messages, cache_mode, **COMPLETION_PARAMS)
+    if cached is not None:
+        return cached.scenes
+    request = messages
+    for attempt in range(WINDOW_ATTEMPTS):
+        started = time.perf_counter()
+        resp = await async_client.chat.completions.create(model=MODEL, messages=request, **COMPLETION_PARAMS)
+        plan, request = _read_answer(resp, started, messages, window, attempt)
+        if plan is not None:
+            await llm_cache.store_async(key, plan)
+            return plan.scenes
+
+
+def reconcile(windows: List[List[StoryScene]], target: str) -> Storyboard:
+    """Stitch independently planned windows into one ``Storyboard``.
+
+    Windows only see their neighbours' descriptions, so at each edge a
+    missing transition falls back to the prevailing one and b-roll hints the
+    previous scene already used are dropped.
+    """
+    scenes = [scene for window in windows for scene in window]
+    styles = Counter(s.transitions.strip() for s in scenes if s.transitions.strip())
+    prevailing = styles.most_common(1)[0][0] if styles else "cut"
+    edge = 0
+    for window in windows[:-1]:
+        edge += len(window)
+        last, first = scenes[edge - 1], scenes[edge]
+        if not last.transitions.strip():
+            scenes[edge - 1] = last.model_copy(update={"transitions": prevailing})
+        repeated = set(last.broll_hints)
+        if repeated & set(first.broll_hints):
+            scenes[edge] = first.model_copy(
+                update={"broll_hints": [h for h in first.broll_hints if h not in repeated]}
+            )
+    return Storyboard(
+        scenes=scenes,
+        total_duration_sec=sum(s.duration_sec for s in scenes),
+        target=target,
     )
-    raw = resp.choices[0].message.content
+
+
+def plan_timeline(
+    scn: Scenario, target: Literal["shorts", "youtube"], cache_mode: str = "use"
+) -> Storyboard:
+    windows = _windows(scn.scenes)
+    if len(windows) <= 1:
+        return reconcile([_plan_window(scn, target, w, cache_mode) for w in windows], target)
+    with ThreadPoolExecutor(max_workers=min(settings.STORYBOARD_MAX_WORKERS, len(windows))) as pool:
+        planned = list(pool.map(lambda w: _plan_window(scn, target, w, cache_mode), windows))
+    return reconcile(planned, target)
+
+
+async def plan_timeline_async(
+    scn: Scenario, target: Literal["shorts", "youtube"], cache_mode: str = "use"
+) -> Storyboard:
+    semaphore = asyncio.Semaphore(settings.STORYBOARD_MAX_WORKERS)
+
+    async def _bounded(window: range) -> List[StoryScene]:
+        async with semaphore:
+            return await _plan_window_async(scn, target, window, cache_mode)
+
+    tasks = [asyncio.create_task(_bounded(w)) for w in _windows(scn.scenes)]
     try:
-        data = json.loads(raw)
-        return Storyboard.model_validate(data)
-    except (json.JSONDecodeError, ValidationError) as e:
-        raise RuntimeError(f"Storyboard validation failed: {e}")
+        planned = await asyncio.gather(*tasks)
+    finally:
+        # once one window has failed the storyboard is lost; stop paying for the rest
+        for task in tasks:
+            task.cancel()
+    return reconcile(list(planned), target)
@@ -0,0 +1,81 @@
+from typing import List
+
+import numpy as np
+
+from .ffmpeg_tools import decode_video_frames
+from .schemas import Shot
+from .settings import settings
+
+_HIST_BITS = 3  # bins per channel = 2 ** _HIST_BITS
+_HIST_WEIGHT = 0.6
+_WINDOW_SECONDS = 2.0
+_MAD_FACTOR = 6.0
+_MIN_SCORE = 0.12
+_MIN_SHOT_SECONDS = 0.4
+
+
+def frame_scores(frames: np.ndarray) -> np.ndarray:
+    """Change score in ``[0, 1]`` between every pair of consecutive frames."""
+    count = len(frames)
+    if count < 2:
+        return np.zeros(0, dtype=np.float32)
+    quant = (frames >> (8 - _HIST_BITS)).astype(np.int64)
+    bins = 1 << (3 * _HIST_BITS)
+    index = (quant[..., 0] << (2 * _HIST_BITS)) | (quant[..., 1] << _HIST_BITS) | quant[..., 2]
+    index = index.reshape(count, -1) + (np.arange(count, dtype=np.int64) * bins)[:, None]
+    hist = np.bincount(index.ravel(), minlength=count * bins).reshape(count, bins)
+    hist = hist / hist.sum(axis=1, keepdims=True)
+    hist_distance = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+
+    gray = frames.astype(np.float32).mean(axis=3)
+    pixel_distance = np.abs(np.diff(gray, axis=0)).mean(axis=(1, 2)) / 255.0
+
+    return (_HIST_WEIGHT * hist_distance + (1 - _HIST_WEIGHT) * pixel_distance).astype(np.float32)
+
+
+def adaptive_threshold(scores: np.ndarray, fps: float) -> np.ndarray:
+    """Rolling median + MAD threshold so slow pans and flicker do not read as cuts."""
+    if scores.size == 0:
+        return scores
+    half = max(1, int(_WINDOW_SECONDS * fps / 2))
+    padded = np.pad(scores, half, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half + 1)
+    median = np.median(windows, axis=1)
+    mad = np.median(np.abs(windows - median[:, None]), axis=1)
+    return np.maximum(median + _MAD_FACTOR * mad, _MIN_SCORE)
+
+
+def detect_boundaries(frames: np.ndarray, fps: float) -> List[float]:
+    scores = frame_scores(frames)
+    if scores.size == 0:
+        return []
+    threshold = adaptive_threshold(scores, fps)
+    left = np.concatenate(([-np.inf], scores[:-1]))
+    right = np.concatenate((scores[1:], [-np.inf]))
+    peaks = np.flatnonzero((scores > threshold) & (scores >= left) & (scores > right))
+
+    boundaries: List[float] = []
+    min_gap = _MIN_SHOT_SECONDS * fps
+    last = -np.inf
+    for peak in peaks:
+        # score[i] compares frames i and i + 1, so the new shot starts at i + 1
+        frame = peak + 1
+        if frame - last >= min_gap:
+            boundaries.append(frame / fps)
+            last = frame
+    return boundaries
+
+
+def shots_from_boundaries(boundaries: List[float], duration: float) -> List[Shot]:
+    if duration <= 0:
+        return []
+    edges = [0.0, *[b for b in boundaries if 0.0 < b < duration], duration]
+    return [Shot(start_sec=round(start, 3), end_sec=round(end, 3)) for start, end in zip(edges, edges[1:])]
+
+
+def detect_shots_local(file_path: str) -> List[Shot]:
+    fps = settings.LOCAL_SHOTS_FPS
+    frames = decode_video_frames(
+        file_path, fps, settings.LOCAL_SHOTS_WIDTH, settings.LOCAL_SHOTS_HEIGHT
+    )
+    return shots_from_boundaries(detect_boundaries(frames, fps), len(frames) / fps)
@@ -1,62 +1,234 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List
+
+import orjson
 from fastapi import FastAPI, HTTPException
-from . import youtube_client, media_probe, stt, vision_shots, llm_scenario, llm_storyboard
-from .schemas import Candidate, Transcript, Shot, Scenario, Storyboard, AnalysisResult
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from . import youtube_client, pipeline, fingerprint, llm_cache, llm_scenario, llm_storyboard, metrics, schema_repair, trending_index
+from .jobs import get_job_queue
+from .schemas import Candidate, Transcript, Shot, Scene, Scenario, Storyboard, AnalysisResult, Job, JobBatch
 from .settings import settings
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings.require(
+        'YOUTUBE_API_KEY', 'REGION_CODE', 'DEFAULT_PUBLISHED_AFTER', *settings.analysis_requirements()
+    )
+    youtube_client.startup()
+    refresher = None
+    # opening the index creates its tables; keep that off the event loop
+    index = await asyncio.to_thread(trending_index.get_trending_index)
+    if index is not None and settings.TRENDING_REFRESH_SECONDS > 0:
+        refresher = asyncio.create_task(trending_index.refresh_forever(settings.TRENDING_REFRESH_SECONDS))
+    try:
+        yield
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+        await youtube_client.shutdown_async()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+_CANDIDATES = TypeAdapter(List[Candidate])
+
+
+def _respond(model: BaseModel, status_code: int = 200) -> ORJSONResponse:
+    # the model is already valid: returning a response directly skips FastAPI
+    # re-validating it against response_model and walking it with
+    # jsonable_encoder; response_model still documents the endpoint
+    return ORJSONResponse(model.model_dump(mode="json"), status_code=status_code)
 
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+async def _ndjson_candidates(topic: str, n: int, region: str, published_after: str, shorts: bool):
+    async for candidate in youtube_client.iter_trending_async(topic, n, region, published_after, shorts):
+        yield candidate.model_dump_json() + "\n"
+
+
+def _cache_mode(payload: dict) -> str:
+    mode = payload.get("llm_cache", "use")
+    if mode not in llm_cache.CACHE_MODES:
+        raise HTTPException(400, f"llm_cache must be one of {', '.join(llm_cache.CACHE_MODES)}")
+    return mode
+
+
+@app.get("/quota")
+async def quota():
+    return youtube_client.quota_report()
+
+
+@app.get("/repairs")
+async def repairs():
+    return schema_repair.repair_stats.report()
+
+
+@app.get("/dedupe")
+async def dedupe():
+    return fingerprint.dedupe_stats.report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/search", response_model=list[Candidate])
-def search(payload: dict):
+async def search(payload: dict):
     try:
         topic = payload["topic"]
         n = int(payload.get("n", 5))
         region = payload.get("region", settings.REGION_CODE)
         published_after = payload.get("published_after", settings.DEFAULT_PUBLISHED_AFTER)
         shorts = bool(payload.get("shorts", True))
+        stream = bool(payload.get("stream", False))
+        live = bool(payload.get("live", False))
     except KeyError as e:
         raise HTTPException(400, f"Missing field {e}")
-    return youtube_client.search_trending(topic, n, region, published_after, shorts)
+    if stream:
+        return StreamingResponse(
+            _ndjson_candidates(topic, n, region, published_after, shorts),
+            media_type="application/x-ndjson",
+        )
+    candidates = await trending_index.search_trending_async(topic, n, region, published_after, shorts, live)
+    return ORJSONResponse(_CANDIDATES.dump_python(candidates, mode="json"))
+
+
+async def _analysis(video_id: str, force_refresh: bool) -> AnalysisResult:
+    try:
+        return await pipeline.analyze_video_async(video_id, force_refresh=force_refresh)
+    except pipeline.MissingAudioError as e:
+        raise HTTPException(500, str(e))
 
 
 @app.post("/analyze", response_model=AnalysisResult)
-def analyze(payload: dict) -> AnalysisResult:
+async def analyze(payload: dict):
     video_id = payload.get("video_id")
     if not video_id:
         raise HTTPException(400, "video_id required")
-    with media_probe.pull_transient(video_id) as (audio_path, video_path):
-        if not audio_path:
-            raise HTTPException(500, "Audio not extracted")
-        transcript = stt.transcribe(audio_path)
-        if video_path:
-            shots, key_objects = vision_shots.detect_shots(video_path)
-        else:
-            shots, key_objects = [], []
-    return AnalysisResult(transcript=transcript, shots=shots, key_objects=key_objects)
+    return _respond(await _analysis(video_id, bool(payload.get("force_refresh", False))))
 
 
 @app.post("/scenario", response_model=Scenario)
-def scenario(payload: dict):
+async def scenario(payload: dict):
     video_id = payload.get("video_id")
     topic = payload.get("topic")
     if not video_id or not topic:
         raise HTTPException(400, "video_id and topic required")
-    analysis = analyze({"video_id": video_id})
+    cache_mode = _cache_mode(payload)
+    analysis = await _analysis(video_id, bool(payload.get("force_refresh", False)))
     transcript = analysis.transcript
     shots = analysis.shots
-    return llm_scenario.make_ru_scenario(transcript, shots, topic)
+    return _respond(await llm_scenario.make_ru_scenario_async(transcript, shots, topic, cache_mode))
+
+
+def _ndjson_event(event: str, **fields) -> bytes:
+    return orjson.dumps({"event": event, **fields}) + b"\n"
+
+
+async def _ndjson_scenario(video_id: str, topic: str, force_refresh: bool, cache_mode: str):
+    events: asyncio.Queue = asyncio.Queue()
+    analysis_task = asyncio.create_task(
+        pipeline.analyze_video_async(
+            video_id,
+            force_refresh=force_refresh,
+            on_stage=lambda stage, info: events.put_nowait(_ndjson_event(stage, **info)),
+        )
+    )
+    analysis_task.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while (line := await events.get()) is not None:
+            yield line
+        analysis = analysis_task.result()
+        index = 0
+        async for item in llm_scenario.stream_ru_scenario_async(
+            analysis.transcript, analysis.shots, topic, cache_mode
+        ):
+            if isinstance(item, Scene):
+                yield _ndjson_event("scene", index=index, scene=item.model_dump(mode="json"))
+                index += 1
+            else:
+                yield _ndjson_event("scenario", scenario=item.model_dump(mode="json"))
+    except Exception as e:
+        # the status line is already sent, so failures travel as the last event
+        yield _ndjson_event("error", detail=str(e))
+    finally:
+        analysis_task.cancel()
+
+
+@app.post("/scenario/stream")
+async def scenario_stream(payload: dict):
+    video_id = payload.get("video_id")
+    topic = payload.get("topic")
+    if not video_id or not topic:
+        raise HTTPException(400, "video_id and topic required")
+    return StreamingResponse(
+        _ndjson_scenario(
+            video_id, topic, bool(payload.get("force_refresh", False)), _cache_mode(payload)
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @app.post("/storyboard", response_model=Storyboard)
-def storyboard(payload: dict):
+async def storyboard(payload: dict):
     scenario_data = payload.get("scenario")
     target = payload.get("target")
     if not scenario_data or not target:
         raise HTTPException(400, "scenario and target required")
     scn = Scenario.model_validate(scenario_data)
-    return llm_storyboard.plan_timeline(scn, target)
+    return _respond(await llm_storyboard.plan_timeline_async(scn, target, _cache_mode(payload)))
+
+
+@app.post("/jobs", response_model=JobBatch, status_code=202)
+async def create_jobs(payload: dict):
+    kind = payload.get("kind")
+    force_refresh = bool(payload.get("force_refresh", False))
+    if kind == "analyze":
+        video_ids = payload.get("video_ids")
+        if not video_ids or not isinstance(video_ids, list):
+            raise HTTPException(400, "video_ids required")
+        items = [{"video_id": video_id, "force_refresh": force_refresh} for video_id in video_ids]
+    elif kind == "scenario":
+        requests = payload.get("requests")
+        if not requests or not isinstance(requests, list):
+            raise HTTPException(400, "requests required")
+        if not all(isinstance(r, dict) and r.get("video_id") and r.get("topic") for r in requests):
+            raise HTTPException(400, "each request needs video_id and topic")
+        cache_mode = _cache_mode(payload)
+        items = [
+            {
+                "video_id": r["video_id"],
+                "topic": r["topic"],
+                "force_refresh": force_refresh,
+                "llm_cache": cache_mode,
+            }
+            for r in requests
+        ]
+    else:
+        raise HTTPException(400, "kind must be 'analyze' or 'scenario'")
+    jobs = await asyncio.to_thread(get_job_queue().enqueue_many, kind, items)
+    return _respond(JobBatch(batch_id=jobs[0].batch_id, jobs=jobs), status_code=202)
+
+
+@app.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(404, "job not found")
+    return _respond(job)
+
+
+@app.get("/jobs/batch/{batch_id}", response_model=JobBatch)
+async def get_job_batch(batch_id: str):
+    jobs = await asyncio.to_thread(get_job_queue().list_batch, batch_id)
+    if not jobs:
+        raise HTTPException(404, "batch not found")
+    return _respond(JobBatch(batch_id=batch_id, jobs=jobs))
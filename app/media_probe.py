@@ -1,31 +1,371 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
 import os
 import shutil
 import tempfile
-from contextlib import contextmanager
-import yt_dlp
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Optional, Tuple
+
+from . import metrics
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# "full" mode: one progressive file, trimmed by ffmpeg after the download
+DOWNLOAD_FORMAT = "mp4/bestaudio[ext=m4a]"
+# "sections" mode: only the first max_seconds of two small streams, fetched side by side;
+# speech-grade audio for STT and a <=360p video-only track for shot detection
+AUDIO_FORMAT = "bestaudio[abr<=96][ext=m4a]/worstaudio[ext=m4a]/worstaudio"
+VIDEO_FORMAT = "bestvideo[height<=360][ext=mp4]/bestvideo[height<=360]/worstvideo"
+FETCH_MODES = ("sections", "full")
+
+_STAGING_DIR = ".staging"
+_TRASH_DIR = ".trash"
+_PINS_DIR = ".pins"
+_LOCK_FILE = ".lock"
+_STALE_STAGING_SECONDS = 3600
+# a pin this old is left behind by a crashed process and no longer protects its entry
+_STALE_PIN_SECONDS = 6 * 3600
+
+
+class MediaCache:
+    """Size-bounded LRU cache of downloaded media shared between worker processes.
+
+    Every entry is a directory named after the cache key. Downloads land in a
+    private staging directory and are published with a single ``rename``, so
+    readers never observe a partially written entry.
+
+    ``lookup`` and ``commit`` pin the entry they return until the caller runs
+    the returned release function; eviction skips pinned entries. Pins are
+    files under ``.pins`` and the pin/evict steps hold an ``flock`` on
+    ``.lock``, so this works across processes on one host (not on a cache
+    directory shared over the network).
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, _STAGING_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.root, _TRASH_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.root, _PINS_DIR), exist_ok=True)
+
+    @staticmethod
+    def key(video_id: str, fmt: str, max_seconds: int) -> str:
+        raw = f"{video_id}|{fmt}|{max_seconds}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    @contextmanager
+    def _exclusive(self):
+        # flock is per open file, so this also serializes threads of one process
+        with open(os.path.join(self.root, _LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _pin(self, key: str) -> Callable[[], None]:
+        fd, pin = tempfile.mkstemp(prefix=f"{key}.", dir=os.path.join(self.root, _PINS_DIR))
+        os.close(fd)
+        path = os.path.join(self.root, key)
+
+        def release() -> None:
+            try:
+                # the entry was in use until now, which is what LRU should see
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            try:
+                os.remove(pin)
+            except FileNotFoundError:
+                pass
+
+        return release
+
+    def _pinned(self) -> set:
+        pins_root = os.path.join(self.root, _PINS_DIR)
+        cutoff = time.time() - _STALE_PIN_SECONDS
+        pinned = set()
+        for name in os.listdir(pins_root):
+            path = os.path.join(pins_root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            pinned.add(name.split(".", 1)[0])
+        return pinned
+
+    def lookup(self, key: str) -> Optional[Tuple[str, Callable[[], None]]]:
+        """The entry's path and a function releasing its pin, or None on a miss."""
+        path = os.path.join(self.root, key)
+        with self._exclusive():
+            try:
+                # mtime of the entry directory doubles as its LRU timestamp
+                os.utime(path)
+            except FileNotFoundError:
+                with self._lock:
+                    self.misses += 1
+                return None
+            release = self._pin(key)
+        with self._lock:
+            self.hits += 1
+        return path, release
+
+    def staging_dir(self) -> str:
+        return tempfile.mkdtemp(dir=os.path.join(self.root, _STAGING_DIR))
+
+    def commit(self, key: str, staging_dir: str) -> Tuple[str, Callable[[], None]]:
+        """Publish ``staging_dir`` as ``key``; returns the pinned entry like ``lookup``."""
+        dest = os.path.join(self.root, key)
+        with self._exclusive():
+            try:
+                os.rename(staging_dir, dest)
+            except OSError as exc:
+                if not os.path.isdir(dest):
+                    # not a lost race (EACCES, ENOSPC, ...): use the download uncached
+                    logger.warning("Could not publish cache entry %s: %s", key, exc)
+                    return staging_dir, lambda: shutil.rmtree(staging_dir, ignore_errors=True)
+                # another worker published the same entry first
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                os.utime(dest)
+            release = self._pin(key)
+        self.evict(keep=key)
+        return dest, release
+
+    def entries(self) -> list[tuple[str, float, int]]:
+        result = []
+        for name in os.listdir(self.root):
+            if name in (_STAGING_DIR, _TRASH_DIR, _PINS_DIR, _LOCK_FILE):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                mtime = os.stat(path).st_mtime
+                size = sum(
+                    os.path.getsize(os.path.join(path, fname)) for fname in os.listdir(path)
+                )
+            except FileNotFoundError:
+                continue
+            result.append((name, mtime, size))
+        return result
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        with self._exclusive():
+            pinned = self._pinned()
+            entries = sorted(self.entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            for name, _, size in entries:
+                if total <= self.max_bytes:
+                    break
+                # pinned entries are being read; the cache may run over budget until they are released
+                if name == keep or name in pinned:
+                    continue
+                self._remove(name)
+                total -= size
+        self._sweep_staging()
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, _, size in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _remove(self, name: str) -> None:
+        trash = tempfile.mkdtemp(dir=os.path.join(self.root, _TRASH_DIR))
+        try:
+            os.rename(os.path.join(self.root, name), os.path.join(trash, name))
+        except OSError:
+            pass
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def _sweep_staging(self) -> None:
+        staging_root = os.path.join(self.root, _STAGING_DIR)
+        cutoff = time.time() - _STALE_STAGING_SECONDS
+        for name in os.listdir(staging_root):
+            path = os.path.join(staging_root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+
+def content_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_cache: Optional[MediaCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_media_cache() -> Optional[MediaCache]:
+    global _cache
+    if settings.MEDIA_CACHE_MAX_BYTES <= 0 or not settings.MEDIA_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = MediaCache(settings.MEDIA_CACHE_DIR, settings.MEDIA_CACHE_MAX_BYTES)
+    return _cache
+
+
+def download_format() -> str:
+    """Describes what the active fetch mode downloads; part of the cache key."""
+    if settings.MEDIA_FETCH_MODE == "full":
+        return DOWNLOAD_FORMAT
+    return f"sections:{AUDIO_FORMAT}|{VIDEO_FORMAT}"
+
+
+def _ydl_download(url: str, ydl_opts: dict) -> None:
+    # yt-dlp is slow to import; only commands that actually download pay for it
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({"quiet": True, **ydl_opts}) as ydl:
+        ydl.download([url])
+
+
+def _download_full(url: str, max_seconds: int, dest_dir: str) -> None:
+    _ydl_download(
+        url,
+        {
+            "outtmpl": os.path.join(dest_dir, "%(id)s.%(ext)s"),
+            "format": DOWNLOAD_FORMAT,
+            "postprocessor_args": ["-ss", "0", "-t", str(max_seconds)],
+        },
+    )
+
+
+def _download_sections(url: str, max_seconds: int, dest_dir: str) -> None:
+    from yt_dlp.utils import download_range_func
+
+    common = {"download_ranges": download_range_func(None, [(0, max_seconds)])}
+    if os.sep in settings.FFMPEG_BIN:
+        common["ffmpeg_location"] = settings.FFMPEG_BIN
+    streams = {"audio": AUDIO_FORMAT, "video": VIDEO_FORMAT}
+    with ThreadPoolExecutor(max_workers=len(streams)) as pool:
+        futures = {
+            name: pool.submit(
+                _ydl_download,
+                url,
+                {**common, "format": fmt, "outtmpl": os.path.join(dest_dir, f"{name}.%(ext)s")},
+            )
+            for name, fmt in streams.items()
+        }
+    errors = {name: f.exception() for name, f in futures.items() if f.exception() is not None}
+    if len(errors) == len(streams):
+        raise errors["audio"]
+    for name, exc in errors.items():
+        # one missing stream still leaves a usable (if partial) analysis
+        logger.warning("Could not download the %s stream of %s: %s", name, url, exc)
+
+
+def _download(video_id: str, max_seconds: int, dest_dir: str) -> None:
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    started = time.perf_counter()
+    if settings.MEDIA_FETCH_MODE == "full":
+        _download_full(url, max_seconds, dest_dir)
+    else:
+        _download_sections(url, max_seconds, dest_dir)
+    size = sum(os.path.getsize(os.path.join(dest_dir, f)) for f in os.listdir(dest_dir))
+    metrics.record_bytes("downloaded", "youtube_media", size)
+    logger.info(
+        "Downloaded %s (%s mode, %ss) in %.1fs: %d bytes",
+        video_id, settings.MEDIA_FETCH_MODE, max_seconds, time.perf_counter() - started, size,
+    )
+
+
+def _locate_media(directory: str) -> Tuple[Optional[str], Optional[str]]:
+    audio_path = video_path = None
+    for fname in os.listdir(directory):
+        stem, ext = os.path.splitext(fname)
+        if stem == "audio" or ext == ".m4a":
+            audio_path = os.path.join(directory, fname)
+        elif stem == "video" or ext == ".mp4":
+            video_path = os.path.join(directory, fname)
+    return audio_path, video_path
+
+
+_download_executor = ThreadPoolExecutor(
+    max_workers=settings.DOWNLOAD_MAX_WORKERS,
+    thread_name_prefix="yt-dlp",
+)
+
+
+def _fetch(video_id: str, max_seconds: int) -> Tuple[Optional[str], Optional[str], Callable[[], None]]:
+    cache = get_media_cache()
+    if cache is None:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            _download(video_id, max_seconds, tmpdir)
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        return (*_locate_media(tmpdir), lambda: shutil.rmtree(tmpdir, ignore_errors=True))
+
+    key = cache.key(video_id, download_format(), max_seconds)
+    hit = cache.lookup(key)
+    metrics.registry.inc("cache_requests_total", cache="media", result="miss" if hit is None else "hit")
+    if hit is not None:
+        logger.info("Media cache hit for %s (max_seconds=%s)", video_id, max_seconds)
+        entry, release = hit
+        return (*_locate_media(entry), release)
+
+    staging = cache.staging_dir()
+    try:
+        _download(video_id, max_seconds, staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if _locate_media(staging) == (None, None):
+        # nothing usable was downloaded, do not poison the cache
+        return None, None, lambda: shutil.rmtree(staging, ignore_errors=True)
+    entry, release = cache.commit(key, staging)
+    return (*_locate_media(entry), release)
+
+
+def _release_when_done(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result()[2]()
 
 
 @contextmanager
 def pull_transient(video_id: str, max_seconds: int = 90):
-    tmpdir = tempfile.mkdtemp()
-    url = f"https://www.youtube.com/watch?v={video_id}"
-    outtmpl = os.path.join(tmpdir, f"%(id)s.%(ext)s")
-    ydl_opts = {
-        "quiet": True,
-        "outtmpl": outtmpl,
-        "format": "mp4/bestaudio[ext=m4a]",
-        "postprocessor_args": ["-ss", "0", "-t", str(max_seconds)],
-    }
+    audio_path, video_path, release = _fetch(video_id, max_seconds)
+    try:
+        yield audio_path, video_path
+    finally:
+        release()
+
+
+@asynccontextmanager
+async def pull_transient_async(video_id: str, max_seconds: int = 90):
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_download_executor, _fetch, video_id, max_seconds)
+    try:
+        audio_path, video_path, release = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # the download keeps running in its thread; clean up once it lands
+        future.add_done_callback(_release_when_done)
+        raise
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        files = os.listdir(tmpdir)
-        audio_path = video_path = None
-        for fname in files:
-            if fname.endswith(".m4a"):
-                audio_path = os.path.join(tmpdir, fname)
-            elif fname.endswith(".mp4"):
-                video_path = os.path.join(tmpdir, fname)
         yield audio_path, video_path
     finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
+        release()
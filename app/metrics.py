@@ -0,0 +1,194 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+PREFIX = "storyflow_"
+# seconds; wide enough for a 50 ms API call and a multi-minute annotation
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# name -> (type, help); every recorded metric must be declared here
+METRICS: Dict[str, Tuple[str, str]] = {
+    "stage_seconds": ("histogram", "Duration of a pipeline stage."),
+    "youtube_request_seconds": ("histogram", "Duration of a YouTube Data API request, retries included."),
+    "youtube_requests_total": ("counter", "YouTube Data API responses by status; each spends quota."),
+    "youtube_quota_units_total": ("counter", "YouTube Data API quota units spent."),
+    "youtube_quota_units_saved_total": ("counter", "Quota units saved by the response cache."),
+    "youtube_cache_hits_total": ("counter", "YouTube responses served from the cache."),
+    "youtube_revalidations_total": ("counter", "Cached YouTube responses revalidated with a 304."),
+    "youtube_retries_total": ("counter", "Failed YouTube requests that were retried."),
+    "trending_index_requests_total": ("counter", "Searches answered from the trending index or live."),
+    "dedupe_checks_total": ("counter", "Analyses checked against the fingerprint index, by outcome."),
+    "dedupe_reused_seconds_total": ("counter", "Seconds of media whose analysis was reused from a duplicate."),
+    "bytes_total": ("counter", "Media bytes moved to and from external services."),
+    "openai_tokens_total": ("counter", "OpenAI token usage reported by the API."),
+    "cache_requests_total": ("counter", "Lookups in the local media and LLM caches."),
+    "jobs_total": ("counter", "Queued jobs run by a worker, by kind and result."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+# (metric name, labels, value) reported by a collector at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+
+@dataclass
+class _Histogram:
+    buckets: Tuple[float, ...]
+    counts: List[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    """Process-wide counters and histograms rendered in the Prometheus text format.
+
+    Counters owned by other components (the quota ledger, say) are not
+    duplicated here: they register a collector that reports them at scrape time.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        self._check(name, "counter")
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        self._check(name, "histogram")
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _check(name: str, kind: str) -> None:
+        if METRICS.get(name, (None,))[0] != kind:
+            raise KeyError(f"{name} is not a declared {kind}")
+
+    def _snapshot(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], _Histogram]]:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: _Histogram(h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+        for collector in collectors:
+            for name, labels, value in collector():
+                self._check(name, "counter")
+                key = (name, _labels(labels))
+                counters[key] = counters.get(key, 0) + value
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self._snapshot()
+        lines: List[str] = []
+        for name, (kind, help_text) in METRICS.items():
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{full}{_format(labels)} {_number(value)}")
+                continue
+            for (metric, labels), h in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_format(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{full}_bucket{_format(labels + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{full}_sum{_format(labels)} {_number(h.sum)}")
+                lines.append(f"{full}_count{_format(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """The same data as ``render`` in JSON form, keyed by metric and labels."""
+        counters, histograms = self._snapshot()
+        out: Dict[str, Dict[str, Any]] = {}
+        for (name, labels), value in sorted(counters.items()):
+            out.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+        for (name, labels), h in sorted(histograms.items()):
+            out.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = {
+                "count": h.count,
+                "sum": round(h.sum, 6),
+                "mean": round(h.sum / h.count, 6) if h.count else 0.0,
+            }
+        return out
+
+
+registry = Registry()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    registry.observe("stage_seconds", seconds, stage=stage)
+
+
+def record_completion(stage: str, model: str, seconds: float, usage: Any) -> None:
+    observe_stage(stage, seconds)
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            registry.inc("openai_tokens_total", tokens, model=model, kind=kind)
+
+
+def record_bytes(direction: str, target: str, size: int) -> None:
+    registry.inc("bytes_total", size, direction=direction, target=target)
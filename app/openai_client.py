@@ -0,0 +1,46 @@
+import threading
+from typing import Any, Callable
+
+from .settings import settings
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+
+            _client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        return _client
+
+
+def get_async_client():
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            from openai import AsyncOpenAI
+
+            _async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        return _async_client
+
+
+class LazyClient:
+    """Module-level stand-in for a shared OpenAI client.
+
+    ``openai`` is imported and the client built on first attribute access, so
+    importing a module that talks to OpenAI costs nothing until it does.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._factory(), name)
+
+
+client = LazyClient(get_client)
+async_client = LazyClient(get_async_client)
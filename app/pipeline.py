@@ -0,0 +1,324 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from . import audio_prep, fingerprint, media_probe, metrics, stt, vision_shots
+from .ffmpeg_tools import FFmpegError
+from .key_objects import KeyObjectTable
+from .result_store import ResultStore
+from .schemas import AnalysisResult, Transcript
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MissingAudioError(RuntimeError):
+    """Raised when the downloaded media has no audio track to transcribe."""
+
+
+# bump when the analysis output changes in a way the inputs below do not capture
+ANALYSIS_REVISION = 1
+
+
+@functools.lru_cache(maxsize=1)
+def pipeline_version() -> str:
+    inputs = {
+        "revision": ANALYSIS_REVISION,
+        "download_format": media_probe.download_format(),
+        "stt_model": stt.MODEL,
+        "shot_backend": settings.SHOT_BACKEND,
+        "key_objects": [
+            settings.KEY_OBJECT_MIN_CONFIDENCE,
+            settings.KEY_OBJECTS_PER_SHOT,
+            settings.KEY_OBJECT_MERGE_GAP_SECONDS,
+        ],
+        "video_proxy": [settings.VIDEO_PROXY_HEIGHT, settings.VIDEO_PROXY_FPS],
+        "stt_chunked": settings.STT_CHUNKED,
+        "stt_audio": [settings.STT_AUDIO_CODEC, settings.STT_AUDIO_BITRATE, settings.STT_TRIM_SILENCE],
+        "schema": AnalysisResult.model_json_schema(),
+    }
+    raw = json.dumps(inputs, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+_result_store: Optional[ResultStore] = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    global _result_store
+    if settings.RESULT_STORE_MAX_ENTRIES <= 0 or not settings.RESULT_STORE_PATH:
+        return None
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore(
+                settings.RESULT_STORE_PATH,
+                max_entries=settings.RESULT_STORE_MAX_ENTRIES,
+                max_age_seconds=settings.RESULT_STORE_MAX_AGE_DAYS * 86400,
+            )
+    return _result_store
+
+
+def _stored_result(video_id: str, force_refresh: bool) -> Optional[AnalysisResult]:
+    store = get_result_store()
+    if store is None or force_refresh:
+        return None
+    result = store.get(video_id, pipeline_version())
+    if result is not None:
+        logger.info("Reusing stored analysis for %s", video_id)
+    return result
+
+
+def _store_result(video_id: str, result: AnalysisResult) -> None:
+    store = get_result_store()
+    if store is None:
+        return
+    try:
+        store.put(video_id, pipeline_version(), result)
+    except sqlite3.Error as exc:
+        # the analysis itself succeeded; only its reuse is lost
+        logger.warning("Storing the analysis of %s failed: %s", video_id, exc)
+
+
+def _fingerprint(
+    video_id: str, audio_path: Optional[str], video_path: Optional[str], timings: Dict[str, float]
+) -> Optional[fingerprint.Fingerprint]:
+    """Fingerprint of the pulled media, or None when dedupe is off or it fails."""
+    if not audio_path or fingerprint.get_fingerprint_index() is None or get_result_store() is None:
+        return None
+    try:
+        return _timed("fingerprint", timings, fingerprint.compute, audio_path, video_path)
+    except FFmpegError as exc:
+        fingerprint.dedupe_stats.record_error()
+        logger.warning("Fingerprinting %s failed, analyzing it in full: %s", video_id, exc)
+        return None
+
+
+def _reuse_duplicate(
+    video_id: str, prints: Optional[fingerprint.Fingerprint], force_refresh: bool
+) -> Optional[AnalysisResult]:
+    if prints is None or force_refresh:
+        return None
+    index = fingerprint.get_fingerprint_index()
+    try:
+        match = index.match(
+            video_id,
+            prints,
+            threshold=settings.FINGERPRINT_MATCH_THRESHOLD,
+            frame_threshold=settings.FINGERPRINT_FRAME_THRESHOLD,
+            min_overlap=settings.FINGERPRINT_MIN_OVERLAP,
+        )
+        stored = get_result_store().get(match.video_id, pipeline_version()) if match is not None else None
+        if match is not None and stored is None:
+            # analyzed by another pipeline version or evicted: nothing to reuse
+            index.delete(match.video_id)
+            match = None
+    except sqlite3.Error as exc:
+        fingerprint.dedupe_stats.record_error()
+        logger.warning("Duplicate lookup for %s failed, analyzing it in full: %s", video_id, exc)
+        return None
+    fingerprint.dedupe_stats.record(match, prints.duration)
+    if match is None:
+        return None
+    logger.info(
+        "Reusing analysis of %s for %s (offset %.2fs, audio %.3f, frames %s)",
+        match.video_id,
+        video_id,
+        match.offset,
+        match.audio_similarity,
+        match.frame_similarity,
+    )
+    return fingerprint.shift_result(stored, match.offset, prints.duration)
+
+
+def _remember(video_id: str, prints: Optional[fingerprint.Fingerprint], result: AnalysisResult) -> None:
+    _store_result(video_id, result)
+    if prints is None:
+        return
+    try:
+        fingerprint.get_fingerprint_index().add(video_id, prints)
+    except sqlite3.Error as exc:
+        fingerprint.dedupe_stats.record_error()
+        logger.warning("Indexing the fingerprint of %s failed: %s", video_id, exc)
+
+
+# called on the event loop as stages finish, e.g. on_stage("transcript", {"segments": 12})
+StageCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def _notify(on_stage: Optional[StageCallback], stage: str, **info: Any) -> None:
+    if on_stage is not None:
+        on_stage(stage, info)
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ANALYSIS_MAX_WORKERS,
+    thread_name_prefix="analysis",
+)
+
+
+def _timed(stage: str, timings: Dict[str, float], fn: Callable, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = time.perf_counter() - started
+
+
+async def _timed_async(stage: str, timings: Dict[str, float], awaitable: Awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - started
+
+
+def _no_shots():
+    return [], KeyObjectTable.empty()
+
+
+def _transcribe(audio_path: str) -> Transcript:
+    with audio_prep.prepared(audio_path) as audio:
+        return audio_prep.shift(stt.transcribe(audio.path), audio.offset)
+
+
+async def _transcribe_async(audio_path: str) -> Transcript:
+    async with audio_prep.prepared_async(audio_path) as audio:
+        return audio_prep.shift(await stt.transcribe_async(audio.path), audio.offset)
+
+
+def _report_timings(video_id: str, timings: Dict[str, float]) -> None:
+    logger.info(
+        "Analysis of %s stage timings: %s",
+        video_id,
+        {stage: round(seconds, 3) for stage, seconds in timings.items()},
+    )
+    for stage, seconds in timings.items():
+        metrics.observe_stage("analysis" if stage == "total" else stage, seconds)
+
+
+def analyze_media(
+    audio_path: Optional[str],
+    video_path: Optional[str],
+    timings: Optional[Dict[str, float]] = None,
+) -> AnalysisResult:
+    if not audio_path:
+        raise MissingAudioError("Audio not extracted")
+    timings = {} if timings is None else timings
+    transcript_future: Future = _executor.submit(
+        _timed, "transcribe", timings, _transcribe, audio_path
+    )
+    if video_path:
+        shots_future: Future = _executor.submit(
+            _timed, "detect_shots", timings, vision_shots.detect_shots, video_path
+        )
+    else:
+        shots_future = _executor.submit(_no_shots)
+    # both stages read files owned by the caller, so never return before
+    # they have settled; errors surface in the same order as the old
+    # sequential pipeline (transcription first)
+    wait([transcript_future, shots_future])
+    transcript = transcript_future.result()
+    shots, key_objects = shots_future.result()
+    return AnalysisResult(transcript=transcript, shots=shots, key_objects=key_objects)
+
+
+def analyze_video(
+    video_id: str,
+    timings: Optional[Dict[str, float]] = None,
+    force_refresh: bool = False,
+) -> AnalysisResult:
+    stored = _stored_result(video_id, force_refresh)
+    if stored is not None:
+        return stored
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    try:
+        with media_probe.pull_transient(video_id) as (audio_path, video_path):
+            timings["download"] = time.perf_counter() - started
+            prints = _fingerprint(video_id, audio_path, video_path, timings)
+            result = _reuse_duplicate(video_id, prints, force_refresh)
+            if result is None:
+                result = analyze_media(audio_path, video_path, timings)
+        _remember(video_id, prints, result)
+        return result
+    finally:
+        timings["total"] = time.perf_counter() - started
+        _report_timings(video_id, timings)
+
+
+async def analyze_media_async(
+    audio_path: Optional[str],
+    video_path: Optional[str],
+    timings: Optional[Dict[str, float]] = None,
+    on_stage: Optional[StageCallback] = None,
+) -> AnalysisResult:
+    if not audio_path:
+        raise MissingAudioError("Audio not extracted")
+    timings = {} if timings is None else timings
+    loop = asyncio.get_running_loop()
+
+    async def transcript_stage():
+        transcript = await _timed_async("transcribe", timings, _transcribe_async(audio_path))
+        _notify(on_stage, "transcript", segments=len(transcript.segments))
+        return transcript
+
+    async def shots_stage():
+        if video_path:
+            # the Video Intelligence client is blocking gRPC, keep it off the event loop
+            outcome = await loop.run_in_executor(
+                _executor, _timed, "detect_shots", timings, vision_shots.detect_shots, video_path
+            )
+        else:
+            outcome = _no_shots()
+        _notify(on_stage, "shots", shots=len(outcome[0]))
+        return outcome
+
+    transcript, shots_outcome = await asyncio.gather(
+        transcript_stage(), shots_stage(), return_exceptions=True
+    )
+    for outcome in (transcript, shots_outcome):
+        if isinstance(outcome, BaseException):
+            raise outcome
+    shots, key_objects = shots_outcome
+    return AnalysisResult(transcript=transcript, shots=shots, key_objects=key_objects)
+
+
+async def analyze_video_async(
+    video_id: str,
+    timings: Optional[Dict[str, float]] = None,
+    force_refresh: bool = False,
+    on_stage: Optional[StageCallback] = None,
+) -> AnalysisResult:
+    stored = await asyncio.to_thread(_stored_result, video_id, force_refresh)
+    if stored is not None:
+        _notify(on_stage, "transcript", segments=len(stored.transcript.segments), cached=True)
+        _notify(on_stage, "shots", shots=len(stored.shots), cached=True)
+        return stored
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    try:
+        async with media_probe.pull_transient_async(video_id) as (audio_path, video_path):
+            timings["download"] = time.perf_counter() - started
+            _notify(on_stage, "downloaded", audio=bool(audio_path), video=bool(video_path))
+            prints = await asyncio.get_running_loop().run_in_executor(
+                _executor, _fingerprint, video_id, audio_path, video_path, timings
+            )
+            result = await asyncio.to_thread(_reuse_duplicate, video_id, prints, force_refresh)
+            if result is not None:
+                _notify(on_stage, "transcript", segments=len(result.transcript.segments), cached=True)
+                _notify(on_stage, "shots", shots=len(result.shots), cached=True)
+            else:
+                result = await analyze_media_async(audio_path, video_path, timings, on_stage)
+        await asyncio.to_thread(_remember, video_id, prints, result)
+        return result
+    finally:
+        timings["total"] = time.perf_counter() - started
+        _report_timings(video_id, timings)
@@ -0,0 +1,147 @@
+import bisect
+import json
+import math
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from .schemas import Shot, Transcript
+
+# segments closer than this (and not inside a shot) are joined into one row
+MERGE_GAP_SEC = 0.5
+MAX_MERGED_SEC = 10.0
+# below this many characters per row, rows are merged instead of cut further
+MIN_ROW_CHARS = 60
+ELLIPSIS = "…"
+
+
+@dataclass
+class Row:
+    start: float
+    end: float
+    text: str
+
+
+@dataclass
+class ContextReport:
+    raw_tokens: int
+    compact_tokens: int
+    budget: int
+    truncated: bool
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count: about four UTF-8 bytes per token.
+
+    That is one token per ~4 Latin or ~2 Cyrillic letters, close enough to
+    the OpenAI tokenizers for budgeting without shipping one.
+    """
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def align_rows(transcript: Transcript, shots: List[Shot]) -> List[Row]:
+    """One row per shot carrying the speech said during it; speech outside any
+    shot becomes rows of its own, with adjacent segments merged."""
+    ordered = sorted(shots, key=lambda s: s.start_sec)
+    starts = [s.start_sec for s in ordered]
+    shot_texts: List[List[str]] = [[] for _ in ordered]
+    loose: List[Row] = []
+    for seg in sorted(transcript.segments, key=lambda s: s.start):
+        text = " ".join(seg.text.split())
+        if not text:
+            continue
+        middle = (seg.start + seg.end) / 2
+        i = bisect.bisect_right(starts, middle) - 1
+        if i >= 0 and middle <= ordered[i].end_sec:
+            shot_texts[i].append(text)
+        else:
+            loose.append(Row(seg.start, seg.end, text))
+    rows = [Row(s.start_sec, s.end_sec, " ".join(t)) for s, t in zip(ordered, shot_texts)]
+    rows.extend(_merge_adjacent(loose))
+    rows.sort(key=lambda r: r.start)
+    return rows
+
+
+def _merge_adjacent(rows: List[Row]) -> List[Row]:
+    merged: List[Row] = []
+    for row in rows:
+        prev = merged[-1] if merged else None
+        if prev and row.start - prev.end <= MERGE_GAP_SEC and row.end - prev.start <= MAX_MERGED_SEC:
+            merged[-1] = Row(prev.start, max(prev.end, row.end), f"{prev.text} {row.text}")
+        else:
+            merged.append(row)
+    return merged
+
+
+def _seconds(value: float) -> str:
+    return f"{round(value, 1):g}"
+
+
+def render(topic: str, rows: List[Row]) -> str:
+    lines = [f"topic: {topic}", "t0|t1|text"]
+    lines.extend(f"{_seconds(r.start)}|{_seconds(r.end)}|{r.text.replace('|', '/')}" for r in rows)
+    return "\n".join(lines)
+
+
+def _cap(rows: List[Row], limit: int) -> List[Row]:
+    return [
+        r if len(r.text) <= limit else Row(r.start, r.end, r.text[: limit - 1].rstrip() + ELLIPSIS)
+        for r in rows
+    ]
+
+
+def _coarsen(rows: List[Row]) -> List[Row]:
+    pairs = [rows[i:i + 2] for i in range(0, len(rows), 2)]
+    return [
+        Row(pair[0].start, pair[-1].end, " ".join(r.text for r in pair if r.text))
+        for pair in pairs
+    ]
+
+
+def _largest_cap(topic: str, rows: List[Row], budget: int) -> int | None:
+    """Biggest per-row text length (>= MIN_ROW_CHARS) that fits, or None."""
+    longest = max((len(r.text) for r in rows), default=0)
+    lo, hi = min(MIN_ROW_CHARS, longest), longest
+    if estimate_tokens(render(topic, _cap(rows, lo))) > budget:
+        return None
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(render(topic, _cap(rows, mid))) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def fit(topic: str, rows: List[Row], budget: int) -> Tuple[str, bool]:
+    """Render ``rows`` within ``budget`` tokens (``0`` means unlimited).
+
+    The longest lines are shortened first so short remarks survive intact;
+    when even short lines do not fit, neighbouring rows are merged pairwise,
+    trading timing resolution for coverage of the whole video.
+    """
+    text = render(topic, rows)
+    if budget <= 0 or estimate_tokens(text) <= budget:
+        return text, False
+    while True:
+        limit = _largest_cap(topic, rows, budget)
+        if limit is not None:
+            return render(topic, _cap(rows, limit)), True
+        if len(rows) <= 1:
+            return render(topic, _cap(rows, MIN_ROW_CHARS)), True
+        rows = _coarsen(rows)
+
+
+def build_scenario_context(
+    transcript: Transcript, shots: List[Shot], topic: str, budget: int
+) -> Tuple[str, ContextReport]:
+    raw = json.dumps(
+        {"transcript": transcript.model_dump(), "shots": [s.model_dump() for s in shots], "topic": topic},
+        ensure_ascii=False,
+    )
+    text, truncated = fit(topic, align_rows(transcript, shots), budget)
+    return text, ContextReport(
+        raw_tokens=estimate_tokens(raw),
+        compact_tokens=estimate_tokens(text),
+        budget=budget,
+        truncated=truncated,
+    )
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .schemas import AnalysisResult
+
+
+class ResultStore:
+    """SQLite store of finished analyses keyed by video_id and pipeline version."""
+
+    def __init__(self, path: str, max_entries: int, max_age_seconds: float):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " video_id TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (video_id, version))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS analyses_accessed_at ON analyses (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, video_id: str, version: str) -> Optional[AnalysisResult]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM analyses WHERE video_id = ? AND version = ?",
+                (video_id, version),
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age_seconds:
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE video_id = ? AND version = ?", (video_id, version)
+                )
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE analyses SET accessed_at = ? WHERE video_id = ? AND version = ?",
+                (now, video_id, version),
+            )
+            self._conn.commit()
+        return AnalysisResult.model_validate_json(row[0])
+
+    def put(self, video_id: str, version: str, result: AnalysisResult) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (video_id, version, payload, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (video_id, version, result.model_dump_json(), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, video_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM analyses WHERE created_at < ?", (now - self.max_age_seconds,)
+        )
+        self._conn.execute(
+            "DELETE FROM analyses WHERE rowid IN ("
+            " SELECT rowid FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
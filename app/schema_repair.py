@@ -0,0 +1,250 @@
+import json
+import threading
+import types
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+# validation passes after which whatever is still broken goes back to the model
+MAX_PASSES = 3
+
+
+@dataclass
+class RepairResult(Generic[T]):
+    value: Optional[T]
+    # what could not be fixed locally, phrased for a re-prompt
+    errors: List[str]
+    fixes: List[str]
+
+
+def _strip_fences(raw: str) -> str:
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return text[min(starts):] if starts else text
+
+
+def close_truncated(text: str) -> Optional[str]:
+    """Cut ``text`` after its last complete object or array and close the
+    containers still open there; ``None`` when nothing complete was seen."""
+    stack: List[str] = []
+    in_string = escape = False
+    cut: Optional[Tuple[int, List[str]]] = None
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]":
+            if not stack or stack[-1] != c:
+                break
+            stack.pop()
+            if not stack:
+                return text[: i + 1]
+            cut = (i + 1, list(stack))
+    if cut is None:
+        return None
+    end, still_open = cut
+    return text[:end].rstrip().rstrip(",") + "".join(reversed(still_open))
+
+
+def _load(raw: str, fixes: List[str]) -> Any:
+    text = _strip_fences(raw)
+    if text != raw.strip():
+        fixes.append("stripped text around JSON")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        closed = close_truncated(text)
+        if closed is None:
+            raise
+        data = json.loads(closed)
+        fixes.append("closed truncated JSON")
+        return data
+
+
+def _required(schema: Type[BaseModel]) -> set:
+    return {name for name, f in schema.model_fields.items() if f.is_required()}
+
+
+def _unwrap(data: Any, schema: Type[BaseModel], fixes: List[str]) -> Any:
+    # {"scenario": {...}} -> {...}
+    while (
+        isinstance(data, dict)
+        and len(data) == 1
+        and not _required(schema) & data.keys()
+        and isinstance(next(iter(data.values())), dict)
+    ):
+        key = next(iter(data))
+        fixes.append(f"unwrapped '{key}'")
+        data = data[key]
+    # [...] -> {"scenes": [...]} when the schema has a single list field
+    if isinstance(data, list):
+        lists = [n for n, f in schema.model_fields.items() if typing.get_origin(f.annotation) is list]
+        if len(lists) == 1:
+            fixes.append(f"wrapped list into '{lists[0]}'")
+            data = {lists[0]: data}
+    return data
+
+
+def _strip_optional(annotation: Any) -> Any:
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType) and len(args) == 1:
+        return args[0]
+    return annotation
+
+
+def _annotation_at(schema: Type[BaseModel], loc: Tuple) -> Any:
+    annotation: Any = schema
+    for part in loc:
+        annotation = _strip_optional(annotation)
+        if isinstance(part, int):
+            args = typing.get_args(annotation)
+            if not args:
+                return None
+            annotation = args[0]
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            info = annotation.model_fields.get(part)
+            if info is None:
+                return None
+            annotation = info.annotation
+        else:
+            return None
+    return annotation
+
+
+def _fix(error: Dict[str, Any], schema: Type[BaseModel]) -> Tuple[bool, Any]:
+    """Return ``(True, replacement)`` for errors that can be fixed mechanically."""
+    kind, value = error["type"], error.get("input")
+    if kind == "int_from_float":
+        return True, int(round(value))
+    if kind == "int_parsing" and isinstance(value, str):
+        try:
+            return True, int(round(float(value.strip())))
+        except ValueError:
+            return False, None
+    if kind == "string_type" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return True, str(value)
+    if kind == "list_type" and isinstance(value, (dict, str)):
+        return True, [value]
+    if kind == "literal_error" and isinstance(value, str):
+        allowed = typing.get_args(_strip_optional(_annotation_at(schema, error["loc"])))
+        matches = [a for a in allowed if isinstance(a, str) and a.lower() == value.strip().lower()]
+        return (True, matches[0]) if matches else (False, None)
+    if kind == "missing":
+        annotation = _annotation_at(schema, error["loc"])
+        if typing.get_origin(annotation) is list:
+            return True, []
+        if type(None) in typing.get_args(annotation):
+            return True, None
+    return False, None
+
+
+def _assign(data: Any, loc: Tuple, value: Any) -> bool:
+    target = data
+    try:
+        for part in loc[:-1]:
+            target = target[part]
+        target[loc[-1]] = value
+    except (KeyError, IndexError, TypeError):
+        return False
+    return True
+
+
+def _describe(error: Dict[str, Any]) -> str:
+    where = ".".join(str(p) for p in error["loc"]) or "<root>"
+    return f"{where}: {error['msg']}"
+
+
+def repair(raw: str, schema: Type[T]) -> RepairResult[T]:
+    """Validate ``raw`` against ``schema``, fixing mechanical mistakes locally.
+
+    Handles code fences, truncated trailing objects, a wrapping top-level key,
+    floats/strings where ints are expected, scalars where lists are expected,
+    literal case and missing list or optional fields. Anything else is
+    returned in ``errors`` so only those fields need another model call.
+    """
+    fixes: List[str] = []
+    try:
+        data = _unwrap(_load(raw, fixes), schema, fixes)
+    except json.JSONDecodeError as e:
+        return RepairResult(None, [f"invalid JSON: {e}"], fixes)
+    for _ in range(MAX_PASSES):
+        try:
+            return RepairResult(schema.model_validate(data), [], fixes)
+        except ValidationError as e:
+            errors = e.errors()
+        unfixed = []
+        for error in errors:
+            ok, replacement = _fix(error, schema)
+            if ok and error["loc"] and _assign(data, error["loc"], replacement):
+                fixes.append(f"{error['type']} at {'.'.join(str(p) for p in error['loc'])}")
+            else:
+                unfixed.append(error)
+        if unfixed:
+            return RepairResult(None, [_describe(e) for e in unfixed], fixes)
+    return RepairResult(None, ["validation did not converge"], fixes)
+
+
+@dataclass
+class _SchemaRepairs:
+    calls: int = 0
+    valid: int = 0
+    repaired: int = 0
+    reprompted: int = 0
+
+
+@dataclass
+class RepairStats:
+    schemas: Dict[str, _SchemaRepairs] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, schema: str, result: RepairResult) -> None:
+        with self._lock:
+            counts = self.schemas.setdefault(schema, _SchemaRepairs())
+            counts.calls += 1
+            if result.value is None:
+                counts.reprompted += 1
+            elif result.fixes:
+                counts.repaired += 1
+            else:
+                counts.valid += 1
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    **vars(counts),
+                    "repair_rate": counts.repaired / counts.calls,
+                    "reprompt_rate": counts.reprompted / counts.calls,
+                }
+                for name, counts in self.schemas.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.schemas.clear()
+
+
+repair_stats = RepairStats()
+
+
+def parse(raw: str, schema: Type[T]) -> RepairResult[T]:
+    result = repair(raw, schema)
+    repair_stats.record(schema.__name__, result)
+    return result
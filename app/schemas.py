@@ -1,8 +1,10 @@
 from __future__ import annotations
 from datetime import datetime, timedelta
-from typing import List, Literal
+from typing import Any, Dict, List, Literal
 from pydantic import BaseModel, Field
 
+from .key_objects import KeyObjectTable
+
 
 class Candidate(BaseModel):
     video_id: str
@@ -40,7 +42,8 @@ class KeyObject(BaseModel):
 class AnalysisResult(BaseModel):
     transcript: Transcript
     shots: List[Shot]
-    key_objects: List[KeyObject] = Field(default_factory=list)
+    # columnar; items materialize as KeyObject on access and serialize as a list of them
+    key_objects: KeyObjectTable = Field(default_factory=KeyObjectTable.empty)
 
 
 class VoiceLine(BaseModel):
@@ -74,3 +77,22 @@ class Storyboard(BaseModel):
     scenes: List[StoryScene]
     total_duration_sec: int
     target: Literal["shorts", "youtube"]
+
+
+class Job(BaseModel):
+    id: str
+    batch_id: str
+    kind: Literal["analyze", "scenario"]
+    payload: Dict[str, Any]
+    status: Literal["queued", "running", "done", "failed"]
+    attempts: int
+    max_attempts: int
+    result: Any = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class JobBatch(BaseModel):
+    batch_id: str
+    jobs: List[Job]
@@ -1,20 +1,101 @@
 import sys
-from pydantic import BaseSettings, Field, ValidationError
+try:
+    # pydantic 2 moved BaseSettings out; its v1 API keeps the Field(env=...) declarations working
+    from pydantic.v1 import BaseSettings, Field, ValidationError
+except ImportError:
+    from pydantic import BaseSettings, Field, ValidationError
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Settings(BaseSettings):
-    YOUTUBE_API_KEY: str = Field(..., env='YOUTUBE_API_KEY')
-    OPENAI_API_KEY: str = Field(..., env='OPENAI_API_KEY')
-    GOOGLE_APPLICATION_CREDENTIALS: str = Field(..., env='GOOGLE_APPLICATION_CREDENTIALS')
-    REGION_CODE: str = Field(..., env='REGION_CODE')
-    DEFAULT_PUBLISHED_AFTER: str = Field(..., env='DEFAULT_PUBLISHED_AFTER')
+    # checked per entry point with require(), so e.g. `cli storyboard` runs without YouTube keys
+    YOUTUBE_API_KEY: str = Field('', env='YOUTUBE_API_KEY')
+    OPENAI_API_KEY: str = Field('', env='OPENAI_API_KEY')
+    GOOGLE_APPLICATION_CREDENTIALS: str = Field('', env='GOOGLE_APPLICATION_CREDENTIALS')
+    REGION_CODE: str = Field('', env='REGION_CODE')
+    DEFAULT_PUBLISHED_AFTER: str = Field('', env='DEFAULT_PUBLISHED_AFTER')
+    MEDIA_CACHE_DIR: str = Field('~/.cache/storyflow/media', env='MEDIA_CACHE_DIR')
+    MEDIA_CACHE_MAX_BYTES: int = Field(2 * 1024 ** 3, env='MEDIA_CACHE_MAX_BYTES')
+    MEDIA_FETCH_MODE: str = Field('sections', env='MEDIA_FETCH_MODE')
+    ANALYSIS_MAX_WORKERS: int = Field(8, env='ANALYSIS_MAX_WORKERS')
+    DOWNLOAD_MAX_WORKERS: int = Field(4, env='DOWNLOAD_MAX_WORKERS')
+    YOUTUBE_MAX_CONNECTIONS: int = Field(20, env='YOUTUBE_MAX_CONNECTIONS')
+    YOUTUBE_MAX_KEEPALIVE: int = Field(10, env='YOUTUBE_MAX_KEEPALIVE')
+    YOUTUBE_HTTP2: bool = Field(False, env='YOUTUBE_HTTP2')
+    YOUTUBE_BATCH_CONCURRENCY: int = Field(4, env='YOUTUBE_BATCH_CONCURRENCY')
+    YOUTUBE_CACHE_BACKEND: str = Field('memory', env='YOUTUBE_CACHE_BACKEND')
+    YOUTUBE_CACHE_PATH: str = Field('~/.cache/storyflow/youtube.sqlite3', env='YOUTUBE_CACHE_PATH')
+    YOUTUBE_CACHE_MAX_ENTRIES: int = Field(1024, env='YOUTUBE_CACHE_MAX_ENTRIES')
+    YOUTUBE_CACHE_TTL_SEARCH: float = Field(900, env='YOUTUBE_CACHE_TTL_SEARCH')
+    YOUTUBE_CACHE_TTL_VIDEOS: float = Field(300, env='YOUTUBE_CACHE_TTL_VIDEOS')
+    TRENDING_INDEX_PATH: str = Field('~/.cache/storyflow/trending.sqlite3', env='TRENDING_INDEX_PATH')
+    TRENDING_INDEX_TTL_SECONDS: float = Field(6 * 3600, env='TRENDING_INDEX_TTL_SECONDS')
+    TRENDING_STATS_TTL_SECONDS: float = Field(1800, env='TRENDING_STATS_TTL_SECONDS')
+    TRENDING_REFRESH_SECONDS: float = Field(600, env='TRENDING_REFRESH_SECONDS')
+    TRENDING_SNAPSHOTS_PER_VIDEO: int = Field(8, env='TRENDING_SNAPSHOTS_PER_VIDEO')
+    FFMPEG_BIN: str = Field('ffmpeg', env='FFMPEG_BIN')
+    SHOT_BACKEND: str = Field('remote', env='SHOT_BACKEND')
+    LOCAL_SHOTS_FPS: float = Field(10, env='LOCAL_SHOTS_FPS')
+    LOCAL_SHOTS_WIDTH: int = Field(96, env='LOCAL_SHOTS_WIDTH')
+    LOCAL_SHOTS_HEIGHT: int = Field(96, env='LOCAL_SHOTS_HEIGHT')
+    KEY_OBJECT_MIN_CONFIDENCE: float = Field(0.3, env='KEY_OBJECT_MIN_CONFIDENCE')
+    KEY_OBJECTS_PER_SHOT: int = Field(5, env='KEY_OBJECTS_PER_SHOT')
+    KEY_OBJECT_MERGE_GAP_SECONDS: float = Field(0.0, env='KEY_OBJECT_MERGE_GAP_SECONDS')
+    VIDEO_PROXY_HEIGHT: int = Field(240, env='VIDEO_PROXY_HEIGHT')
+    VIDEO_PROXY_FPS: float = Field(12, env='VIDEO_PROXY_FPS')
+    VIDEO_PROXY_MAX_WORKERS: int = Field(2, env='VIDEO_PROXY_MAX_WORKERS')
+    VIDEO_PROXY_CACHE_DIR: str = Field('~/.cache/storyflow/proxies', env='VIDEO_PROXY_CACHE_DIR')
+    VIDEO_PROXY_CACHE_MAX_BYTES: int = Field(512 * 1024 ** 2, env='VIDEO_PROXY_CACHE_MAX_BYTES')
+    STT_CHUNKED: bool = Field(False, env='STT_CHUNKED')
+    STT_CHUNK_SECONDS: float = Field(30, env='STT_CHUNK_SECONDS')
+    STT_MAX_CHUNK_SECONDS: float = Field(45, env='STT_MAX_CHUNK_SECONDS')
+    STT_CHUNK_OVERLAP_SECONDS: float = Field(1.0, env='STT_CHUNK_OVERLAP_SECONDS')
+    STT_MAX_WORKERS: int = Field(4, env='STT_MAX_WORKERS')
+    STT_AUDIO_CODEC: str = Field('opus', env='STT_AUDIO_CODEC')
+    STT_AUDIO_BITRATE: str = Field('24k', env='STT_AUDIO_BITRATE')
+    STT_TRIM_SILENCE: bool = Field(False, env='STT_TRIM_SILENCE')
+    AUDIO_PREP_MAX_WORKERS: int = Field(2, env='AUDIO_PREP_MAX_WORKERS')
+    AUDIO_PREP_CACHE_DIR: str = Field('~/.cache/storyflow/audio', env='AUDIO_PREP_CACHE_DIR')
+    AUDIO_PREP_CACHE_MAX_BYTES: int = Field(256 * 1024 ** 2, env='AUDIO_PREP_CACHE_MAX_BYTES')
+    JOB_DB_PATH: str = Field('~/.cache/storyflow/jobs.sqlite3', env='JOB_DB_PATH')
+    JOB_DB_JOURNAL_MODE: str = Field('WAL', env='JOB_DB_JOURNAL_MODE')
+    JOB_LEASE_SECONDS: float = Field(600, env='JOB_LEASE_SECONDS')
+    JOB_MAX_ATTEMPTS: int = Field(3, env='JOB_MAX_ATTEMPTS')
+    JOB_RETRY_BACKOFF_SECONDS: float = Field(30, env='JOB_RETRY_BACKOFF_SECONDS')
+    JOB_POLL_SECONDS: float = Field(1.0, env='JOB_POLL_SECONDS')
+    WORKER_METRICS_PORT: int = Field(0, env='WORKER_METRICS_PORT')
+    RESULT_STORE_PATH: str = Field('~/.cache/storyflow/results.sqlite3', env='RESULT_STORE_PATH')
+    RESULT_STORE_MAX_ENTRIES: int = Field(10000, env='RESULT_STORE_MAX_ENTRIES')
+    RESULT_STORE_MAX_AGE_DAYS: float = Field(30, env='RESULT_STORE_MAX_AGE_DAYS')
+    FINGERPRINT_INDEX_PATH: str = Field('~/.cache/storyflow/fingerprints.sqlite3', env='FINGERPRINT_INDEX_PATH')
+    FINGERPRINT_MATCH_THRESHOLD: float = Field(0.85, env='FINGERPRINT_MATCH_THRESHOLD')
+    FINGERPRINT_FRAME_THRESHOLD: float = Field(0.8, env='FINGERPRINT_FRAME_THRESHOLD')
+    FINGERPRINT_MIN_OVERLAP: float = Field(0.9, env='FINGERPRINT_MIN_OVERLAP')
+    LLM_CACHE_MAX_ENTRIES: int = Field(256, env='LLM_CACHE_MAX_ENTRIES')
+    LLM_CACHE_PATH: str = Field('~/.cache/storyflow/llm.sqlite3', env='LLM_CACHE_PATH')
+    LLM_CACHE_DISK_MAX_ENTRIES: int = Field(10000, env='LLM_CACHE_DISK_MAX_ENTRIES')
+    LLM_CACHE_TTL_SECONDS: float = Field(7 * 86400, env='LLM_CACHE_TTL_SECONDS')
+    SCENARIO_CONTEXT_TOKENS: int = Field(6000, env='SCENARIO_CONTEXT_TOKENS')
+    STORYBOARD_WINDOW_SCENES: int = Field(8, env='STORYBOARD_WINDOW_SCENES')
+    STORYBOARD_MAX_WORKERS: int = Field(4, env='STORYBOARD_MAX_WORKERS')
 
     class Config:
         env_file = '.env'
         extra = 'ignore'
 
+    def require(self, *names: str) -> None:
+        missing = [name for name in names if not getattr(self, name)]
+        if missing:
+            print('Missing configuration:', ', '.join(missing), file=sys.stderr)
+            raise SystemExit(1)
+
+    def analysis_requirements(self) -> tuple:
+        names = ('OPENAI_API_KEY',)
+        if self.SHOT_BACKEND != 'local':
+            names += ('GOOGLE_APPLICATION_CREDENTIALS',)
+        return names
+
 try:
     settings = Settings()
 except ValidationError as e:
@@ -1,26 +1,141 @@
-from typing import Any
+import asyncio
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
 
-from openai import OpenAI
+from pydantic import TypeAdapter
 
+from . import metrics, openai_client
+from .ffmpeg_tools import decode_pcm, write_wav
 from .schemas import Segment, Transcript
 from .settings import settings
+from .vad import Chunk, plan_chunks
 
 
 _SENTINEL = object()
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+MODEL = "whisper-1"
+PCM_RATE = 16000
+_MAX_REPEATED_WORDS = 8
 
+client = openai_client.client
+async_client = openai_client.async_client
 
-def transcribe(audio_path: str) -> Transcript:
+
+def transcribe(audio_path: str, chunked: Optional[bool] = None) -> Transcript:
+    chunked = settings.STT_CHUNKED if chunked is None else chunked
+    if not chunked:
+        return _transcribe_file(audio_path)
+    samples = decode_pcm(audio_path, PCM_RATE)
+    chunks = _plan(samples)
+    if len(chunks) == 1:
+        return _transcribe_file(audio_path)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = _write_chunks(tmpdir, samples, chunks)
+        with ThreadPoolExecutor(max_workers=min(settings.STT_MAX_WORKERS, len(paths))) as pool:
+            results = [t.segments for t in pool.map(_transcribe_file, paths)]
+    return Transcript(segments=merge_chunk_segments(chunks, results))
+
+
+async def transcribe_async(audio_path: str, chunked: Optional[bool] = None) -> Transcript:
+    chunked = settings.STT_CHUNKED if chunked is None else chunked
+    if not chunked:
+        return await _transcribe_file_async(audio_path)
+    samples = await asyncio.to_thread(decode_pcm, audio_path, PCM_RATE)
+    chunks = await asyncio.to_thread(_plan, samples)
+    if len(chunks) == 1:
+        return await _transcribe_file_async(audio_path)
+    semaphore = asyncio.Semaphore(settings.STT_MAX_WORKERS)
+
+    async def _bounded(path: str) -> List[Segment]:
+        async with semaphore:
+            return (await _transcribe_file_async(path)).segments
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = await asyncio.to_thread(_write_chunks, tmpdir, samples, chunks)
+        results = await asyncio.gather(*(_bounded(path) for path in paths))
+    return Transcript(segments=merge_chunk_segments(chunks, results))
+
+
+def _plan(samples) -> List[Chunk]:
+    return plan_chunks(
+        samples,
+        PCM_RATE,
+        target_seconds=settings.STT_CHUNK_SECONDS,
+        max_seconds=settings.STT_MAX_CHUNK_SECONDS,
+        overlap_seconds=settings.STT_CHUNK_OVERLAP_SECONDS,
+    )
+
+
+def _write_chunks(tmpdir: str, samples, chunks: List[Chunk]) -> List[str]:
+    paths = []
+    for i, chunk in enumerate(chunks):
+        path = os.path.join(tmpdir, f"chunk_{i:03d}.wav")
+        write_wav(path, samples[int(chunk.start * PCM_RATE):int(chunk.end * PCM_RATE)], PCM_RATE)
+        paths.append(path)
+    return paths
+
+
+def _words(text: str) -> List[str]:
+    return [re.sub(r"\W", "", word).lower() for word in text.split()]
+
+
+def _drop_repeated_prefix(previous: Segment, segment: Segment) -> Segment:
+    prev_words, words = _words(previous.text), _words(segment.text)
+    for size in range(min(len(prev_words), len(words), _MAX_REPEATED_WORDS), 0, -1):
+        if prev_words[-size:] == words[:size]:
+            text = " ".join(segment.text.split()[size:])
+            return Segment(text=text, start=segment.start, end=segment.end)
+    return segment
+
+
+def merge_chunk_segments(chunks: List[Chunk], results: List[List[Segment]]) -> List[Segment]:
+    merged: List[Segment] = []
+    for chunk, segments in zip(chunks, results):
+        shifted = [
+            Segment(text=s.text, start=s.start + chunk.start, end=s.end + chunk.start) for s in segments
+        ]
+        if chunk.overlap > 0:
+            # the seam was heard twice; keep each segment on the side of its midpoint
+            shifted = [s for s in shifted if (s.start + s.end) / 2 >= chunk.logical_start]
+            if merged and shifted:
+                shifted[0] = _drop_repeated_prefix(merged[-1], shifted[0])
+        merged.extend(s for s in shifted if s.text.strip())
+    return merged
+
+
+def _transcribe_file(audio_path: str) -> Transcript:
+    metrics.record_bytes("uploaded", "whisper", os.path.getsize(audio_path))
     with open(audio_path, "rb") as f:
         resp = client.audio.transcriptions.create(
-            model="whisper-1",
+            model=MODEL,
+            file=f,
+            response_format="verbose_json",
+        )
+    return _transcript_from_response(resp)
+
+
+async def _transcribe_file_async(audio_path: str) -> Transcript:
+    metrics.record_bytes("uploaded", "whisper", os.path.getsize(audio_path))
+    with open(audio_path, "rb") as f:
+        resp = await async_client.audio.transcriptions.create(
+            model=MODEL,
             file=f,
             response_format="verbose_json",
         )
-    segments_payload = _extract_segments(resp)
-    segments = [_segment_from_payload(segment) for segment in segments_payload]
-    return Transcript(segments=segments)
+    return _transcript_from_response(resp)
+
+
+_SEGMENTS = TypeAdapter(List[Segment])
+
+
+def _transcript_from_response(resp: Any) -> Transcript:
+    # one validation call for the whole list; from_attributes reads the SDK's
+    # segment objects and plain dicts alike without dumping each one first
+    segments = _SEGMENTS.validate_python(list(_extract_segments(resp)), from_attributes=True)
+    return Transcript.model_construct(segments=segments)
 
 
 def _extract_segments(resp: Any):
@@ -34,17 +149,6 @@ def _extract_segments(resp: Any):
     return segments
 
 
-def _segment_from_payload(segment: Any) -> Segment:
-    payload = _dump_model(segment)
-    if payload is None:
-        payload = {
-            "text": getattr(segment, "text"),
-            "start": getattr(segment, "start"),
-            "end": getattr(segment, "end"),
-        }
-    return Segment(**payload)
-
-
 def _dump_model(obj: Any) -> dict[str, Any] | None:
     if isinstance(obj, dict):
         return obj
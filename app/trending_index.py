@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from . import metrics, youtube_client
+from .schemas import Candidate
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# score = sum(weight * feature); velocity and growth are log-scaled so a single
+# viral outlier doesn't flatten the rest of the ranking
+WEIGHTS = {"views_per_hour": 1.0, "growth_per_hour": 1.0, "like_ratio": 10.0}
+# a video younger than this is ranked as if it were this old
+MIN_AGE_HOURS = 1.0
+# a live search fetches at least this many candidates: one search.list page
+# holds up to 50 results for the same 100 units, and ranking by velocity needs
+# more than the top n by lifetime views to reorder
+CANDIDATE_POOL = 50
+
+
+def query_key(topic: str, region: str, published_after: str, shorts: bool) -> str:
+    return json.dumps([" ".join(topic.lower().split()), region, published_after, bool(shorts)], ensure_ascii=False)
+
+
+def ranking_features(
+    published_at: np.ndarray,
+    taken_at: np.ndarray,
+    views: np.ndarray,
+    likes: np.ndarray,
+    prev_taken_at: np.ndarray,
+    prev_views: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Per-video features from the latest two stat snapshots.
+
+    ``prev_*`` is NaN where a video has a single snapshot; its growth then
+    falls back to the lifetime views per hour.
+    """
+    age_hours = np.maximum((taken_at - published_at) / 3600, MIN_AGE_HOURS)
+    views_per_hour = views / age_hours
+    interval_hours = (taken_at - prev_taken_at) / 3600
+    has_prev = ~np.isnan(prev_views) & (interval_hours > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(has_prev, (views - prev_views) / interval_hours, views_per_hour)
+    return {
+        "views_per_hour": views_per_hour,
+        "growth_per_hour": np.maximum(growth, 0.0),
+        "like_ratio": likes / np.maximum(views, 1.0),
+    }
+
+
+def ranking_score(features: Dict[str, np.ndarray]) -> np.ndarray:
+    return (
+        WEIGHTS["views_per_hour"] * np.log1p(features["views_per_hour"])
+        + WEIGHTS["growth_per_hour"] * np.log1p(features["growth_per_hour"])
+        + WEIGHTS["like_ratio"] * features["like_ratio"]
+    )
+
+
+class TrendingIndex:
+    """SQLite index of search results and their stat snapshots.
+
+    A query (topic, region, published_after, shorts) remembers the videos a
+    live ``search.list`` returned for it; their statistics are re-polled with
+    ``videos.list`` (1 quota unit per 50 videos instead of 100 per search)
+    and ranked locally by velocity.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, stats_ttl_seconds: float, snapshots_per_video: int = 8):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.ttl_seconds = ttl_seconds
+        self.stats_ttl_seconds = stats_ttl_seconds
+        self.snapshots_per_video = max(snapshots_per_video, 2)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS videos ("
+            " video_id TEXT PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " channel_title TEXT NOT NULL,"
+            " published_at REAL NOT NULL,"
+            " is_shorts INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " video_id TEXT NOT NULL,"
+            " taken_at REAL NOT NULL,"
+            " view_count INTEGER NOT NULL,"
+            " like_count INTEGER NOT NULL,"
+            " PRIMARY KEY (video_id, taken_at));"
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " query TEXT PRIMARY KEY,"
+            " searched_at REAL NOT NULL,"
+            " depth INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS members ("
+            " query TEXT NOT NULL,"
+            " video_id TEXT NOT NULL,"
+            " PRIMARY KEY (query, video_id));"
+            "CREATE INDEX IF NOT EXISTS members_video ON members (video_id);"
+        )
+        self._conn.commit()
+
+    def record(self, query: str, candidates: Sequence[Candidate], depth: int, now: Optional[float] = None) -> None:
+        """Store the result of a live search for ``query`` that asked for ``depth`` videos."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._write_snapshots(candidates, now, update_shorts=True)
+            self._conn.execute(
+                "INSERT INTO queries (query, searched_at, depth) VALUES (?, ?, ?)"
+                " ON CONFLICT (query) DO UPDATE SET searched_at = excluded.searched_at, depth = excluded.depth",
+                (query, now, depth),
+            )
+            # the new result replaces the old one, so videos that dropped out of
+            # the search stop being polled and can't keep the query stale
+            self._conn.execute("DELETE FROM members WHERE query = ?", (query,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO members (query, video_id) VALUES (?, ?)",
+                [(query, c.video_id) for c in candidates],
+            )
+            self._conn.commit()
+
+    def add_snapshots(self, candidates: Sequence[Candidate], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._write_snapshots(candidates, now, update_shorts=False)
+            self._conn.commit()
+
+    def _write_snapshots(self, candidates: Sequence[Candidate], now: float, update_shorts: bool) -> None:
+        # a stats poll doesn't know which search asked for Shorts, so it keeps the stored flag
+        shorts = ", is_shorts = excluded.is_shorts" if update_shorts else ""
+        self._conn.executemany(
+            "INSERT INTO videos (video_id, title, channel_title, published_at, is_shorts)"
+            " VALUES (?, ?, ?, ?, ?) ON CONFLICT (video_id) DO UPDATE SET"
+            " title = excluded.title, channel_title = excluded.channel_title" + shorts,
+            [(c.video_id, c.title, c.channel_title, c.published_at.timestamp(), int(c.is_shorts)) for c in candidates],
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO snapshots (video_id, taken_at, view_count, like_count) VALUES (?, ?, ?, ?)",
+            [(c.video_id, now, c.view_count, c.like_count) for c in candidates],
+        )
+        ids = [c.video_id for c in candidates]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            self._conn.execute(
+                "DELETE FROM snapshots WHERE rowid IN ("
+                " SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER"
+                " (PARTITION BY video_id ORDER BY taken_at DESC) AS rn FROM snapshots"
+                f" WHERE video_id IN ({','.join('?' * len(chunk))})) WHERE rn > ?)",
+                (*chunk, self.snapshots_per_video),
+            )
+
+    def forget(self, video_ids: Sequence[str]) -> None:
+        """Drop videos that no longer exist or are no longer public."""
+        with self._lock:
+            for table in ("members", "snapshots", "videos"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE video_id = ?", [(v,) for v in video_ids])
+            self._conn.commit()
+
+    def prune(self, now: Optional[float] = None) -> None:
+        """Drop expired queries and the videos no live query refers to."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("DELETE FROM queries WHERE searched_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute("DELETE FROM members WHERE query NOT IN (SELECT query FROM queries)")
+            self._conn.execute("DELETE FROM videos WHERE video_id NOT IN (SELECT video_id FROM members)")
+            self._conn.execute("DELETE FROM snapshots WHERE video_id NOT IN (SELECT video_id FROM videos)")
+            self._conn.commit()
+
+    def stale_videos(self, max_age_seconds: float, now: Optional[float] = None) -> List[str]:
+        """Videos of live queries whose latest snapshot is older than ``max_age_seconds``."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.video_id FROM"
+                " (SELECT video_id, MAX(taken_at) AS taken_at FROM snapshots GROUP BY video_id) s"
+                " WHERE s.taken_at < ? AND s.video_id IN (SELECT m.video_id FROM members m"
+                " JOIN queries q USING (query) WHERE q.searched_at >= ?)"
+                " ORDER BY s.video_id",
+                (now - max_age_seconds, now - self.ttl_seconds),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def lookup(self, query: str, n: int, now: Optional[float] = None) -> Optional[List[Candidate]]:
+        """Top ``n`` videos for ``query``, or None when the index can't answer it:
+        the query was never searched, its search expired, it was searched for
+        fewer videos, or any of its stats are older than ``stats_ttl_seconds``."""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute("SELECT searched_at, depth FROM queries WHERE query = ?", (query,)).fetchone()
+        if row is None or row[0] < now - self.ttl_seconds or row[1] < n:
+            return None
+        return self.ranked(query, n, fresh_after=now - self.stats_ttl_seconds)
+
+    def ranked(self, query: str, n: int, fresh_after: Optional[float] = None) -> Optional[List[Candidate]]:
+        """Top ``n`` members of ``query`` by ``ranking_score``; None if any
+        latest snapshot was taken before ``fresh_after``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT v.video_id, v.title, v.channel_title, v.published_at, v.is_shorts,"
+                " s.rn, s.taken_at, s.view_count, s.like_count FROM members m"
+                " JOIN videos v USING (video_id)"
+                " JOIN (SELECT video_id, taken_at, view_count, like_count, ROW_NUMBER() OVER"
+                " (PARTITION BY video_id ORDER BY taken_at DESC) AS rn FROM snapshots"
+                " WHERE video_id IN (SELECT video_id FROM members WHERE query = ?)) s USING (video_id)"
+                " WHERE m.query = ? AND s.rn <= 2 ORDER BY v.video_id, s.rn",
+                (query, query),
+            ).fetchall()
+        latest = [r for r in rows if r[5] == 1]
+        if fresh_after is not None and (not latest or min(r[6] for r in latest) < fresh_after):
+            return None
+        position = {r[0]: i for i, r in enumerate(latest)}
+        prev_taken_at = np.full(len(latest), np.nan)
+        prev_views = np.full(len(latest), np.nan)
+        for r in rows:
+            if r[5] == 2:
+                prev_taken_at[position[r[0]]] = r[6]
+                prev_views[position[r[0]]] = r[7]
+        views = np.array([r[7] for r in latest], dtype=np.float64)
+        features = ranking_features(
+            np.array([r[3] for r in latest], dtype=np.float64),
+            np.array([r[6] for r in latest], dtype=np.float64),
+            views,
+            np.array([r[8] for r in latest], dtype=np.float64),
+            prev_taken_at,
+            prev_views,
+        )
+        # ties (and the very first poll of a fresh query) fall back to lifetime views
+        order = np.lexsort((-views, -ranking_score(features)))[:n]
+        return [
+            Candidate.model_construct(
+                video_id=latest[i][0],
+                title=latest[i][1],
+                channel_title=latest[i][2],
+                published_at=datetime.fromtimestamp(latest[i][3], timezone.utc),
+                view_count=latest[i][7],
+                like_count=latest[i][8],
+                is_shorts=bool(latest[i][4]),
+            )
+            for i in order
+        ]
+
+
+_index: Optional[TrendingIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_trending_index() -> Optional[TrendingIndex]:
+    global _index
+    if settings.TRENDING_INDEX_TTL_SECONDS <= 0 or not settings.TRENDING_INDEX_PATH:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = TrendingIndex(
+                settings.TRENDING_INDEX_PATH,
+                ttl_seconds=settings.TRENDING_INDEX_TTL_SECONDS,
+                stats_ttl_seconds=settings.TRENDING_STATS_TTL_SECONDS,
+                snapshots_per_video=settings.TRENDING_SNAPSHOTS_PER_VIDEO,
+            )
+    return _index
+
+
+def refresh(index: Optional[TrendingIndex] = None, max_age_seconds: Optional[float] = None) -> int:
+    """Re-poll stats of indexed videos older than ``max_age_seconds`` in
+    batches of 50 ids; returns the number of videos polled."""
+    index = index or get_trending_index()
+    if index is None:
+        return 0
+    if max_age_seconds is None:
+        max_age_seconds = settings.TRENDING_REFRESH_SECONDS
+    index.prune()
+    stale = index.stale_videos(max_age_seconds)
+    if not stale:
+        return 0
+    chunks = list(youtube_client.id_batches(stale))
+    with ThreadPoolExecutor(
+        max_workers=settings.YOUTUBE_BATCH_CONCURRENCY, thread_name_prefix="trending-refresh"
+    ) as pool:
+        # is_shorts of the polled candidates is ignored; add_snapshots keeps the stored flag
+        polled = pool.map(lambda chunk: youtube_client.fetch_candidates(chunk, False), chunks)
+        for chunk, candidates in zip(chunks, polled):
+            index.add_snapshots(candidates)
+            returned = {c.video_id for c in candidates}
+            gone = [video_id for video_id in chunk if video_id not in returned]
+            if gone:
+                index.forget(gone)
+    logger.info("Refreshed stats of %s indexed videos", len(stale))
+    return len(stale)
+
+
+async def refresh_forever(period_seconds: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(refresh)
+        except Exception:
+            logger.exception("Trending index refresh failed")
+        await asyncio.sleep(period_seconds)
+
+
+def search_trending(
+    topic: str, n: int, region: str, published_after: str, shorts: bool = True, live: bool = False
+) -> List[Candidate]:
+    """``youtube_client.search_trending`` answered from the index while it is
+    fresh; a live search refills it with a pool of at least ``CANDIDATE_POOL``
+    candidates, and the top ``n`` of the pool by velocity are returned."""
+    index = get_trending_index()
+    if index is None:
+        return youtube_client.search_trending(topic, n, region, published_after, shorts)
+    query = query_key(topic, region, published_after, shorts)
+    if not live:
+        hit = index.lookup(query, n)
+        if hit is not None:
+            metrics.registry.inc("trending_index_requests_total", result="hit")
+            return hit
+    metrics.registry.inc("trending_index_requests_total", result="live")
+    pool = max(n, CANDIDATE_POOL)
+    candidates = youtube_client.search_trending(topic, pool, region, published_after, shorts)
+    index.record(query, candidates, pool)
+    return index.ranked(query, n) or []
+
+
+async def search_trending_async(
+    topic: str, n: int, region: str, published_after: str, shorts: bool = True, live: bool = False
+) -> List[Candidate]:
+    # the first call opens the SQLite file and creates its tables
+    index = await asyncio.to_thread(get_trending_index)
+    if index is None:
+        return await youtube_client.search_trending_async(topic, n, region, published_after, shorts)
+    query = query_key(topic, region, published_after, shorts)
+    if not live:
+        hit = await asyncio.to_thread(index.lookup, query, n)
+        if hit is not None:
+            metrics.registry.inc("trending_index_requests_total", result="hit")
+            return hit
+    metrics.registry.inc("trending_index_requests_total", result="live")
+    pool = max(n, CANDIDATE_POOL)
+    candidates = await youtube_client.search_trending_async(topic, pool, region, published_after, shorts)
+    await asyncio.to_thread(index.record, query, candidates, pool)
+    return await asyncio.to_thread(index.ranked, query, n) or []
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+_FRAME_SECONDS = 0.03
+_MIN_SILENCE_SECONDS = 0.3
+_NOISE_PERCENTILE = 10
+_SILENCE_MARGIN_DB = 8.0
+_SILENCE_CEILING_DB = -35.0
+
+
+@dataclass(frozen=True)
+class Chunk:
+    start: float  # first second of audio sent to STT
+    end: float
+    logical_start: float  # segments before this belong to the previous chunk
+
+    @property
+    def overlap(self) -> float:
+        return self.logical_start - self.start
+
+
+def frame_energy_db(samples: np.ndarray, rate: int) -> np.ndarray:
+    frame = max(1, int(rate * _FRAME_SECONDS))
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[: count * frame].astype(np.float32).reshape(count, frame) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return (20.0 * np.log10(np.maximum(rms, 1e-6))).astype(np.float32)
+
+
+def _silence_threshold(energy: np.ndarray) -> float:
+    return min(np.percentile(energy, _NOISE_PERCENTILE) + _SILENCE_MARGIN_DB, _SILENCE_CEILING_DB)
+
+
+def silence_centers(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Midpoints, in seconds, of silent runs long enough to cut at."""
+    energy = frame_energy_db(samples, rate)
+    if energy.size == 0:
+        return np.zeros(0)
+    silent = np.concatenate(([False], energy < _silence_threshold(energy), [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    long_enough = (ends - starts) * _FRAME_SECONDS >= _MIN_SILENCE_SECONDS
+    return (starts[long_enough] + ends[long_enough]) / 2.0 * _FRAME_SECONDS
+
+
+def sound_bounds(samples: np.ndarray, rate: int, pad_seconds: float = 0.25) -> Tuple[float, float]:
+    """Seconds of the first and last non-silent frame, padded; the whole clip when all silent."""
+    duration = len(samples) / rate
+    energy = frame_energy_db(samples, rate)
+    loud = np.flatnonzero(energy >= _silence_threshold(energy)) if energy.size else energy
+    if loud.size == 0:
+        return 0.0, duration
+    start = max(0.0, loud[0] * _FRAME_SECONDS - pad_seconds)
+    end = min(duration, (loud[-1] + 1) * _FRAME_SECONDS + pad_seconds)
+    return start, end
+
+
+def plan_chunks(
+    samples: np.ndarray,
+    rate: int,
+    target_seconds: float,
+    max_seconds: float,
+    overlap_seconds: float,
+) -> List[Chunk]:
+    duration = len(samples) / rate
+    centers = silence_centers(samples, rate)
+    chunks: List[Chunk] = []
+    logical_start, start = 0.0, 0.0
+    while duration - logical_start > max_seconds:
+        window = centers[(centers > logical_start + target_seconds / 2) & (centers <= logical_start + max_seconds)]
+        if window.size:
+            cut = float(window[np.argmin(np.abs(window - (logical_start + target_seconds)))])
+            chunks.append(Chunk(start=start, end=cut, logical_start=logical_start))
+            logical_start, start = cut, cut
+        else:
+            # no pause to cut at: hard cut and let the next chunk re-hear the seam
+            cut = logical_start + max_seconds
+            chunks.append(Chunk(start=start, end=cut, logical_start=logical_start))
+            logical_start, start = cut, max(0.0, cut - overlap_seconds)
+    chunks.append(Chunk(start=start, end=duration, logical_start=logical_start))
+    return chunks
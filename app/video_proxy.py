@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+
+from .ffmpeg_tools import FFmpegError, run_ffmpeg
+from .media_probe import MediaCache, content_digest
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROXY_FILE = "proxy.mp4"
+
+_cache: Optional[MediaCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_proxy_cache() -> Optional[MediaCache]:
+    global _cache
+    if settings.VIDEO_PROXY_CACHE_MAX_BYTES <= 0 or not settings.VIDEO_PROXY_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = MediaCache(settings.VIDEO_PROXY_CACHE_DIR, settings.VIDEO_PROXY_CACHE_MAX_BYTES)
+    return _cache
+
+
+def enabled() -> bool:
+    return settings.VIDEO_PROXY_HEIGHT > 0
+
+
+def _cache_key(source: str) -> str:
+    raw = f"{content_digest(source)}|{settings.VIDEO_PROXY_HEIGHT}|{settings.VIDEO_PROXY_FPS}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _encode(source: str, dest_dir: str) -> str:
+    dest = os.path.join(dest_dir, PROXY_FILE)
+    # shot and label detection need neither sound nor detail; timestamps are
+    # unchanged because only the frame rate and size are reduced
+    run_ffmpeg(
+        [
+            "-y", "-i", source,
+            "-an",
+            "-vf", f"fps={settings.VIDEO_PROXY_FPS},scale=-2:{settings.VIDEO_PROXY_HEIGHT}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+            "-movflags", "+faststart",
+            dest,
+        ]
+    )
+    return dest
+
+
+def _make_proxy(video_path: str) -> Tuple[str, Callable[[], None]]:
+    cache = get_proxy_cache()
+    if cache is None:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = _encode(video_path, tmpdir)
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        return path, lambda: shutil.rmtree(tmpdir, ignore_errors=True)
+    key = _cache_key(video_path)
+    hit = cache.lookup(key)
+    if hit is None:
+        staging = cache.staging_dir()
+        try:
+            _encode(video_path, staging)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        hit = cache.commit(key, staging)
+    entry, release = hit
+    return os.path.join(entry, PROXY_FILE), release
+
+
+def _proxy_or_original(video_path: str) -> Tuple[str, Callable[[], None]]:
+    try:
+        path, release = _make_proxy(video_path)
+    except FFmpegError as exc:
+        logger.warning("Video proxy failed, uploading the original: %s", exc)
+        return video_path, lambda: None
+    logger.info(
+        "Video proxy for annotation: %d -> %d bytes",
+        os.path.getsize(video_path), os.path.getsize(path),
+    )
+    return path, release
+
+
+_proxy_executor = ThreadPoolExecutor(
+    max_workers=settings.VIDEO_PROXY_MAX_WORKERS,
+    thread_name_prefix="video-proxy",
+)
+
+
+@contextmanager
+def proxied(video_path: str):
+    """Yield a small stand-in for ``video_path`` to upload for annotation."""
+    if not enabled():
+        yield video_path
+        return
+    # the pool bounds how many ffmpeg encoders run at once across analyses
+    path, release = _proxy_executor.submit(_proxy_or_original, video_path).result()
+    try:
+        yield path
+    finally:
+        release()
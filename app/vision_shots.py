@@ -1,5 +1,27 @@
-from google.cloud import videointelligence
-from .schemas import Shot, KeyObject
+import importlib
+import logging
+from typing import List
+
+from pydantic import TypeAdapter
+
+from . import metrics, video_proxy
+from .key_objects import KeyObjectBuilder, KeyObjectTable
+from .schemas import Shot
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+SHOT_BACKENDS = ("remote", "local", "hybrid")
+
+_SHOTS = TypeAdapter(List[Shot])
+
+
+def __getattr__(name: str):
+    # google-cloud-videointelligence drags in grpc and protobuf, which the
+    # local backend and most CLI commands never need
+    if name == "videointelligence":
+        return importlib.import_module("google.cloud.videointelligence")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _duration_to_seconds(duration) -> float:
@@ -12,30 +34,73 @@ def _duration_to_seconds(duration) -> float:
     return seconds + nanos / 1_000_000_000.0
 
 
-def detect_shots(file_path: str):
-    client = videointelligence.VideoIntelligenceServiceClient()
-    with open(file_path, "rb") as f:
-        input_content = f.read()
-    operation = client.annotate_video(
-        request={
-            "features": [
+def _compact(shots: list[Shot], key_objects: KeyObjectTable) -> KeyObjectTable:
+    compact = key_objects.compact(
+        shots,
+        min_confidence=settings.KEY_OBJECT_MIN_CONFIDENCE,
+        per_shot=settings.KEY_OBJECTS_PER_SHOT,
+        merge_gap=settings.KEY_OBJECT_MERGE_GAP_SECONDS,
+    )
+    logger.info("Key objects: %d label segments -> %d", len(key_objects), len(compact))
+    return compact
+
+
+def detect_shots(file_path: str, backend: str | None = None):
+    backend = backend or settings.SHOT_BACKEND
+    if backend not in SHOT_BACKENDS:
+        raise ValueError(f"Unknown shot backend '{backend}', expected one of {SHOT_BACKENDS}")
+    if backend == "remote":
+        from google.cloud import videointelligence
+
+        shots, key_objects = _annotate(
+            file_path,
+            [
                 videointelligence.Feature.SHOT_CHANGE_DETECTION,
                 videointelligence.Feature.LABEL_DETECTION,
             ],
+        )
+        return shots, _compact(shots, key_objects)
+
+    from .local_shots import detect_shots_local
+
+    shots = detect_shots_local(file_path)
+    if backend == "local":
+        return shots, KeyObjectTable.empty()
+    from google.cloud import videointelligence
+
+    _, key_objects = _annotate(file_path, [videointelligence.Feature.LABEL_DETECTION])
+    return shots, _compact(shots, key_objects)
+
+
+def _annotate(file_path: str, features):
+    from google.cloud import videointelligence
+
+    client = videointelligence.VideoIntelligenceServiceClient()
+    with video_proxy.proxied(file_path) as upload_path:
+        with open(upload_path, "rb") as f:
+            input_content = f.read()
+    metrics.record_bytes("uploaded", "video_intelligence", len(input_content))
+    operation = client.annotate_video(
+        request={
+            "features": features,
             "input_content": input_content,
         }
     )
     result = operation.result(timeout=180)
     annotation_results = getattr(result, "annotation_results", [])
     if not annotation_results:
-        return [], []
+        return [], KeyObjectTable.empty()
     annotation = annotation_results[0]
-    shots = []
-    for shot in getattr(annotation, "shot_annotations", []):
-        start = _duration_to_seconds(getattr(shot, "start_time_offset", None))
-        end = _duration_to_seconds(getattr(shot, "end_time_offset", None))
-        shots.append(Shot(start_sec=start, end_sec=end))
-    key_objects: list[KeyObject] = []
+    shots = _SHOTS.validate_python(
+        [
+            {
+                "start_sec": _duration_to_seconds(getattr(shot, "start_time_offset", None)),
+                "end_sec": _duration_to_seconds(getattr(shot, "end_time_offset", None)),
+            }
+            for shot in getattr(annotation, "shot_annotations", [])
+        ]
+    )
+    key_objects = KeyObjectBuilder()
 
     def _collect_categories(entities) -> list[str]:
         return [
@@ -47,15 +112,7 @@ def detect_shots(file_path: str):
     def _append_key_object(description: str, categories, segment, confidence):
         start = _duration_to_seconds(getattr(segment, "start_time_offset", None)) if segment else 0.0
         end = _duration_to_seconds(getattr(segment, "end_time_offset", None)) if segment else 0.0
-        key_objects.append(
-            KeyObject(
-                description=description or "",
-                categories=list(categories or []),
-                start_sec=start,
-                end_sec=end,
-                confidence=confidence,
-            )
-        )
+        key_objects.add(description or "", categories or [], start, end, confidence)
 
     for label in getattr(annotation, "shot_label_annotations", []):
         description = getattr(getattr(label, "entity", None), "description", "")
@@ -80,4 +137,4 @@ def detect_shots(file_path: str):
         confidence = getattr(obj, "confidence", None)
         _append_key_object(description, categories, segment, confidence)
 
-    return shots, key_objects
+    return shots, key_objects.build()
@@ -0,0 +1,174 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from . import llm_scenario, metrics, pipeline
+from .jobs import JobQueue, get_job_queue
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def run_analyze(payload: Dict[str, Any]) -> Dict[str, Any]:
+    analysis = pipeline.analyze_video(
+        payload["video_id"], force_refresh=bool(payload.get("force_refresh", False))
+    )
+    return analysis.model_dump(mode="json")
+
+
+def run_scenario(payload: Dict[str, Any]) -> Dict[str, Any]:
+    analysis = pipeline.analyze_video(
+        payload["video_id"], force_refresh=bool(payload.get("force_refresh", False))
+    )
+    scn = llm_scenario.make_ru_scenario(
+        analysis.transcript, analysis.shots, payload["topic"], payload.get("llm_cache", "use")
+    )
+    return scn.model_dump(mode="json")
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "analyze": run_analyze,
+    "scenario": run_scenario,
+}
+
+
+def _keep_lease(queue: JobQueue, job_id: str, worker: str, stop: threading.Event) -> None:
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.heartbeat(job_id, worker):
+            logger.warning("Worker %s lost the lease on job %s", worker, job_id)
+            return
+
+
+def process_one(queue: JobQueue, worker: str) -> bool:
+    job = queue.claim(worker)
+    if job is None:
+        return False
+    logger.info("Worker %s running %s job %s (attempt %s)", worker, job.kind, job.id, job.attempts)
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_keep_lease, args=(queue, job.id, worker, stop), daemon=True
+    )
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind](job.payload)
+    except Exception as exc:
+        logger.exception("Job %s failed on attempt %s", job.id, job.attempts)
+        queue.fail(job.id, worker, f"{type(exc).__name__}: {exc}")
+        metrics.registry.inc("jobs_total", kind=job.kind, result="failed")
+    else:
+        queue.complete(job.id, worker, result)
+        metrics.registry.inc("jobs_total", kind=job.kind, result="done")
+    finally:
+        stop.set()
+        heartbeat.join()
+    return True
+
+
+def _drain(queue: JobQueue, worker: str, stop: threading.Event, poll_seconds: float) -> None:
+    while not stop.is_set():
+        try:
+            if process_one(queue, worker):
+                continue
+        except Exception:
+            logger.exception("Worker %s could not talk to the job queue", worker)
+        stop.wait(poll_seconds)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request: " + format, *args)
+
+
+def serve_metrics(port: int, host: str = "") -> ThreadingHTTPServer:
+    """Serve this process's ``/metrics`` from a daemon thread; call ``shutdown()`` to stop."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="worker-metrics", daemon=True).start()
+    logger.info("Worker metrics on port %s", server.server_address[1])
+    return server
+
+
+def run_worker(
+    threads: int = 1, stop: Optional[threading.Event] = None, metrics_port: int = 0
+) -> None:
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+    queue = get_job_queue()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    runners = [
+        threading.Thread(
+            target=_drain,
+            args=(queue, f"{prefix}:{i}", stop, settings.JOB_POLL_SECONDS),
+            name=f"job-worker-{i}",
+        )
+        for i in range(threads)
+    ]
+    server = serve_metrics(metrics_port) if metrics_port else None
+    try:
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain the analysis job queue")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=1, help='Потоков на процесс')
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=settings.WORKER_METRICS_PORT,
+        help='Порт /metrics; процесс i слушает порт + i, 0 — выключено',
+    )
+    args = parser.parse_args()
+    settings.require(*settings.analysis_requirements())
+
+    if args.processes <= 1:
+        run_worker(args.threads, metrics_port=args.metrics_port)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    children = [
+        ctx.Process(
+            target=run_worker,
+            args=(args.threads, None, args.metrics_port + i if args.metrics_port else 0),
+        )
+        for i in range(args.processes)
+    ]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.join()
+
+
+if __name__ == '__main__':
+    main()
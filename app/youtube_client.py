@@ -1,14 +1,21 @@
+import asyncio
 import logging
 import os
+import threading
 import time
-from typing import Any, Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterator, List
 
 import httpx
+from pydantic import TypeAdapter
 
+from . import metrics
+from .api_cache import MemoryBackend, QuotaLedger, ResponseCache, SQLiteBackend
 from .settings import settings
 from .schemas import Candidate
 
 BASE_URL = "https://www.googleapis.com/youtube/v3"
+VIDEOS_BATCH_SIZE = 50
 
 
 class YouTubeAPIRequestError(RuntimeError):
@@ -33,16 +40,195 @@ if _INVALID_LOG_LEVEL:
     )
 
 
-def _request(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+_transport: httpx.BaseTransport | None = None
+_async_transport: httpx.AsyncBaseTransport | None = None
+_client_lock = threading.Lock()
+
+
+_response_cache: ResponseCache | None = None
+_response_cache_ready = False
+quota_ledger = QuotaLedger()
+
+
+def _quota_samples():
+    for path, quota in quota_ledger.report().items():
+        yield "youtube_requests_total", {"endpoint": path, "status": "ok"}, quota["calls"] - quota["failed"]
+        yield "youtube_requests_total", {"endpoint": path, "status": "error"}, quota["failed"]
+        yield "youtube_quota_units_total", {"endpoint": path}, quota["units_spent"]
+        yield "youtube_quota_units_saved_total", {"endpoint": path}, quota["units_saved"]
+        yield "youtube_cache_hits_total", {"endpoint": path}, quota["cache_hits"]
+        yield "youtube_revalidations_total", {"endpoint": path}, quota["revalidated"]
+
+
+metrics.registry.add_collector(_quota_samples)
+
+
+def get_response_cache() -> ResponseCache | None:
+    global _response_cache, _response_cache_ready
+    with _client_lock:
+        if not _response_cache_ready:
+            _response_cache = _build_response_cache()
+            _response_cache_ready = True
+        return _response_cache
+
+
+def set_response_cache(cache: ResponseCache | None) -> None:
+    global _response_cache, _response_cache_ready
+    with _client_lock:
+        _response_cache = cache
+        _response_cache_ready = True
+
+
+def _build_response_cache() -> ResponseCache | None:
+    backend_name = settings.YOUTUBE_CACHE_BACKEND.lower()
+    if backend_name == "memory":
+        backend = MemoryBackend(settings.YOUTUBE_CACHE_MAX_ENTRIES)
+    elif backend_name == "sqlite":
+        backend = SQLiteBackend(settings.YOUTUBE_CACHE_PATH, settings.YOUTUBE_CACHE_MAX_ENTRIES)
+    else:
+        return None
+    return ResponseCache(
+        backend,
+        ttls={
+            "/search": settings.YOUTUBE_CACHE_TTL_SEARCH,
+            "/videos": settings.YOUTUBE_CACHE_TTL_VIDEOS,
+        },
+        revalidate=frozenset({"/videos"}),
+    )
+
+
+def quota_report() -> Dict[str, Dict[str, int]]:
+    return quota_ledger.report()
+
+
+def _client_options() -> Dict[str, Any]:
+    http2 = settings.YOUTUBE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("YOUTUBE_HTTP2 is enabled but the 'h2' package is missing; using HTTP/1.1.")
+            http2 = False
+    return {
+        "timeout": 30,
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=settings.YOUTUBE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.YOUTUBE_MAX_KEEPALIVE,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(transport=_transport, **_client_options())
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(transport=_async_transport, **_client_options())
+        return _async_client
+
+
+def startup(
+    transport: httpx.BaseTransport | None = None,
+    async_transport: httpx.AsyncBaseTransport | None = None,
+) -> None:
+    """Open the shared connection pools; transports can be injected for tests."""
+    global _transport, _async_transport
+    shutdown()
+    _transport = transport
+    _async_transport = async_transport
+    get_client()
+
+
+def shutdown() -> None:
+    global _client, _async_client
+    with _client_lock:
+        client, _client = _client, None
+        async_client, _async_client = _async_client, None
+    if client is not None:
+        client.close()
+    if async_client is not None and not async_client.is_closed:
+        logger.warning("Async YouTube client dropped without shutdown_async(); connections leak until GC.")
+
+
+async def shutdown_async() -> None:
+    global _async_client
+    with _client_lock:
+        async_client, _async_client = _async_client, None
+    if async_client is not None:
+        await async_client.aclose()
+    shutdown()
+
+
+def _prepare_params(params: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, Any]]:
     params = dict(params)
     params["key"] = settings.YOUTUBE_API_KEY
     sanitized_params = {k: v for k, v in params.items() if k != "key"}
+    return params, sanitized_params
+
+
+def _cache_lookup(path: str, sanitized_params: Dict[str, Any]):
+    cache = get_response_cache()
+    if cache is None:
+        return None, None, None, False
+    cache_key = cache.key(path, sanitized_params)
+    entry = cache.get(cache_key)
+    fresh = entry is not None and cache.is_fresh(path, entry)
+    if fresh:
+        quota_ledger.save(path)
+        logger.debug("Serving %s from cache (age %.1fs)", path, entry.age())
+    return cache, cache_key, entry, fresh
+
+
+def _handle_response(path: str, resp: httpx.Response, cache, cache_key, entry) -> Dict[str, Any]:
+    if resp.status_code == 304 and entry is not None:
+        quota_ledger.spend(path, revalidated=True)
+        cache.refresh(cache_key, entry)
+        return entry.body
+    # YouTube charges for every request it answers, rejected and retried ones included.
+    quota_ledger.spend(path, failed=resp.is_error)
+    resp.raise_for_status()
+    body = resp.json()
+    if cache is not None:
+        cache.store(cache_key, body, resp.headers.get("ETag") or body.get("etag"))
+    return body
+
+
+def _exhausted(path: str, max_attempts: int, sanitized_params: Dict[str, Any]) -> YouTubeAPIRequestError:
+    logger.error(
+        "Request to %s exhausted %s attempts with params %s.",
+        path,
+        max_attempts,
+        sanitized_params,
+    )
+    return YouTubeAPIRequestError(
+        f"Failed to call YouTube API endpoint '{path}' after {max_attempts} attempts."
+    )
+
+
+def _request(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    params, sanitized_params = _prepare_params(params)
 
     max_attempts = 3
     backoff_seconds = 1.0
     last_exception: Exception | None = None
 
-    with httpx.Client(timeout=30) as client:
+    cache, cache_key, entry, fresh = _cache_lookup(path, sanitized_params)
+    if fresh:
+        return entry.body
+    headers = cache.conditional_headers(path, entry) if cache is not None else {}
+
+    client = get_client()
+    with metrics.registry.timer("youtube_request_seconds", endpoint=path):
         for attempt in range(1, max_attempts + 1):
             logger.info(
                 "Requesting %s with params %s (attempt %s/%s)",
@@ -52,9 +238,8 @@ def _request(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
                 max_attempts,
             )
             try:
-                resp = client.get(f"{BASE_URL}{path}", params=params)
-                resp.raise_for_status()
-                return resp.json()
+                resp = client.get(f"{BASE_URL}{path}", params=params, headers=headers)
+                return _handle_response(path, resp, cache, cache_key, entry)
             except httpx.HTTPError as exc:
                 last_exception = exc
                 logger.warning(
@@ -65,18 +250,53 @@ def _request(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
                     exc,
                 )
                 if attempt < max_attempts:
+                    metrics.registry.inc("youtube_retries_total", endpoint=path)
                     time.sleep(backoff_seconds)
                     backoff_seconds *= 2
 
-    logger.error(
-        "Request to %s exhausted %s attempts with params %s.",
-        path,
-        max_attempts,
-        sanitized_params,
-    )
-    raise YouTubeAPIRequestError(
-        f"Failed to call YouTube API endpoint '{path}' after {max_attempts} attempts."
-    ) from last_exception
+    raise _exhausted(path, max_attempts, sanitized_params) from last_exception
+
+
+async def _request_async(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    params, sanitized_params = _prepare_params(params)
+
+    max_attempts = 3
+    backoff_seconds = 1.0
+    last_exception: Exception | None = None
+
+    cache, cache_key, entry, fresh = _cache_lookup(path, sanitized_params)
+    if fresh:
+        return entry.body
+    headers = cache.conditional_headers(path, entry) if cache is not None else {}
+
+    client = get_async_client()
+    with metrics.registry.timer("youtube_request_seconds", endpoint=path):
+        for attempt in range(1, max_attempts + 1):
+            logger.info(
+                "Requesting %s with params %s (attempt %s/%s)",
+                path,
+                sanitized_params,
+                attempt,
+                max_attempts,
+            )
+            try:
+                resp = await client.get(f"{BASE_URL}{path}", params=params, headers=headers)
+                return _handle_response(path, resp, cache, cache_key, entry)
+            except httpx.HTTPError as exc:
+                last_exception = exc
+                logger.warning(
+                    "Request to %s failed on attempt %s/%s: %s",
+                    path,
+                    attempt,
+                    max_attempts,
+                    exc,
+                )
+                if attempt < max_attempts:
+                    metrics.registry.inc("youtube_retries_total", endpoint=path)
+                    await asyncio.sleep(backoff_seconds)
+                    backoff_seconds *= 2
+
+    raise _exhausted(path, max_attempts, sanitized_params) from last_exception
 
 
 def search_list(**params) -> Dict[str, Any]:
@@ -87,7 +307,15 @@ def videos_list(**params) -> Dict[str, Any]:
     return _request("/videos", params)
 
 
-def search_trending(topic: str, n: int, region: str, published_after: str, shorts: bool = True) -> List[Candidate]:
+async def search_list_async(**params) -> Dict[str, Any]:
+    return await _request_async("/search", params)
+
+
+async def videos_list_async(**params) -> Dict[str, Any]:
+    return await _request_async("/videos", params)
+
+
+def _search_params(topic: str, n: int, region: str, published_after: str, shorts: bool) -> Dict[str, Any]:
     params = {
         "part": "snippet",
         "type": "video",
@@ -99,24 +327,166 @@ def search_trending(topic: str, n: int, region: str, published_after: str, short
     }
     if shorts:
         params["videoDuration"] = "short"
-    search_resp = search_list(**params)
-    video_ids = [item["id"]["videoId"] for item in search_resp.get("items", [])][:n]
-    if not video_ids:
-        return []
-    videos_resp = videos_list(part="snippet,contentDetails,statistics", id=",".join(video_ids))
-    candidates: List[Candidate] = []
+    return params
+
+
+_CANDIDATES = TypeAdapter(List[Candidate])
+
+
+def _candidates_from_videos(videos_resp: Dict[str, Any], shorts: bool) -> List[Candidate]:
+    rows = []
     for item in videos_resp.get("items", []):
         stats = item.get("statistics", {})
         snippet = item.get("snippet", {})
-        candidates.append(
-            Candidate(
-                video_id=item["id"],
-                title=snippet.get("title", ""),
-                channel_title=snippet.get("channelTitle", ""),
-                published_at=snippet.get("publishedAt"),
-                view_count=int(stats.get("viewCount", 0)),
-                like_count=int(stats.get("likeCount", 0)),
-                is_shorts=shorts,
-            )
+        rows.append(
+            {
+                "video_id": item["id"],
+                "title": snippet.get("title", ""),
+                "channel_title": snippet.get("channelTitle", ""),
+                "published_at": snippet.get("publishedAt"),
+                # the API sends counts as strings; lax validation parses them
+                "view_count": stats.get("viewCount", 0),
+                "like_count": stats.get("likeCount", 0),
+                "is_shorts": shorts,
+            }
         )
-    return candidates
+    return _CANDIDATES.validate_python(rows)
+
+
+def _page_video_ids(search_resp: Dict[str, Any], seen: set[str], limit: int) -> List[str]:
+    video_ids: List[str] = []
+    for item in search_resp.get("items", []):
+        video_id = item["id"]["videoId"]
+        if video_id in seen:
+            continue
+        seen.add(video_id)
+        video_ids.append(video_id)
+        if len(video_ids) >= limit:
+            break
+    return video_ids
+
+
+def id_batches(video_ids: List[str]) -> Iterator[List[str]]:
+    """Split ids into the ``VIDEOS_BATCH_SIZE`` groups one ``videos.list`` call accepts."""
+    for i in range(0, len(video_ids), VIDEOS_BATCH_SIZE):
+        yield video_ids[i:i + VIDEOS_BATCH_SIZE]
+
+
+def _iter_search_pages(topic: str, n: int, region: str, published_after: str, shorts: bool) -> Iterator[List[str]]:
+    params = _search_params(topic, n, region, published_after, shorts)
+    seen: set[str] = set()
+    while len(seen) < n:
+        search_resp = search_list(**params)
+        video_ids = _page_video_ids(search_resp, seen, n - len(seen))
+        if video_ids:
+            yield video_ids
+        page_token = search_resp.get("nextPageToken")
+        if not page_token or not search_resp.get("items"):
+            break
+        params["pageToken"] = page_token
+
+
+def fetch_candidates(video_ids: List[str], shorts: bool) -> List[Candidate]:
+    """Current snippet and statistics of up to ``VIDEOS_BATCH_SIZE`` videos in
+    one ``videos.list`` call; ids it no longer returns are left out."""
+    videos_resp = videos_list(part="snippet,contentDetails,statistics", id=",".join(video_ids))
+    return _candidates_from_videos(videos_resp, shorts)
+
+
+def _iter_trending_batches(
+    topic: str, n: int, region: str, published_after: str, shorts: bool
+) -> Iterator[tuple[int, List[Candidate]]]:
+    # yields (search rank of the first id in the batch, candidates) in arrival order
+    pool = ThreadPoolExecutor(
+        max_workers=settings.YOUTUBE_BATCH_CONCURRENCY,
+        thread_name_prefix="youtube-batch",
+    )
+    pending: Dict[Future, int] = {}
+    offset = 0
+    try:
+        for video_ids in _iter_search_pages(topic, n, region, published_after, shorts):
+            for chunk in id_batches(video_ids):
+                pending[pool.submit(fetch_candidates, chunk, shorts)] = offset
+                offset += len(chunk)
+            for future in [f for f in pending if f.done()]:
+                yield pending.pop(future), future.result()
+        for future in as_completed(list(pending)):
+            yield pending.pop(future), future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_trending(
+    topic: str, n: int, region: str, published_after: str, shorts: bool = True
+) -> Iterator[Candidate]:
+    """Stream up to ``n`` candidates, following search pages and batching ``videos.list`` calls."""
+    for _, candidates in _iter_trending_batches(topic, n, region, published_after, shorts):
+        yield from candidates
+
+
+def search_trending(topic: str, n: int, region: str, published_after: str, shorts: bool = True) -> List[Candidate]:
+    batches = sorted(_iter_trending_batches(topic, n, region, published_after, shorts), key=lambda b: b[0])
+    return [candidate for _, candidates in batches for candidate in candidates]
+
+
+async def _iter_search_pages_async(
+    topic: str, n: int, region: str, published_after: str, shorts: bool
+) -> AsyncIterator[List[str]]:
+    params = _search_params(topic, n, region, published_after, shorts)
+    seen: set[str] = set()
+    while len(seen) < n:
+        search_resp = await search_list_async(**params)
+        video_ids = _page_video_ids(search_resp, seen, n - len(seen))
+        if video_ids:
+            yield video_ids
+        page_token = search_resp.get("nextPageToken")
+        if not page_token or not search_resp.get("items"):
+            break
+        params["pageToken"] = page_token
+
+
+async def _fetch_candidates_async(
+    offset: int, video_ids: List[str], shorts: bool, semaphore: asyncio.Semaphore
+) -> tuple[int, List[Candidate]]:
+    async with semaphore:
+        videos_resp = await videos_list_async(part="snippet,contentDetails,statistics", id=",".join(video_ids))
+    return offset, _candidates_from_videos(videos_resp, shorts)
+
+
+async def _iter_trending_batches_async(
+    topic: str, n: int, region: str, published_after: str, shorts: bool
+) -> AsyncIterator[tuple[int, List[Candidate]]]:
+    semaphore = asyncio.Semaphore(settings.YOUTUBE_BATCH_CONCURRENCY)
+    pending: set[asyncio.Task] = set()
+    offset = 0
+    try:
+        async for video_ids in _iter_search_pages_async(topic, n, region, published_after, shorts):
+            for chunk in id_batches(video_ids):
+                pending.add(asyncio.create_task(_fetch_candidates_async(offset, chunk, shorts, semaphore)))
+                offset += len(chunk)
+            for task in [t for t in pending if t.done()]:
+                pending.discard(task)
+                yield task.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def iter_trending_async(
+    topic: str, n: int, region: str, published_after: str, shorts: bool = True
+) -> AsyncIterator[Candidate]:
+    async for _, candidates in _iter_trending_batches_async(topic, n, region, published_after, shorts):
+        for candidate in candidates:
+            yield candidate
+
+
+async def search_trending_async(
+    topic: str, n: int, region: str, published_after: str, shorts: bool = True
+) -> List[Candidate]:
+    batches = [b async for b in _iter_trending_batches_async(topic, n, region, published_after, shorts)]
+    batches.sort(key=lambda b: b[0])
+    return [candidate for _, candidates in batches for candidate in candidates]
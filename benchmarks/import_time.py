@@ -0,0 +1,97 @@
+"""Measure entry-point import time with ``python -X importtime``.
+
+Each module is imported in a fresh interpreter several times and the
+fastest run is reported, together with the modules that cost the most and
+any heavy dependency that should only load on demand:
+
+    python -m benchmarks.import_time app.cli app.worker --runs 5
+
+``--max-ms`` turns the report into a regression guard: the exit status is
+non-zero when an entry point is slower than the budget or loads a heavy
+dependency at import time.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+# imported only by the code paths that talk to these services
+HEAVY = ("yt_dlp", "google.cloud.videointelligence", "openai")
+ENTRY_POINTS = ("app.cli", "app.worker", "app.main")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append(
+                {"name": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": len(indent) // 2}
+            )
+    return rows
+
+
+def import_profile(module: str) -> List[dict]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def heavy_imports(rows: List[dict]) -> List[str]:
+    names = {row["name"] for row in rows}
+    return [heavy for heavy in HEAVY if heavy in names]
+
+
+def measure(module: str, runs: int, top: int) -> Dict:
+    profiles = [import_profile(module) for _ in range(max(1, runs))]
+    totals = [next(r["cumulative_us"] for r in rows if r["name"] == module) for rows in profiles]
+    best = profiles[totals.index(min(totals))]
+    # only first-party modules and top-level third-party packages, so a
+    # package is not counted once for itself and again for its submodules
+    roots = [r for r in best if r["depth"] <= 1 or r["name"].startswith("app.")]
+    return {
+        "module": module,
+        "best_ms": min(totals) / 1000,
+        "median_ms": sorted(totals)[len(totals) // 2] / 1000,
+        "heavy": heavy_imports(best),
+        "top": [
+            {"name": r["name"], "cumulative_ms": r["cumulative_us"] / 1000}
+            for r in sorted(roots, key=lambda r: r["cumulative_us"], reverse=True)
+            if r["name"] != module
+        ][:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    parser.add_argument("--max-ms", type=float, default=0, help="fail when an import is slower than this")
+    args = parser.parse_args()
+
+    reports = [measure(module, args.runs, args.top) for module in args.modules]
+    print(json.dumps(reports, indent=2))
+    failed = [
+        r["module"] for r in reports if r["heavy"] or (args.max_ms and r["best_ms"] > args.max_ms)
+    ]
+    if failed:
+        print(f"import budget exceeded: {', '.join(failed)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
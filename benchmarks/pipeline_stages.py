@@ -0,0 +1,188 @@
+"""Time every pipeline stage against local stand-ins of the external services.
+
+YouTube Data API, media download, Whisper, Video Intelligence and chat
+completions are replayed from ``benchmarks/fixtures`` (see ``standins.py``)
+with the latencies recorded in ``fixtures/profile.json``. Nothing leaves
+the machine and no credentials are needed:
+
+    python -m benchmarks.pipeline_stages --runs 3 --output bench.json
+
+``--latency-scale 0`` drops the simulated network time and leaves only the
+pipeline's own overhead; ``--latency chat=1.5`` overrides one service.
+With ``--baseline`` the run is compared with an earlier report and the exit
+status is non-zero when a stage got slower than ``--tolerance`` allows:
+
+    python -m benchmarks.pipeline_stages --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import standins
+
+STAGES = (
+    "search_trending",
+    "pull_transient",
+    "transcribe",
+    "detect_shots",
+    "make_ru_scenario",
+    "plan_timeline",
+    "api_analyze",
+    "api_scenario",
+)
+VIDEO_ID = "stand-in-01"
+TOPIC = "айфон лайфхаки"
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {
+        "runs": len(samples),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def _time(fn: Callable[[], object], runs: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _stages(stack: ExitStack) -> Dict[str, Callable[[], object]]:
+    from fastapi.testclient import TestClient
+
+    from app import llm_scenario, llm_storyboard, main, media_probe, stt, vision_shots, youtube_client
+    from app.schemas import Scenario
+
+    # the later stages read the same media, downloaded once up front
+    audio_path, video_path = stack.enter_context(media_probe.pull_transient(VIDEO_ID))
+    transcript = stt.transcribe(audio_path)
+    shots, _ = vision_shots.detect_shots(video_path)
+    chat = standins.load_fixture("chat_completions.json")
+    scenario = Scenario.model_validate(chat["scenario"])
+    api = stack.enter_context(TestClient(main.app))
+
+    def pull():
+        with media_probe.pull_transient(VIDEO_ID):
+            pass
+
+    def post(path: str, payload: dict):
+        def call():
+            resp = api.post(path, json=payload)
+            resp.raise_for_status()
+
+        return call
+
+    return {
+        "search_trending": lambda: youtube_client.search_trending(TOPIC, 50, "RU", "2025-08-01T00:00:00Z"),
+        "pull_transient": pull,
+        "transcribe": lambda: stt.transcribe(audio_path),
+        "detect_shots": lambda: vision_shots.detect_shots(video_path),
+        "make_ru_scenario": lambda: llm_scenario.make_ru_scenario(transcript, shots, TOPIC, cache_mode="bypass"),
+        "plan_timeline": lambda: llm_storyboard.plan_timeline(scenario, "shorts", cache_mode="bypass"),
+        "api_analyze": post("/analyze", {"video_id": VIDEO_ID}),
+        "api_scenario": post("/scenario", {"video_id": VIDEO_ID, "topic": TOPIC, "llm_cache": "bypass"}),
+    }
+
+
+def run_suite(
+    latency: Dict[str, float], runs: int = 3, warmup: int = 1, only: Optional[List[str]] = None
+) -> Dict:
+    with standins.stand_ins(latency) as server, ExitStack() as stack:
+        stages = _stages(stack)
+        results = {}
+        for name in only or STAGES:
+            results[name] = summarize(_time(stages[name], runs, warmup))
+        requests = dict(server.requests)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "latency": latency,
+            "runs": runs,
+            "warmup": warmup,
+            "requests": requests,
+        },
+        "stages": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[Dict]:
+    """Median of each stage against the baseline; a stage regresses when it is
+    both ``tolerance`` slower relatively and ``min_delta_ms`` slower absolutely."""
+    rows = []
+    for name, current in report["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before is None:
+            continue
+        delta = current["median_ms"] - before["median_ms"]
+        ratio = current["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        rows.append(
+            {
+                "stage": name,
+                "baseline_ms": before["median_ms"],
+                "current_ms": current["median_ms"],
+                "ratio": round(ratio, 3),
+                "regression": ratio > 1 + tolerance and delta > min_delta_ms,
+            }
+        )
+    return rows
+
+
+def _latency(args) -> Dict[str, float]:
+    latency = standins.recorded_latency(args.latency_scale)
+    for override in args.latency:
+        service, _, seconds = override.partition("=")
+        if service not in standins.SERVICES:
+            raise SystemExit(f"unknown service '{service}', expected one of {standins.SERVICES}")
+        latency[service] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--stage", action="append", choices=STAGES, help="run only these stages")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for the recorded latencies")
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SECONDS")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown of a median")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    report = run_suite(_latency(args), args.runs, args.warmup, args.stage)
+    failed = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        report["comparison"] = rows
+        failed = [row["stage"] for row in rows if row["regression"]]
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    if failed:
+        print(f"regressions: {', '.join(failed)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
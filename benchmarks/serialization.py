@@ -0,0 +1,142 @@
+"""Compare the old per-item validation and encoding paths with the bulk ones.
+
+Builds a synthetic Whisper response and Video Intelligence annotation of the
+given size and times, for each, the previous code path against the current
+one:
+
+    python -m benchmarks.serialization --segments 5000 --shots 3000 --labels 20000
+
+- ``transcript``: ``Segment(**model_dump())`` per segment vs one
+  ``TypeAdapter(list[Segment])`` call reading attributes
+- ``shots``: ``Shot(...)`` per annotation vs one bulk validation
+- ``response``: FastAPI's ``jsonable_encoder`` + ``json.dumps`` vs
+  ``model_dump(mode="json")`` + orjson, as ``ORJSONResponse`` does
+- ``cli``: ``json.dumps(model_dump(), indent=2)`` vs ``model_dump_json()``
+"""
+import argparse
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app import stt, vision_shots
+from app.key_objects import KeyObjectBuilder
+from app.schemas import AnalysisResult, Segment, Shot, Transcript
+
+
+class SdkSegment(BaseModel):
+    """Shape of the OpenAI SDK's verbose_json segment."""
+
+    id: int
+    seek: int
+    start: float
+    end: float
+    text: str
+    tokens: List[int]
+    temperature: float
+    avg_logprob: float
+    compression_ratio: float
+    no_speech_prob: float
+
+
+def _best(fn: Callable[[], object], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return min(samples) * 1000
+
+
+def _compare(old: Callable[[], object], new: Callable[[], object], runs: int) -> Dict[str, float]:
+    old_ms, new_ms = _best(old, runs), _best(new, runs)
+    return {"old_ms": round(old_ms, 3), "new_ms": round(new_ms, 3), "speedup": round(old_ms / new_ms, 2)}
+
+
+def build_inputs(segments: int, shots: int, labels: int, seed: int = 0):
+    rng = random.Random(seed)
+    sdk_segments, t = [], 0.0
+    for i in range(segments):
+        d = rng.uniform(1.0, 4.0)
+        sdk_segments.append(
+            SdkSegment(
+                id=i, seek=int(t * 100), start=t, end=t + d, text=f" фраза номер {i} про айфон",
+                tokens=[50364 + i] * 12, temperature=0.0, avg_logprob=-0.2,
+                compression_ratio=1.3, no_speech_prob=0.01,
+            )
+        )
+        t += d
+    offsets = sorted(rng.uniform(0, t) for _ in range(shots))
+    shot_annotations = [
+        type("ShotAnnotation", (), {"start_time_offset": a, "end_time_offset": b})()
+        for a, b in zip([0.0] + offsets, offsets + [t])
+    ]
+    builder = KeyObjectBuilder()
+    for _ in range(labels):
+        start = rng.uniform(0, t)
+        builder.add(f"label{rng.randrange(200)}", ["category"], start, start + rng.uniform(0.5, 5), rng.random())
+    analysis = AnalysisResult(
+        transcript=Transcript(segments=[Segment(text=s.text, start=s.start, end=s.end) for s in sdk_segments]),
+        shots=[Shot(start_sec=s.start_time_offset, end_sec=s.end_time_offset) for s in shot_annotations],
+        key_objects=builder.build(),
+    )
+    return sdk_segments, shot_annotations, analysis
+
+
+def run(segments: int, shots: int, labels: int, runs: int) -> Dict:
+    sdk_segments, shot_annotations, analysis = build_inputs(segments, shots, labels)
+    response = type("Transcription", (), {"segments": sdk_segments})()
+    duration = vision_shots._duration_to_seconds
+    return {
+        "sizes": {"segments": segments, "shots": shots, "key_objects": len(analysis.key_objects)},
+        "transcript": _compare(
+            lambda: Transcript(segments=[Segment(**s.model_dump()) for s in sdk_segments]),
+            lambda: stt._transcript_from_response(response),
+            runs,
+        ),
+        "shots": _compare(
+            lambda: [
+                Shot(start_sec=duration(s.start_time_offset), end_sec=duration(s.end_time_offset))
+                for s in shot_annotations
+            ],
+            lambda: vision_shots._SHOTS.validate_python(
+                [
+                    {"start_sec": duration(s.start_time_offset), "end_sec": duration(s.end_time_offset)}
+                    for s in shot_annotations
+                ]
+            ),
+            runs,
+        ),
+        "response": _compare(
+            lambda: json.dumps(jsonable_encoder(analysis), ensure_ascii=False, separators=(",", ":")).encode(),
+            lambda: orjson.dumps(analysis.model_dump(mode="json")),
+            runs,
+        ),
+        "cli": _compare(
+            lambda: json.dumps(analysis.model_dump(), ensure_ascii=False, indent=2),
+            lambda: analysis.model_dump_json(),
+            runs,
+        ),
+        "cli_bytes": {
+            "old": len(json.dumps(analysis.model_dump(), ensure_ascii=False, indent=2).encode()),
+            "new": len(analysis.model_dump_json().encode()),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=5000)
+    parser.add_argument("--shots", type=int, default=3000)
+    parser.add_argument("--labels", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.segments, args.shots, args.labels, args.runs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
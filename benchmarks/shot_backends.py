@@ -0,0 +1,114 @@
+"""Compare shot-detection backends on accuracy and latency.
+
+Synthetic mode needs nothing but NumPy and scores the local detector
+against known cut positions:
+
+    python -m benchmarks.shot_backends --synthetic 20
+
+File mode decodes real clips with ffmpeg. With ``--remote`` the Video
+Intelligence shots are used as the reference for the local backend:
+
+    python -m benchmarks.shot_backends clip1.mp4 clip2.mp4 --remote
+"""
+import argparse
+import json
+import time
+from typing import List
+
+import numpy as np
+
+from app import local_shots
+from app.settings import settings
+
+
+def match_boundaries(predicted: List[float], reference: List[float], tolerance: float) -> dict:
+    unmatched = list(reference)
+    hits = 0
+    for boundary in predicted:
+        best = min(unmatched, key=lambda ref: abs(ref - boundary), default=None)
+        if best is not None and abs(best - boundary) <= tolerance:
+            unmatched.remove(best)
+            hits += 1
+    precision = hits / len(predicted) if predicted else 1.0
+    recall = hits / len(reference) if reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def _boundaries(shots) -> List[float]:
+    return [shot.start_sec for shot in shots[1:]]
+
+
+def synthetic_clip(rng: np.random.Generator, fps: float, seconds: float, size: int = 64):
+    count = int(seconds * fps)
+    cuts = np.sort(rng.choice(np.arange(int(fps), count - int(fps)), size=rng.integers(2, 8), replace=False))
+    cuts = [c for i, c in enumerate(cuts) if i == 0 or c - cuts[i - 1] >= fps]
+    frames = np.empty((count, size, size, 3), dtype=np.uint8)
+    edges = [0, *cuts, count]
+    for start, end in zip(edges, edges[1:]):
+        base = rng.integers(0, 256, size=(size // 8, size // 8, 3)).repeat(8, 0).repeat(8, 1)
+        drift = np.linspace(0, rng.uniform(-40, 40), end - start)
+        for offset, frame_index in enumerate(range(start, end)):
+            noise = rng.integers(-8, 9, size=base.shape)
+            frames[frame_index] = np.clip(base + drift[offset] + noise, 0, 255)
+    return frames, [c / fps for c in cuts]
+
+
+def run_synthetic(clips: int, fps: float, tolerance: float, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    scores, latencies = [], []
+    for _ in range(clips):
+        frames, reference = synthetic_clip(rng, fps, seconds=60)
+        started = time.perf_counter()
+        predicted = local_shots.detect_boundaries(frames, fps)
+        latencies.append(time.perf_counter() - started)
+        scores.append(match_boundaries(predicted, reference, tolerance))
+    return {
+        "mode": "synthetic",
+        "clips": clips,
+        "local": {
+            "latency_sec_mean": float(np.mean(latencies)),
+            "latency_sec_p95": float(np.percentile(latencies, 95)),
+            **{k: float(np.mean([s[k] for s in scores])) for k in ("precision", "recall", "f1")},
+        },
+    }
+
+
+def run_files(paths: List[str], remote: bool, tolerance: float) -> dict:
+    from app import vision_shots
+
+    results = []
+    for path in paths:
+        row = {"path": path}
+        started = time.perf_counter()
+        local = local_shots.detect_shots_local(path)
+        row["local"] = {"latency_sec": time.perf_counter() - started, "shots": len(local)}
+        if remote:
+            started = time.perf_counter()
+            reference, _ = vision_shots.detect_shots(path, backend="remote")
+            row["remote"] = {"latency_sec": time.perf_counter() - started, "shots": len(reference)}
+            row["local"].update(match_boundaries(_boundaries(local), _boundaries(reference), tolerance))
+        results.append(row)
+    return {"mode": "files", "fps": settings.LOCAL_SHOTS_FPS, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of generated clips")
+    parser.add_argument("--remote", action="store_true", help="use Video Intelligence as the reference")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="boundary match tolerance, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        report = run_synthetic(args.synthetic, settings.LOCAL_SHOTS_FPS, args.tolerance, args.seed)
+    elif args.paths:
+        report = run_files(args.paths, args.remote, args.tolerance)
+    else:
+        parser.error("pass clip paths or --synthetic N")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
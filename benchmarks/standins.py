@@ -0,0 +1,265 @@
+"""Local stand-ins for every external service the pipeline talks to.
+
+``StandInServer`` is a real HTTP server on 127.0.0.1 that replays the
+recorded YouTube Data API, Whisper and chat-completion responses in
+``fixtures/`` and serves media bytes for the download stage. Video
+Intelligence speaks gRPC, so it is replaced in-process by
+``FakeVideoIntelligenceClient``. Every service sleeps for its configured
+latency before answering, so timings include realistic waits while the
+pipeline's own overhead stays measurable with the latency set to zero.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SERVICES = ("youtube", "media", "whisper", "video_intelligence", "chat")
+
+
+def load_fixture(name: str) -> Any:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def recorded_latency(scale: float = 1.0) -> Dict[str, float]:
+    return {name: seconds * scale for name, seconds in load_fixture("profile.json")["latency"].items()}
+
+
+class StandInServer:
+    def __init__(self, latency: Optional[Dict[str, float]] = None):
+        self.latency = {name: 0.0 for name in SERVICES}
+        self.latency.update(latency or {})
+        self.requests: Dict[str, int] = {name: 0 for name in SERVICES}
+        self._lock = threading.Lock()
+        self._search = load_fixture("youtube_search.json")["pages"]
+        self._videos = {item["id"]: item for item in load_fixture("youtube_videos.json")["items"]}
+        self._whisper = json.dumps(load_fixture("whisper.json"), ensure_ascii=False).encode("utf-8")
+        chat = load_fixture("chat_completions.json")
+        self._scenario = json.dumps(chat["scenario"], ensure_ascii=False)
+        self._story_scenes = chat["storyboard_scenes"]
+        sizes = load_fixture("profile.json")["media_bytes"]
+        self._media = {kind: os.urandom(size) for kind, size in sizes.items()}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stand-in", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def wait(self, service: str) -> None:
+        with self._lock:
+            self.requests[service] += 1
+        if self.latency[service] > 0:
+            time.sleep(self.latency[service])
+
+    def search_page(self, token: str) -> Dict[str, Any]:
+        return self._search.get(token, {"items": []})
+
+    def videos(self, ids: str) -> Dict[str, Any]:
+        return {"kind": "youtube#videoListResponse", "items": [self._videos[i] for i in ids.split(",") if i in self._videos]}
+
+    def completion(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if request["model"] == "gpt-5-mini":
+            content = self._scenario
+        else:
+            # a storyboard window must answer with exactly one scene per input scene
+            wanted = len(json.loads(request["messages"][-1]["content"])["scenes"])
+            scenes = [self._story_scenes[i % len(self._story_scenes)] for i in range(wanted)]
+            content = json.dumps({"scenes": scenes}, ensure_ascii=False)
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, payload: Any) -> None:
+                self._send(200, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                if parsed.path == "/youtube/v3/search":
+                    server.wait("youtube")
+                    self._json(server.search_page(query.get("pageToken", "")))
+                elif parsed.path == "/youtube/v3/videos":
+                    server.wait("youtube")
+                    self._json(server.videos(query.get("id", "")))
+                elif parsed.path.startswith("/media/") and parsed.path[7:] in server._media:
+                    server.wait("media")
+                    self._send(200, server._media[parsed.path[7:]], "application/octet-stream")
+                else:
+                    self._send(404, b"{}")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == "/v1/audio/transcriptions":
+                    server.wait("whisper")
+                    self._send(200, server._whisper)
+                elif self.path == "/v1/chat/completions":
+                    server.wait("chat")
+                    self._json(server.completion(json.loads(body)))
+                else:
+                    self._send(404, b"{}")
+
+        return Handler
+
+
+def _offset(seconds: float) -> timedelta:
+    return timedelta(seconds=seconds)
+
+
+def _labels(recorded) -> list:
+    return [
+        SimpleNamespace(
+            entity=SimpleNamespace(description=label["description"]),
+            category_entities=[SimpleNamespace(description=c) for c in label["categories"]],
+            segments=[
+                SimpleNamespace(
+                    segment=SimpleNamespace(start_time_offset=_offset(start), end_time_offset=_offset(end)),
+                    confidence=confidence,
+                )
+                for start, end, confidence in label["segments"]
+            ],
+        )
+        for label in recorded
+    ]
+
+
+class FakeVideoIntelligenceClient:
+    """Drop-in for ``VideoIntelligenceServiceClient`` answering from the recording."""
+
+    server: Optional[StandInServer] = None
+
+    def __init__(self, *args, **kwargs):
+        recorded = load_fixture("video_intelligence.json")
+        self._annotation = SimpleNamespace(
+            shot_annotations=[
+                SimpleNamespace(start_time_offset=_offset(start), end_time_offset=_offset(end))
+                for start, end in recorded["shots"]
+            ],
+            shot_label_annotations=_labels(recorded["shot_labels"]),
+            segment_label_annotations=_labels(recorded["segment_labels"]),
+            object_annotations=[],
+        )
+
+    def annotate_video(self, request):
+        self.server.wait("video_intelligence")
+        result = SimpleNamespace(annotation_results=[self._annotation])
+        return SimpleNamespace(result=lambda timeout=None: result)
+
+
+def media_downloader(server: StandInServer):
+    """Replacement for ``media_probe._ydl_download`` that fetches from ``server``."""
+
+    def download(url: str, ydl_opts: dict) -> None:
+        video_id = parse_qs(urlparse(url).query)["v"][0]
+        template = ydl_opts["outtmpl"].replace("%(id)s", video_id)
+        kind = "audio" if os.path.basename(template).startswith("audio") else "video"
+        path = template.replace("%(ext)s", "m4a" if kind == "audio" else "mp4")
+        with httpx.stream("GET", f"{server.url}/media/{kind}", timeout=60) as resp:
+            resp.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in resp.iter_bytes():
+                    f.write(chunk)
+
+    return download
+
+
+@contextmanager
+def _patched(target: Any, name: str, value: Any) -> Iterator[None]:
+    previous = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, previous)
+
+
+# every persistent cache is off so each run pays for the full stage
+SETTINGS = {
+    "YOUTUBE_API_KEY": "stand-in",
+    "OPENAI_API_KEY": "stand-in",
+    "GOOGLE_APPLICATION_CREDENTIALS": "stand-in",
+    "REGION_CODE": "RU",
+    "DEFAULT_PUBLISHED_AFTER": "2025-08-01T00:00:00Z",
+    "SHOT_BACKEND": "remote",
+    "MEDIA_FETCH_MODE": "sections",
+    "MEDIA_CACHE_MAX_BYTES": 0,
+    "RESULT_STORE_MAX_ENTRIES": 0,
+    "LLM_CACHE_MAX_ENTRIES": 0,
+    "STT_CHUNKED": False,
+    "STT_AUDIO_CODEC": "none",
+    "VIDEO_PROXY_HEIGHT": 0,
+}
+
+
+@contextmanager
+def stand_ins(latency: Optional[Dict[str, float]] = None) -> Iterator[StandInServer]:
+    """Point the whole app at a fresh ``StandInServer`` for the duration."""
+    from google.cloud import videointelligence
+    from openai import AsyncOpenAI, OpenAI
+
+    from app import media_probe, openai_client, youtube_client
+    from app.settings import settings
+
+    server = StandInServer(latency).start()
+    FakeVideoIntelligenceClient.server = server
+    api = f"{server.url}/v1"
+    with ExitStack() as stack:
+        stack.callback(server.stop)
+        for name, value in SETTINGS.items():
+            stack.enter_context(_patched(settings, name, value))
+        stack.enter_context(_patched(youtube_client, "BASE_URL", f"{server.url}/youtube/v3"))
+        stack.enter_context(_patched(youtube_client, "_response_cache", None))
+        stack.enter_context(_patched(youtube_client, "_response_cache_ready", True))
+        stack.enter_context(_patched(media_probe, "_ydl_download", media_downloader(server)))
+        stack.enter_context(
+            _patched(openai_client, "_client", OpenAI(api_key="stand-in", base_url=api, max_retries=0))
+        )
+        stack.enter_context(
+            _patched(openai_client, "_async_client", AsyncOpenAI(api_key="stand-in", base_url=api, max_retries=0))
+        )
+        stack.enter_context(
+            _patched(videointelligence, "VideoIntelligenceServiceClient", FakeVideoIntelligenceClient)
+        )
+        yield server
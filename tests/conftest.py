@@ -13,3 +13,13 @@ os.environ.setdefault("OPENAI_API_KEY", "x")
 os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "creds.json")
 os.environ.setdefault("REGION_CODE", "RU")
 os.environ.setdefault("DEFAULT_PUBLISHED_AFTER", "2025-08-01T00:00:00Z")
+
+# keep persistent caches out of the developer's home directory
+os.environ.setdefault("MEDIA_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("RESULT_STORE_MAX_ENTRIES", "0")
+os.environ.setdefault("LLM_CACHE_MAX_ENTRIES", "0")
+os.environ.setdefault("TRENDING_INDEX_TTL_SECONDS", "0")
+os.environ.setdefault("AUDIO_PREP_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("STT_AUDIO_CODEC", "none")
+os.environ.setdefault("VIDEO_PROXY_HEIGHT", "0")
+os.environ.setdefault("VIDEO_PROXY_CACHE_MAX_BYTES", "0")
@@ -0,0 +1,50 @@
+from app.api_cache import CacheEntry, QuotaLedger, ResponseCache, SQLiteBackend
+
+
+def test_cache_key_ignores_param_order():
+    assert ResponseCache.key("/search", {"q": "a", "n": 1}) == ResponseCache.key("/search", {"n": 1, "q": "a"})
+    assert ResponseCache.key("/search", {"q": "a"}) != ResponseCache.key("/videos", {"q": "a"})
+
+
+def test_sqlite_backend_round_trip_and_bound(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    for i in range(3):
+        backend.set(f"k{i}", CacheEntry(body={"i": i, "title": "тест"}, etag=f"e{i}", stored_at=float(i)))
+
+    assert backend.get("k0") is None
+    entry = backend.get("k2")
+    assert entry.body == {"i": 2, "title": "тест"}
+    assert entry.etag == "e2"
+
+    reopened = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    assert reopened.get("k1").body["i"] == 1
+
+
+def test_sqlite_backend_evicts_least_recently_used(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    backend.set("hot", CacheEntry(body={"i": 0}, etag=None, stored_at=0.0))
+    backend.set("cold", CacheEntry(body={"i": 1}, etag=None, stored_at=1.0))
+    assert backend.get("hot") is not None
+    backend.set("new", CacheEntry(body={"i": 2}, etag=None, stored_at=2.0))
+
+    assert backend.get("cold") is None
+    assert backend.get("hot").body == {"i": 0}
+
+
+def test_quota_ledger_counts_units():
+    ledger = QuotaLedger()
+    ledger.spend("/search")
+    ledger.save("/search")
+    ledger.spend("/videos", revalidated=True)
+
+    report = ledger.report()
+    assert report["/search"]["units_spent"] == 100
+    assert report["/search"]["units_saved"] == 100
+    assert report["/videos"] == {
+        "calls": 1,
+        "cache_hits": 0,
+        "revalidated": 1,
+        "failed": 0,
+        "units_spent": 1,
+        "units_saved": 0,
+    }
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from app import audio_prep
+from app.ffmpeg_tools import FFmpegError
+from app.media_probe import MediaCache
+from app.schemas import Segment, Transcript
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "audio.m4a"
+    path.write_bytes(b"m" * 1000)
+    return str(path)
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    calls = []
+
+    def fake_run(args, timeout=300):
+        calls.append(args)
+        with open(args[-1], "wb") as f:
+            f.write(b"o" * 100)
+        return b""
+
+    monkeypatch.setattr(audio_prep.settings, "STT_AUDIO_CODEC", "opus")
+    monkeypatch.setattr(audio_prep, "run_ffmpeg", fake_run)
+    return calls
+
+
+def test_prepared_transcodes_and_cleans_up(fake_ffmpeg, source):
+    with audio_prep.prepared(source) as audio:
+        assert audio.path.endswith("audio.ogg")
+        assert os.path.exists(audio.path)
+        assert (audio.source_bytes, audio.prepared_bytes) == (1000, 100)
+    assert not os.path.exists(audio.path)
+    args = fake_ffmpeg[0]
+    assert args[args.index("-ar") + 1] == "16000"
+    assert args[args.index("-ac") + 1] == "1"
+    assert args[args.index("-b:a") + 1] == audio_prep.settings.STT_AUDIO_BITRATE
+
+
+def test_prepared_output_is_cached_by_content(monkeypatch, fake_ffmpeg, source, tmp_path):
+    cache = MediaCache(str(tmp_path / "prep"), max_bytes=10_000)
+    monkeypatch.setattr(audio_prep, "get_prep_cache", lambda: cache)
+
+    with audio_prep.prepared(source) as first:
+        pass
+    with audio_prep.prepared(source) as second:
+        assert os.path.exists(second.path)
+
+    assert first.path == second.path
+    assert len(fake_ffmpeg) == 1
+
+
+def test_trim_silence_reports_offset(monkeypatch, fake_ffmpeg, source):
+    rate = audio_prep.PREP_RATE
+    tone = (8000 * np.sin(np.arange(rate) * 0.1)).astype(np.int16)
+    samples = np.concatenate([np.zeros(3 * rate, np.int16), tone])
+    monkeypatch.setattr(audio_prep.settings, "STT_TRIM_SILENCE", True)
+    monkeypatch.setattr(audio_prep, "decode_pcm", lambda path, r: samples)
+
+    with audio_prep.prepared(source) as audio:
+        assert audio.offset == pytest.approx(2.75, abs=0.05)
+        assert sorted(os.listdir(os.path.dirname(audio.path))) == ["audio.ogg", "meta.json"]
+
+    shifted = audio_prep.shift(Transcript(segments=[Segment(text="hi", start=0.5, end=1.0)]), audio.offset)
+    assert shifted.segments[0].start == pytest.approx(0.5 + audio.offset)
+
+
+def test_ffmpeg_failure_falls_back_to_original(monkeypatch, source):
+    def broken(args, timeout=300):
+        raise FFmpegError("no encoder")
+
+    monkeypatch.setattr(audio_prep.settings, "STT_AUDIO_CODEC", "opus")
+    monkeypatch.setattr(audio_prep, "run_ffmpeg", broken)
+
+    async def run():
+        async with audio_prep.prepared_async(source) as audio:
+            return audio
+
+    audio = asyncio.run(run())
+    assert audio.path == source
+    assert audio.offset == 0.0
+
+
+def test_disabled_codec_passes_original_through(source):
+    with audio_prep.prepared(source) as audio:
+        assert audio.path == source
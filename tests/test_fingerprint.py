@@ -0,0 +1,159 @@
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager, contextmanager
+
+import numpy as np
+import pytest
+
+from app import fingerprint, pipeline
+from app.fingerprint import AUDIO_HOP, AUDIO_RATE, FRAME_SECONDS, Fingerprint, FingerprintIndex
+from app.result_store import ResultStore
+from app.schemas import AnalysisResult, KeyObject, Segment, Shot, Transcript
+
+
+def _track(seconds, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * AUDIO_RATE)) / AUDIO_RATE
+    # a melody of random tones over noise, changing every quarter second
+    freqs = np.repeat(rng.uniform(300, 2000, int(seconds * 4) + 1), AUDIO_RATE // 4)[: len(t)]
+    signal = np.sin(2 * np.pi * np.cumsum(freqs) / AUDIO_RATE) + 0.3 * rng.standard_normal(len(t))
+    return (signal / np.abs(signal).max() * 20000).astype(np.int16)
+
+
+def _frames(count, seed):
+    return fingerprint.frame_hashes(np.random.default_rng(seed).integers(0, 255, (count, 8, 9, 3), dtype=np.uint8))
+
+
+def _prints(samples, frames):
+    return Fingerprint(fingerprint.audio_fingerprint(samples), frames, len(samples) / AUDIO_RATE)
+
+
+def _index(tmp_path):
+    return FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), max_entries=10)
+
+
+def _match(index, video_id, prints):
+    return index.match(video_id, prints, threshold=0.85, frame_threshold=0.8, min_overlap=0.9)
+
+
+def test_trimmed_reupload_matches_with_its_offset(tmp_path):
+    index = _index(tmp_path)
+    original = _track(30, seed=1)
+    frames = _frames(30, seed=1)
+    index.add("orig", _prints(original, frames))
+    index.add("other", _prints(_track(30, seed=2), _frames(30, seed=2)))
+
+    # re-encoded (noise) and with the first 24 hops cut off
+    noise = np.random.default_rng(3).normal(0, 200, len(original))
+    reupload = (original + noise).clip(-32768, 32767).astype(np.int16)[24 * AUDIO_HOP:]
+    match = _match(index, "copy", _prints(reupload, frames[3:]))
+
+    assert match.video_id == "orig"
+    assert match.offset == pytest.approx(24 * FRAME_SECONDS)
+    assert match.audio_similarity > 0.9
+    assert match.frame_similarity == 1.0
+    assert _match(index, "fresh", _prints(_track(30, seed=4), _frames(30, seed=4))) is None
+
+
+def test_same_sound_over_different_footage_is_not_a_duplicate(tmp_path):
+    index = _index(tmp_path)
+    track = _track(20, seed=5)
+    index.add("orig", _prints(track, _frames(20, seed=5)))
+
+    assert _match(index, "remix", _prints(track, _frames(20, seed=6))) is None
+    # audio-only media is matched on audio alone
+    assert _match(index, "audio", _prints(track, _frames(0, seed=0))).video_id == "orig"
+
+
+def test_shift_result_moves_and_clips_timestamps():
+    result = AnalysisResult(
+        transcript=Transcript(
+            segments=[Segment(text="a", start=0.0, end=2.0), Segment(text="b", start=2.5, end=6.0)]
+        ),
+        shots=[Shot(start_sec=0.0, end_sec=3.0), Shot(start_sec=3.0, end_sec=8.0)],
+        key_objects=[
+            KeyObject(description="Car", start_sec=0.5, end_sec=1.5),
+            KeyObject(description="Dog", start_sec=2.0, end_sec=9.0),
+        ],
+    )
+    shifted = fingerprint.shift_result(result, offset=2.0, duration=3.0)
+
+    assert [(s.text, s.start, s.end) for s in shifted.transcript.segments] == [("b", 0.5, 3.0)]
+    assert [(s.start_sec, s.end_sec) for s in shifted.shots] == [(0.0, 1.0), (1.0, 3.0)]
+    assert [(o.description, o.start_sec, o.end_sec) for o in shifted.key_objects] == [("Dog", 0.0, 3.0)]
+
+
+def test_pipeline_reuses_the_analysis_of_a_reupload(tmp_path, monkeypatch):
+    track, frames = _track(20, seed=7), _frames(20, seed=7)
+    prints = {"orig": _prints(track, frames), "copy": _prints(track[8 * AUDIO_HOP:], frames[1:])}
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_entries=10, max_age_seconds=60)
+    index = _index(tmp_path)
+    analyzed = []
+
+    @contextmanager
+    def fake_pull(video_id):
+        yield video_id, f"{video_id}.mp4"
+
+    def fake_analyze_media(audio_path, video_path, timings=None):
+        analyzed.append(audio_path)
+        return AnalysisResult(
+            transcript=Transcript(segments=[Segment(text="hi", start=1.0, end=3.0)]),
+            shots=[Shot(start_sec=0.0, end_sec=20.0)],
+        )
+
+    monkeypatch.setattr(pipeline, "get_result_store", lambda: store)
+    monkeypatch.setattr(fingerprint, "get_fingerprint_index", lambda: index)
+    monkeypatch.setattr(fingerprint, "compute", lambda audio_path, video_path: prints[audio_path])
+    monkeypatch.setattr(fingerprint, "dedupe_stats", fingerprint.DedupeStats())
+    monkeypatch.setattr(pipeline.media_probe, "pull_transient", fake_pull)
+    monkeypatch.setattr(pipeline, "analyze_media", fake_analyze_media)
+
+    pipeline.analyze_video("orig")
+    timings = {}
+    copy = pipeline.analyze_video("copy", timings)
+
+    assert analyzed == ["orig"]
+    assert "fingerprint" in timings
+    offset = 8 * FRAME_SECONDS
+    assert copy.transcript.segments[0].start == pytest.approx(1.0 - offset)
+    assert copy.shots[0].end_sec == pytest.approx(prints["copy"].duration)
+    assert store.get("copy", pipeline.pipeline_version()) is not None
+    assert fingerprint.dedupe_stats.report()["hit_rate"] == 0.5
+
+
+def test_audio_fingerprint_is_the_same_in_any_block_size(monkeypatch):
+    track = _track(30, seed=3)
+    whole = fingerprint.audio_fingerprint(track)
+    monkeypatch.setattr(fingerprint, "_AUDIO_BLOCK", 7)
+    assert np.array_equal(fingerprint.audio_fingerprint(track), whole)
+    assert len(whole) == (len(track) - fingerprint.AUDIO_FRAME) // AUDIO_HOP
+
+
+def test_pipeline_analyzes_in_full_when_the_index_fails(tmp_path, monkeypatch):
+    track, frames = _track(20, seed=7), _frames(20, seed=7)
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_entries=10, max_age_seconds=60)
+
+    class BrokenIndex:
+        def match(self, *args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+
+        add = match
+
+    @asynccontextmanager
+    async def fake_pull(video_id):
+        yield "a.m4a", "v.mp4"
+
+    async def fake_analyze_media_async(audio_path, video_path, timings=None, on_stage=None):
+        return AnalysisResult(transcript=Transcript(segments=[]), shots=[])
+
+    monkeypatch.setattr(pipeline, "get_result_store", lambda: store)
+    monkeypatch.setattr(fingerprint, "get_fingerprint_index", lambda: BrokenIndex())
+    monkeypatch.setattr(fingerprint, "compute", lambda audio_path, video_path: _prints(track, frames))
+    monkeypatch.setattr(fingerprint, "dedupe_stats", fingerprint.DedupeStats())
+    monkeypatch.setattr(pipeline.media_probe, "pull_transient_async", fake_pull)
+    monkeypatch.setattr(pipeline, "analyze_media_async", fake_analyze_media_async)
+
+    result = asyncio.run(pipeline.analyze_video_async("abc"))
+
+    assert store.get("abc", pipeline.pipeline_version()) == result
+    assert fingerprint.dedupe_stats.report()["errors"] == 2
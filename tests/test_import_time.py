@@ -0,0 +1,36 @@
+import pytest
+
+from app.settings import settings
+from benchmarks.import_time import heavy_imports, import_profile, parse_importtime
+
+
+def test_parse_importtime_reads_depth_and_times():
+    rows = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   app.settings\n"
+        "import time:        80 |        200 | app.cli\n"
+    )
+    assert rows == [
+        {"name": "app.settings", "self_us": 120, "cumulative_us": 120, "depth": 1},
+        {"name": "app.cli", "self_us": 80, "cumulative_us": 200, "depth": 0},
+    ]
+
+
+@pytest.mark.parametrize("module", ["app.cli", "app.worker"])
+def test_entry_points_do_not_import_heavy_clients(module):
+    assert heavy_imports(import_profile(module)) == []
+
+
+def test_require_reports_missing_settings(monkeypatch, capsys):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "")
+    settings.require("REGION_CODE")
+    with pytest.raises(SystemExit):
+        settings.require("REGION_CODE", "OPENAI_API_KEY")
+    assert "OPENAI_API_KEY" in capsys.readouterr().err
+
+
+def test_local_shot_backend_needs_no_google_credentials(monkeypatch):
+    monkeypatch.setattr(settings, "SHOT_BACKEND", "local")
+    assert settings.analysis_requirements() == ("OPENAI_API_KEY",)
+    monkeypatch.setattr(settings, "SHOT_BACKEND", "remote")
+    assert "GOOGLE_APPLICATION_CREDENTIALS" in settings.analysis_requirements()
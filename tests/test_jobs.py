@@ -0,0 +1,138 @@
+import threading
+import urllib.request
+
+import pytest
+
+from app import metrics, worker
+from app.jobs import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=60, max_attempts=2, retry_backoff_seconds=0)
+
+
+def test_enqueue_claim_complete(queue):
+    jobs = queue.enqueue_many("analyze", [{"video_id": "a"}, {"video_id": "b"}])
+
+    claimed = queue.claim("w1")
+    assert claimed.id == jobs[0].id
+    assert claimed.status == "running"
+    assert claimed.attempts == 1
+    assert queue.complete(claimed.id, "w1", {"ok": True})
+
+    done = queue.get(claimed.id)
+    assert done.status == "done"
+    assert done.result == {"ok": True}
+    assert [j.status for j in queue.list_batch(jobs[0].batch_id)] == ["done", "queued"]
+
+
+def test_enqueue_rejects_unknown_kind(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue_many("render", [{}])
+
+
+def test_journal_mode_is_configurable(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), journal_mode="delete")
+    assert queue._conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    with pytest.raises(ValueError):
+        JobQueue(str(tmp_path / "other.sqlite3"), journal_mode="MEMORY")
+
+
+def test_failed_job_is_retried_then_marked_failed(queue):
+    job = queue.enqueue_many("analyze", [{"video_id": "a"}])[0]
+
+    queue.fail(queue.claim("w1").id, "w1", "boom")
+    assert queue.get(job.id).status == "queued"
+    queue.fail(queue.claim("w1").id, "w1", "boom again")
+
+    failed = queue.get(job.id)
+    assert failed.status == "failed"
+    assert failed.attempts == 2
+    assert failed.error == "boom again"
+    assert queue.claim("w1") is None
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = JobQueue(path, lease_seconds=-1, max_attempts=3)
+    second = JobQueue(path, lease_seconds=60, max_attempts=3)
+    job = first.enqueue_many("analyze", [{"video_id": "a"}])[0]
+
+    first.claim("crashed")
+    reclaimed = second.claim("w2")
+
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+    # the original worker lost its lease, so its late result is ignored
+    assert not first.complete(job.id, "crashed", {"late": True})
+    assert second.complete(job.id, "w2", {"ok": True})
+    assert second.get(job.id).result == {"ok": True}
+
+
+@pytest.mark.parametrize("journal_mode", ["WAL", "DELETE"])
+def test_concurrent_workers_never_share_a_job(tmp_path, journal_mode):
+    path = str(tmp_path / "jobs.sqlite3")
+    JobQueue(path, journal_mode=journal_mode).enqueue_many("analyze", [{"video_id": str(i)} for i in range(40)])
+    claimed = []
+    lock = threading.Lock()
+
+    def drain(name):
+        queue = JobQueue(path, journal_mode=journal_mode)
+        while True:
+            job = queue.claim(name)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job.id)
+            queue.complete(job.id, name, None)
+
+    threads = [threading.Thread(target=drain, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(claimed) == 40
+    assert len(set(claimed)) == 40
+
+
+def test_worker_process_one_runs_handler(queue, monkeypatch):
+    monkeypatch.setitem(worker.HANDLERS, "analyze", lambda payload: {"video_id": payload["video_id"]})
+    job = queue.enqueue_many("analyze", [{"video_id": "abc"}])[0]
+
+    assert worker.process_one(queue, "w1")
+    assert not worker.process_one(queue, "w1")
+    assert queue.get(job.id).result == {"video_id": "abc"}
+
+
+def test_worker_process_one_records_failure(queue, monkeypatch):
+    def broken(payload):
+        raise RuntimeError("no audio")
+
+    monkeypatch.setitem(worker.HANDLERS, "scenario", broken)
+    job = queue.enqueue_many("scenario", [{"video_id": "abc", "topic": "t"}])[0]
+
+    worker.process_one(queue, "w1")
+
+    stored = queue.get(job.id)
+    assert stored.status == "queued"
+    assert stored.error == "RuntimeError: no audio"
+
+
+def test_worker_serves_its_metrics(queue, monkeypatch):
+    monkeypatch.setitem(worker.HANDLERS, "analyze", lambda payload: None)
+    queue.enqueue_many("analyze", [{"video_id": "abc"}])
+    metrics.registry.reset()
+    worker.process_one(queue, "w1")
+
+    server = worker.serve_metrics(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            body = resp.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'storyflow_jobs_total{kind="analyze",result="done"} 1' in body
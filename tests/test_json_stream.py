@@ -0,0 +1,48 @@
+import json
+
+from app.json_stream import ArrayItemStream
+
+
+def _feed_in_pieces(stream, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(stream.feed(text[i:i + size]))
+    return items
+
+
+def test_items_are_emitted_once_as_they_close():
+    stream = ArrayItemStream("scenes")
+
+    assert stream.feed('{"scenes": [{"a": 1}, {"a"') == [{"a": 1}]
+    assert stream.feed(': 2}') == [{"a": 2}]
+    assert stream.feed('], "meta": {"topic": "t"}}') == []
+    assert json.loads(stream.text)["meta"] == {"topic": "t"}
+
+
+def test_nested_values_and_escapes_do_not_confuse_the_scanner():
+    doc = {
+        "meta": {"scenes": [{"decoy": True}]},
+        "scenes": [
+            {"text": 'quote " and brace } and [bracket', "lines": [{"role": "n"}]},
+            {"text": "back\\slash", "lines": []},
+        ],
+    }
+    text = json.dumps(doc, ensure_ascii=False)
+
+    for size in (1, 3, 7, len(text)):
+        assert _feed_in_pieces(ArrayItemStream("scenes"), text, size) == doc["scenes"]
+
+
+def test_other_fields_are_ignored():
+    stream = ArrayItemStream("scenes")
+
+    assert stream.feed('{"shots": [{"a": 1}], "scenes": []}') == []
+
+
+def test_malformed_items_are_skipped():
+    stream = ArrayItemStream("scenes")
+
+    assert stream.feed('{"scenes": [{"a": 1}, ') == [{"a": 1}]
+    assert stream.feed('{"a": 2,}, {"a"') == []
+    assert stream.feed(': 3}]}') == [{"a": 3}]
+    assert stream.text == '{"scenes": [{"a": 1}, {"a": 2,}, {"a": 3}]}'
@@ -0,0 +1,63 @@
+import pytest
+
+from app.key_objects import KeyObjectBuilder, KeyObjectTable
+from app.schemas import AnalysisResult, KeyObject, Shot, Transcript
+
+
+def _table(*rows):
+    builder = KeyObjectBuilder()
+    for description, start, end, confidence in rows:
+        builder.add(description, ["Vehicle"] if description == "Car" else [], start, end, confidence)
+    return builder.build()
+
+
+def test_builder_interns_labels_and_categories():
+    table = _table(("Car", 0, 1, 0.9), ("Car", 2, 3, 0.8), ("Tree", 0, 3, None))
+    assert len(table) == 3
+    assert table.labels == ["Car", "Tree"]
+    assert table.category_sets == [("Vehicle",), ()]
+    assert table[2] == KeyObject(description="Tree", start_sec=0, end_sec=3, confidence=None)
+    assert table[-1].description == "Tree"
+    with pytest.raises(IndexError):
+        table[3]
+
+
+def test_merged_joins_overlapping_segments_of_the_same_label():
+    table = _table(
+        ("Car", 0.0, 2.0, 0.6),
+        ("Car", 1.5, 3.0, 0.9),
+        ("Car", 5.0, 6.0, 0.5),
+        ("Tree", 1.0, 4.0, 0.7),
+    ).merged()
+    rows = sorted((r["description"], r["start_sec"], r["end_sec"], r["confidence"]) for r in table.rows())
+    assert rows == [("Car", 0.0, 3.0, 0.9), ("Car", 5.0, 6.0, 0.5), ("Tree", 1.0, 4.0, 0.7)]
+    assert len(_table(("Car", 0.0, 2.0, 0.6), ("Car", 2.5, 3.0, 0.9)).merged(gap=1.0)) == 1
+
+
+def test_above_keeps_rows_without_confidence():
+    table = _table(("Car", 0, 1, 0.2), ("Car", 2, 3, 0.8), ("Tree", 0, 3, None)).above(0.5)
+    assert [(o.description, o.confidence) for o in table] == [("Car", 0.8), ("Tree", None)]
+
+
+def test_top_per_shot_limits_crowded_shots():
+    table = _table(("Car", 0, 1, 0.9), ("Tree", 0, 1, 0.5), ("Sky", 0, 1, 0.7), ("Dog", 10, 11, 0.1))
+    kept = table.top_per_shot([Shot(start_sec=0, end_sec=2)], k=2)
+    # "Dog" overlaps no shot and is left alone
+    assert sorted(o.description for o in kept) == ["Car", "Dog", "Sky"]
+
+
+def test_compact_orders_rows_by_time():
+    table = _table(("Tree", 3, 4, 0.9), ("Car", 0, 1, 0.9), ("Car", 0.5, 2, 0.4), ("Sky", 1, 2, 0.1))
+    compact = table.compact([Shot(start_sec=0, end_sec=5)], min_confidence=0.3, per_shot=5, merge_gap=0.0)
+    assert [(o.description, o.start_sec, o.end_sec) for o in compact] == [("Car", 0, 2), ("Tree", 3, 4)]
+
+
+def test_analysis_result_round_trips_through_json():
+    objects = [KeyObject(description="Car", start_sec=0.0, end_sec=1.0, confidence=0.9, categories=["Vehicle"])]
+    result = AnalysisResult(transcript=Transcript(segments=[]), shots=[], key_objects=objects)
+    assert isinstance(result.key_objects, KeyObjectTable)
+    assert result.key_objects == objects
+    restored = AnalysisResult.model_validate_json(result.model_dump_json())
+    assert restored == result
+    assert restored.model_dump()["key_objects"] == [o.model_dump() for o in objects]
+    assert AnalysisResult(transcript=Transcript(segments=[]), shots=[]).key_objects == []
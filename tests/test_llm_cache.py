@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app import llm_cache, llm_storyboard
+from app.llm_cache import CompletionCache
+from app.schemas import Scenario, ScenarioMeta, Scene, Storyboard
+
+BOARD = {
+    "scenes": [
+        {
+            "duration_sec": 5,
+            "visual_description": "v",
+            "voice_lines": [],
+            "broll_hints": [],
+            "tempo": "fast",
+            "transitions": "cut",
+        }
+    ],
+    "total_duration_sec": 5,
+    "target": "shorts",
+}
+
+
+def test_key_is_canonical():
+    a = CompletionCache.key("m", [{"role": "user", "content": "x"}], temperature=0, response_format={"type": "json_object"})
+    b = CompletionCache.key("m", [{"content": "x", "role": "user"}], response_format={"type": "json_object"}, temperature=0)
+
+    assert a == b
+    assert a != CompletionCache.key("other", [{"role": "user", "content": "x"}], temperature=0)
+
+
+def test_memory_tier_is_lru(tmp_path):
+    cache = CompletionCache(None, memory_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("b") is None
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    CompletionCache(path, memory_entries=1).put("a", {"title": "тест"})
+
+    assert CompletionCache(path).get("a") == {"title": "тест"}
+    assert CompletionCache(path, ttl_seconds=-1).get("a") is None
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = CompletionCache(str(tmp_path / "llm.sqlite3"), memory_entries=1, disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"k": key})
+
+    assert cache.get("a") is None
+    assert cache.get("b") == {"k": "b"}
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = CompletionCache(str(tmp_path / "llm.sqlite3"))
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    return cache
+
+
+def test_plan_timeline_hits_cache_and_honours_modes(monkeypatch, cache):
+    calls = []
+
+    def fake_create(*args, **kwargs):
+        calls.append(kwargs["model"])
+        message = type("m", (), {"content": json.dumps(BOARD)})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_storyboard.client.chat.completions, "create", fake_create)
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=5, visual_description="v", voice_lines=[])],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+
+    first = llm_storyboard.plan_timeline(scenario, "shorts")
+    second = llm_storyboard.plan_timeline(scenario, "shorts")
+    llm_storyboard.plan_timeline(scenario, "shorts", cache_mode="refresh")
+    llm_storyboard.plan_timeline(scenario, "shorts", cache_mode="bypass")
+    llm_storyboard.plan_timeline(scenario, "youtube")
+
+    assert isinstance(second, Storyboard)
+    assert first == second
+    assert len(calls) == 4
+
+
+def test_async_planner_uses_the_cache_off_the_event_loop(monkeypatch, cache):
+    calls, threads = [], []
+
+    async def fake_create(*args, **kwargs):
+        calls.append(kwargs["model"])
+        message = type("m", (), {"content": json.dumps(BOARD)})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    get, put = cache.get, cache.put
+    monkeypatch.setattr(cache, "get", lambda key: threads.append(threading.get_ident()) or get(key))
+    monkeypatch.setattr(cache, "put", lambda key, value: threads.append(threading.get_ident()) or put(key, value))
+    monkeypatch.setattr(llm_storyboard.async_client.chat.completions, "create", fake_create)
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=5, visual_description="v", voice_lines=[])],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+
+    first = asyncio.run(llm_storyboard.plan_timeline_async(scenario, "shorts"))
+    second = asyncio.run(llm_storyboard.plan_timeline_async(scenario, "shorts"))
+
+    assert first == second
+    assert len(calls) == 1
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
+
+
+def test_invalid_results_are_not_stored(monkeypatch, cache):
+    def fake_create(*args, **kwargs):
+        message = type("m", (), {"content": "{}"})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_storyboard.client.chat.completions, "create", fake_create)
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=5, visual_description="v", voice_lines=[])],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+
+    with pytest.raises(RuntimeError):
+        llm_storyboard.plan_timeline(scenario, "shorts")
+    messages = llm_storyboard._build_messages(scenario, "shorts", range(0, 1))
+    key, cached = llm_cache.lookup(
+        llm_storyboard.WindowPlan, llm_storyboard.MODEL, messages, **llm_storyboard.COMPLETION_PARAMS
+    )
+    assert cached is None
+    assert cache.get(key) is None
+
+
+def test_unknown_mode_is_rejected(cache):
+    with pytest.raises(ValueError):
+        llm_cache.lookup(Storyboard, "m", [], "sometimes")
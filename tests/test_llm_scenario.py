@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+from app import llm_cache, llm_scenario
+from app.llm_cache import CompletionCache
+from app.schemas import Scenario, Scene, Transcript
+
+SCENARIO = {
+    "scenes": [
+        {"duration_sec": 3, "visual_description": "first", "voice_lines": [{"role": "n", "text": "hi"}]},
+        {"duration_sec": 4, "visual_description": "second", "voice_lines": []},
+    ],
+    "meta": {"topic": "t", "source": "s"},
+}
+
+
+def _chunk(content):
+    delta = type("d", (), {"content": content})
+    return type("chunk", (), {"choices": [type("c", (), {"delta": delta})]})
+
+
+def test_stream_yields_scenes_before_scenario(monkeypatch):
+    raw = json.dumps(SCENARIO)
+
+    async def fake_stream():
+        for i in range(0, len(raw), 5):
+            yield _chunk(raw[i:i + 5])
+
+    async def fake_create(*args, **kwargs):
+        assert kwargs["stream"] is True
+        return fake_stream()
+
+    monkeypatch.setattr(llm_scenario.async_client.chat.completions, "create", fake_create)
+
+    async def collect():
+        return [item async for item in llm_scenario.stream_ru_scenario_async(Transcript(segments=[]), [], "t")]
+
+    items = asyncio.run(collect())
+
+    assert [type(item) for item in items] == [Scene, Scene, Scenario]
+    assert items[0].visual_description == "first"
+    assert items[2].meta.topic == "t"
+
+
+def test_stream_falls_back_to_a_full_retry_on_invalid_output(monkeypatch):
+    calls = []
+
+    async def fake_stream():
+        yield _chunk('{"scenes": [{"duration_sec": -1}]}')
+
+    async def fake_create(*args, **kwargs):
+        calls.append(kwargs.get("stream", False))
+        if kwargs.get("stream"):
+            return fake_stream()
+        message = type("m", (), {"content": json.dumps(SCENARIO)})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_scenario.async_client.chat.completions, "create", fake_create)
+
+    async def collect():
+        return [item async for item in llm_scenario.stream_ru_scenario_async(Transcript(segments=[]), [], "t")]
+
+    items = asyncio.run(collect())
+
+    assert calls == [True, False]
+    assert len(items) == 1
+    assert items[0].scenes[1].duration_sec == 4
+
+
+def test_stream_skips_a_malformed_scene_and_keeps_going(monkeypatch):
+    second = json.dumps(SCENARIO["scenes"][1])
+    raw = '{"scenes": [{"duration_sec": 3, "visual_description": "first",}, ' + second + '], "meta": {"topic": "t"'
+
+    async def fake_stream():
+        for i in range(0, len(raw), 5):
+            yield _chunk(raw[i:i + 5])
+
+    async def fake_create(*args, **kwargs):
+        if kwargs.get("stream"):
+            return fake_stream()
+        message = type("m", (), {"content": json.dumps(SCENARIO)})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_scenario.async_client.chat.completions, "create", fake_create)
+
+    async def collect():
+        return [item async for item in llm_scenario.stream_ru_scenario_async(Transcript(segments=[]), [], "t")]
+
+    items = asyncio.run(collect())
+
+    assert [type(item) for item in items] == [Scene, Scenario]
+    assert items[0].visual_description == "second"
+    assert items[1].meta.topic == "t"
+
+
+def test_stream_replays_cached_scenario(monkeypatch, tmp_path):
+    cache = CompletionCache(str(tmp_path / "llm.sqlite3"))
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    calls = []
+
+    def fake_create(*args, **kwargs):
+        calls.append(kwargs)
+        message = type("m", (), {"content": json.dumps(SCENARIO)})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_scenario.client.chat.completions, "create", fake_create)
+    stored = llm_scenario.make_ru_scenario(Transcript(segments=[]), [], "t")
+
+    async def collect():
+        return [item async for item in llm_scenario.stream_ru_scenario_async(Transcript(segments=[]), [], "t")]
+
+    items = asyncio.run(collect())
+
+    assert len(calls) == 1
+    assert items[-1] == stored
+    assert items[:-1] == stored.scenes
+
+
+def test_repairable_output_skips_the_retry(monkeypatch):
+    calls = []
+    broken = dict(SCENARIO, scenes=[dict(SCENARIO["scenes"][0], duration_sec=2.7)])
+
+    def fake_create(*args, **kwargs):
+        calls.append(kwargs)
+        message = type("m", (), {"content": json.dumps({"scenario": broken})})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_scenario.client.chat.completions, "create", fake_create)
+
+    scenario = llm_scenario.make_ru_scenario(Transcript(segments=[]), [], "t")
+
+    assert len(calls) == 1
+    assert scenario.scenes[0].duration_sec == 3
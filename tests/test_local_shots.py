@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app import local_shots
+
+
+def _synthetic_video(colors, frames_per_shot, size=32, seed=0):
+    rng = np.random.default_rng(seed)
+    shots = []
+    for color in colors:
+        shot = np.empty((frames_per_shot, size, size, 3), dtype=np.int16)
+        shot[:] = color
+        shot += rng.integers(-6, 7, size=shot.shape, dtype=np.int16)
+        shots.append(np.clip(shot, 0, 255).astype(np.uint8))
+    return np.concatenate(shots)
+
+
+def test_detect_boundaries_finds_hard_cuts():
+    frames = _synthetic_video([(200, 30, 30), (30, 200, 30), (30, 30, 200)], frames_per_shot=20)
+
+    boundaries = local_shots.detect_boundaries(frames, fps=10)
+
+    assert boundaries == pytest.approx([2.0, 4.0])
+
+
+def test_detect_boundaries_ignores_gradual_fade():
+    texture = np.tile(np.linspace(0, 120, 32)[None, :, None], (32, 1, 3))
+    levels = np.linspace(0, 120, 60)
+    frames = np.stack([(texture + level).astype(np.uint8) for level in levels])
+
+    assert local_shots.detect_boundaries(frames, fps=10) == []
+
+
+def test_detect_boundaries_handles_short_input():
+    assert local_shots.detect_boundaries(np.zeros((1, 8, 8, 3), dtype=np.uint8), fps=10) == []
+
+
+def test_shots_from_boundaries_covers_duration():
+    shots = local_shots.shots_from_boundaries([2.0, 4.0], 6.0)
+
+    assert [(s.start_sec, s.end_sec) for s in shots] == [(0.0, 2.0), (2.0, 4.0), (4.0, 6.0)]
+    assert local_shots.shots_from_boundaries([], 0.0) == []
+
+
+def test_detect_shots_local_decodes_at_configured_rate(monkeypatch):
+    frames = _synthetic_video([(0, 0, 0), (255, 255, 255)], frames_per_shot=15)
+    calls = []
+
+    def fake_decode(path, fps, width, height):
+        calls.append((path, fps, width, height))
+        return frames
+
+    monkeypatch.setattr(local_shots, "decode_video_frames", fake_decode)
+
+    shots = local_shots.detect_shots_local("clip.mp4")
+
+    assert calls[0][0] == "clip.mp4"
+    assert [(s.start_sec, s.end_sec) for s in shots] == [(0.0, 1.5), (1.5, 3.0)]
@@ -0,0 +1,33 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app import cli, main, pipeline
+from app.schemas import AnalysisResult, KeyObject, Segment, Shot, Transcript
+
+
+def _analysis():
+    return AnalysisResult(
+        transcript=Transcript(segments=[Segment(text="Смотри сюда", start=0.0, end=1.0)]),
+        shots=[Shot(start_sec=0.0, end_sec=1.0)],
+        key_objects=[KeyObject(description="Car", start_sec=0.0, end_sec=1.0, confidence=0.9)],
+    )
+
+
+def test_analyze_responds_with_orjson(monkeypatch):
+    async def fake_analyze(video_id, force_refresh=False):
+        return _analysis()
+
+    monkeypatch.setattr(pipeline, "analyze_video_async", fake_analyze)
+    resp = asyncio.run(main.analyze({"video_id": "vid"}))
+    assert resp.media_type == "application/json"
+    assert "Смотри сюда" in resp.body.decode("utf-8")
+    assert AnalysisResult.model_validate_json(resp.body) == _analysis()
+
+
+def test_cli_prints_compact_json_unless_pretty(capsys):
+    cli._print_json(SimpleNamespace(pretty=False), _analysis())
+    compact = capsys.readouterr().out
+    assert compact.count("\n") == 1 and "Смотри сюда" in compact
+    cli._print_json(SimpleNamespace(pretty=True), _analysis())
+    assert json.loads(capsys.readouterr().out) == json.loads(compact)
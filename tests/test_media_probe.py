@@ -0,0 +1,193 @@
+import os
+
+import pytest
+
+from app import media_probe
+
+
+def _fake_download(calls, payload=b"media"):
+    def fake(video_id, max_seconds, dest_dir):
+        calls.append((video_id, max_seconds))
+        with open(os.path.join(dest_dir, f"{video_id}.m4a"), "wb") as f:
+            f.write(payload)
+        with open(os.path.join(dest_dir, f"{video_id}.mp4"), "wb") as f:
+            f.write(payload)
+
+    return fake
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = media_probe.MediaCache(str(tmp_path / "cache"), max_bytes=1024)
+    monkeypatch.setattr(media_probe, "get_media_cache", lambda: cache)
+    return cache
+
+
+def test_pull_transient_reuses_cached_media(monkeypatch, cache):
+    calls = []
+    monkeypatch.setattr(media_probe, "_download", _fake_download(calls))
+
+    with media_probe.pull_transient("abc") as (audio_path, video_path):
+        assert audio_path.endswith("abc.m4a")
+        assert video_path.endswith("abc.mp4")
+    with media_probe.pull_transient("abc") as (audio_path, video_path):
+        assert os.path.exists(audio_path)
+        assert os.path.exists(video_path)
+
+    assert calls == [("abc", 90)]
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_pull_transient_keys_by_max_seconds(monkeypatch, cache):
+    calls = []
+    monkeypatch.setattr(media_probe, "_download", _fake_download(calls))
+
+    with media_probe.pull_transient("abc", max_seconds=30):
+        pass
+    with media_probe.pull_transient("abc", max_seconds=60):
+        pass
+
+    assert calls == [("abc", 30), ("abc", 60)]
+
+
+def test_cache_evicts_least_recently_used(monkeypatch, cache):
+    calls = []
+    monkeypatch.setattr(media_probe, "_download", _fake_download(calls, payload=b"x" * 200))
+
+    for video_id in ("a", "b"):
+        with media_probe.pull_transient(video_id):
+            pass
+    first = os.path.join(cache.root, cache.key("a", media_probe.download_format(), 90))
+    second = os.path.join(cache.root, cache.key("b", media_probe.download_format(), 90))
+    os.utime(first, (1, 1))
+    os.utime(second, (2, 2))
+    # a cache hit refreshes the entry, so "b" becomes the least recently used
+    with media_probe.pull_transient("a"):
+        pass
+    with media_probe.pull_transient("c"):
+        pass
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert calls == [("a", 90), ("b", 90), ("c", 90)]
+
+
+def test_failed_download_leaves_no_entry(monkeypatch, cache):
+    def failing(video_id, max_seconds, dest_dir):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(media_probe, "_download", failing)
+
+    with pytest.raises(RuntimeError):
+        with media_probe.pull_transient("abc"):
+            pass
+
+    assert cache.stats()["entries"] == 0
+    assert os.listdir(os.path.join(cache.root, ".staging")) == []
+
+
+def test_pull_transient_without_cache(monkeypatch):
+    calls = []
+    monkeypatch.setattr(media_probe, "_download", _fake_download(calls))
+    monkeypatch.setattr(media_probe, "get_media_cache", lambda: None)
+
+    with media_probe.pull_transient("abc") as (audio_path, _):
+        tmpdir = os.path.dirname(audio_path)
+        assert os.path.exists(audio_path)
+
+    assert not os.path.exists(tmpdir)
+
+
+def test_sections_mode_fetches_two_trimmed_streams(monkeypatch, tmp_path):
+    seen = {}
+
+    def fake_ydl(url, opts):
+        name = os.path.basename(opts["outtmpl"]).split(".")[0]
+        seen[name] = opts
+        ext = "webm" if name == "audio" else "mp4"
+        with open(os.path.join(tmp_path, f"{name}.{ext}"), "wb") as f:
+            f.write(b"x")
+
+    monkeypatch.setattr(media_probe.settings, "MEDIA_FETCH_MODE", "sections")
+    monkeypatch.setattr(media_probe, "_ydl_download", fake_ydl)
+
+    media_probe._download("abc", 30, str(tmp_path))
+
+    assert seen["audio"]["format"] == media_probe.AUDIO_FORMAT
+    assert seen["video"]["format"] == media_probe.VIDEO_FORMAT
+    ranges = list(seen["audio"]["download_ranges"]({}, None))
+    assert ranges == [{"start_time": 0, "end_time": 30}]
+    audio_path, video_path = media_probe._locate_media(str(tmp_path))
+    assert audio_path.endswith("audio.webm")
+    assert video_path.endswith("video.mp4")
+
+
+def test_sections_mode_tolerates_one_failed_stream(monkeypatch, tmp_path):
+    def fake_ydl(url, opts):
+        if opts["format"] == media_probe.VIDEO_FORMAT:
+            raise RuntimeError("no video")
+        with open(os.path.join(tmp_path, "audio.m4a"), "wb") as f:
+            f.write(b"x")
+
+    monkeypatch.setattr(media_probe.settings, "MEDIA_FETCH_MODE", "sections")
+    monkeypatch.setattr(media_probe, "_ydl_download", fake_ydl)
+
+    media_probe._download("abc", 30, str(tmp_path))
+
+    assert media_probe._locate_media(str(tmp_path)) == (str(tmp_path / "audio.m4a"), None)
+
+
+def test_sections_mode_raises_when_both_streams_fail(monkeypatch, tmp_path):
+    def fake_ydl(url, opts):
+        raise RuntimeError(opts["format"])
+
+    monkeypatch.setattr(media_probe.settings, "MEDIA_FETCH_MODE", "sections")
+    monkeypatch.setattr(media_probe, "_ydl_download", fake_ydl)
+
+    with pytest.raises(RuntimeError, match="abr"):
+        media_probe._download("abc", 30, str(tmp_path))
+
+
+def test_cache_key_depends_on_fetch_mode(monkeypatch):
+    monkeypatch.setattr(media_probe.settings, "MEDIA_FETCH_MODE", "full")
+    full = media_probe.download_format()
+    monkeypatch.setattr(media_probe.settings, "MEDIA_FETCH_MODE", "sections")
+
+    assert full == media_probe.DOWNLOAD_FORMAT
+    assert media_probe.download_format() != full
+
+
+def test_eviction_skips_entries_still_in_use(monkeypatch, cache):
+    calls = []
+    monkeypatch.setattr(media_probe, "_download", _fake_download(calls, payload=b"x" * 300))
+
+    with media_probe.pull_transient("a") as (audio_path, _):
+        # "b" pushes the cache over budget while "a" is still being read
+        with media_probe.pull_transient("b"):
+            pass
+        assert os.path.exists(audio_path)
+    assert os.listdir(os.path.join(cache.root, ".pins")) == []
+    with media_probe.pull_transient("c"):
+        pass
+
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_failed_publish_keeps_the_download_uncached(monkeypatch, cache):
+    calls = []
+    monkeypatch.setattr(media_probe, "_download", _fake_download(calls))
+
+    def failing_rename(src, dst):
+        raise PermissionError("read-only cache")
+
+    monkeypatch.setattr(media_probe.os, "rename", failing_rename)
+    with media_probe.pull_transient("abc") as (audio_path, _):
+        assert os.path.exists(audio_path)
+        staging = os.path.dirname(audio_path)
+
+    assert not os.path.exists(staging)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import main, metrics, youtube_client
+from app.api_cache import QuotaLedger
+
+
+def test_render_histogram_buckets_are_cumulative():
+    registry = metrics.Registry(buckets=(0.1, 1.0))
+    registry.observe("stage_seconds", 0.05, stage="download")
+    registry.observe("stage_seconds", 0.5, stage="download")
+    registry.observe("stage_seconds", 5.0, stage="download")
+    text = registry.render()
+    assert 'storyflow_stage_seconds_bucket{stage="download",le="0.1"} 1' in text
+    assert 'storyflow_stage_seconds_bucket{stage="download",le="1"} 2' in text
+    assert 'storyflow_stage_seconds_bucket{stage="download",le="+Inf"} 3' in text
+    assert 'storyflow_stage_seconds_count{stage="download"} 3' in text
+    assert "# TYPE storyflow_stage_seconds histogram" in text
+
+
+def test_counters_escape_labels_and_reject_undeclared_names():
+    registry = metrics.Registry()
+    registry.inc("bytes_total", 10, direction="uploaded", target='a"b')
+    registry.inc("bytes_total", 5, direction="uploaded", target='a"b')
+    assert 'storyflow_bytes_total{direction="uploaded",target="a\\"b"} 15' in registry.render()
+    with pytest.raises(KeyError):
+        registry.inc("stage_seconds")
+    with pytest.raises(KeyError):
+        registry.inc("nope_total")
+
+
+def test_summary_includes_collected_quota(monkeypatch):
+    ledger = QuotaLedger()
+    monkeypatch.setattr(youtube_client, "quota_ledger", ledger)
+    ledger.spend("/search")
+    ledger.save("/search")
+    registry = metrics.Registry()
+    registry.add_collector(youtube_client._quota_samples)
+    registry.observe("stage_seconds", 2.0, stage="transcribe")
+    summary = registry.summary()
+    assert summary["youtube_quota_units_total"]["endpoint=/search"] == 100
+    assert summary["youtube_cache_hits_total"]["endpoint=/search"] == 1
+    assert summary["stage_seconds"]["stage=transcribe"] == {"count": 1, "sum": 2.0, "mean": 2.0}
+
+
+def test_record_completion_counts_tokens(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    metrics.record_completion("scenario", "gpt-5-mini", 1.5, SimpleNamespace(prompt_tokens=900, completion_tokens=300))
+    metrics.record_completion("scenario", "gpt-5-mini", 0.5, None)
+    summary = registry.summary()
+    assert summary["openai_tokens_total"] == {
+        "kind=completion,model=gpt-5-mini": 300,
+        "kind=prompt,model=gpt-5-mini": 900,
+    }
+    assert summary["stage_seconds"]["stage=scenario"]["count"] == 2
+
+
+def test_metrics_endpoint_serves_text_format(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    metrics.record_bytes("downloaded", "youtube_media", 2048)
+    resp = asyncio.run(main.prometheus_metrics())
+    assert resp.media_type.startswith("text/plain")
+    assert 'storyflow_bytes_total{direction="downloaded",target="youtube_media"} 2048' in resp.body.decode()
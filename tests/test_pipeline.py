@@ -0,0 +1,190 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import pytest
+
+from app import pipeline
+from app.result_store import ResultStore
+from app.schemas import AnalysisResult, KeyObject, Segment, Shot, Transcript
+
+
+def _patch_stages(monkeypatch, delay=0.0, transcribe_error=None):
+    finished = []
+
+    def fake_transcribe(audio_path):
+        time.sleep(delay)
+        finished.append("transcribe")
+        if transcribe_error:
+            raise transcribe_error
+        return Transcript(segments=[Segment(text="hi", start=0.0, end=1.0)])
+
+    def fake_detect_shots(video_path):
+        time.sleep(delay * 2)
+        finished.append("detect_shots")
+        return (
+            [Shot(start_sec=0.0, end_sec=2.0)],
+            [KeyObject(description="Car", start_sec=0.0, end_sec=1.0)],
+        )
+
+    monkeypatch.setattr(pipeline.stt, "transcribe", fake_transcribe)
+    monkeypatch.setattr(pipeline.vision_shots, "detect_shots", fake_detect_shots)
+    return finished
+
+
+def test_analyze_media_runs_stages_concurrently(monkeypatch):
+    _patch_stages(monkeypatch, delay=0.2)
+    timings = {}
+
+    started = time.perf_counter()
+    result = pipeline.analyze_media("a.m4a", "v.mp4", timings)
+    elapsed = time.perf_counter() - started
+
+    assert result.transcript.segments[0].text == "hi"
+    assert result.shots[0].end_sec == 2.0
+    assert result.key_objects[0].description == "Car"
+    assert elapsed < 0.55
+    assert timings["transcribe"] >= 0.2
+    assert timings["detect_shots"] >= 0.4
+
+
+def test_analyze_media_without_video(monkeypatch):
+    finished = _patch_stages(monkeypatch)
+
+    result = pipeline.analyze_media("a.m4a", None)
+
+    assert result.shots == []
+    assert result.key_objects == []
+    assert finished == ["transcribe"]
+
+
+def test_analyze_media_requires_audio(monkeypatch):
+    _patch_stages(monkeypatch)
+
+    with pytest.raises(pipeline.MissingAudioError):
+        pipeline.analyze_media(None, "v.mp4")
+
+
+def test_analyze_media_waits_for_all_stages_before_raising(monkeypatch):
+    finished = _patch_stages(monkeypatch, delay=0.05, transcribe_error=ValueError("stt failed"))
+
+    with pytest.raises(ValueError, match="stt failed"):
+        pipeline.analyze_media("a.m4a", "v.mp4")
+
+    assert sorted(finished) == ["detect_shots", "transcribe"]
+
+
+def test_analyze_video_records_download_timing(monkeypatch):
+    _patch_stages(monkeypatch)
+
+    @contextmanager
+    def fake_pull(video_id):
+        yield "a.m4a", "v.mp4"
+
+    monkeypatch.setattr(pipeline.media_probe, "pull_transient", fake_pull)
+    timings = {}
+
+    pipeline.analyze_video("abc", timings)
+
+    assert set(timings) == {"download", "transcribe", "detect_shots", "total"}
+
+
+def test_analyze_media_async_runs_stages_concurrently(monkeypatch):
+    _patch_stages(monkeypatch, delay=0.2)
+
+    async def fake_transcribe_async(audio_path):
+        await asyncio.sleep(0.2)
+        return Transcript(segments=[Segment(text="async", start=0.0, end=1.0)])
+
+    monkeypatch.setattr(pipeline.stt, "transcribe_async", fake_transcribe_async)
+    timings = {}
+
+    started = time.perf_counter()
+    result = asyncio.run(pipeline.analyze_media_async("a.m4a", "v.mp4", timings))
+    elapsed = time.perf_counter() - started
+
+    assert result.transcript.segments[0].text == "async"
+    assert result.shots[0].end_sec == 2.0
+    assert elapsed < 0.55
+    assert set(timings) == {"transcribe", "detect_shots"}
+
+
+def test_analyze_video_reuses_stored_result(monkeypatch, tmp_path):
+    _patch_stages(monkeypatch)
+    pulls = []
+
+    @contextmanager
+    def fake_pull(video_id):
+        pulls.append(video_id)
+        yield "a.m4a", "v.mp4"
+
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_entries=10, max_age_seconds=60)
+    monkeypatch.setattr(pipeline.media_probe, "pull_transient", fake_pull)
+    monkeypatch.setattr(pipeline, "get_result_store", lambda: store)
+
+    first = pipeline.analyze_video("abc")
+    second = pipeline.analyze_video("abc")
+    pipeline.analyze_video("abc", force_refresh=True)
+
+    assert first == second
+    assert pulls == ["abc", "abc"]
+    assert store.get("abc", pipeline.pipeline_version()) == first
+
+
+def test_analyze_video_returns_the_result_when_storing_it_fails(monkeypatch, tmp_path):
+    _patch_stages(monkeypatch)
+
+    @contextmanager
+    def fake_pull(video_id):
+        yield "a.m4a", "v.mp4"
+
+    class LockedStore:
+        def get(self, video_id, version):
+            return None
+
+        def put(self, video_id, version, result):
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(pipeline.media_probe, "pull_transient", fake_pull)
+    monkeypatch.setattr(pipeline, "get_result_store", lambda: LockedStore())
+
+    assert pipeline.analyze_video("abc").shots == [Shot(start_sec=0.0, end_sec=2.0)]
+
+
+def test_analyze_video_async_reads_stored_result_off_the_loop(monkeypatch):
+    stored = AnalysisResult(transcript=Transcript(segments=[]), shots=[], key_objects=[])
+    threads = []
+
+    def fake_stored_result(video_id, force_refresh):
+        threads.append(threading.get_ident())
+        return stored
+
+    monkeypatch.setattr(pipeline, "_stored_result", fake_stored_result)
+
+    assert asyncio.run(pipeline.analyze_video_async("abc")) is stored
+    assert threads and threads[0] != threading.get_ident()
+
+
+def test_analyze_video_async_reports_stages(monkeypatch):
+    _patch_stages(monkeypatch, delay=0.05)
+
+    async def fake_transcribe_async(audio_path):
+        return Transcript(segments=[Segment(text="hi", start=0.0, end=1.0)])
+
+    @asynccontextmanager
+    async def fake_pull(video_id):
+        yield "a.m4a", "v.mp4"
+
+    monkeypatch.setattr(pipeline.stt, "transcribe_async", fake_transcribe_async)
+    monkeypatch.setattr(pipeline.media_probe, "pull_transient_async", fake_pull)
+    stages = []
+
+    asyncio.run(pipeline.analyze_video_async("abc", on_stage=lambda stage, info: stages.append((stage, info))))
+
+    assert stages == [
+        ("downloaded", {"audio": True, "video": True}),
+        ("transcript", {"segments": 1}),
+        ("shots", {"shots": 1}),
+    ]
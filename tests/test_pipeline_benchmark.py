@@ -0,0 +1,23 @@
+from benchmarks.pipeline_stages import STAGES, compare, run_suite
+from app.settings import settings
+
+
+def test_every_stage_runs_against_the_stand_ins():
+    shot_backend = settings.SHOT_BACKEND
+    report = run_suite({}, runs=1, warmup=0)
+    assert list(report["stages"]) == list(STAGES)
+    assert all(stage["median_ms"] > 0 for stage in report["stages"].values())
+    requests = report["meta"]["requests"]
+    assert requests["youtube"] and requests["whisper"] and requests["chat"] and requests["video_intelligence"]
+    # overrides are undone once the suite is over
+    assert settings.SHOT_BACKEND == shot_backend
+
+
+def test_compare_needs_relative_and_absolute_slowdown():
+    baseline = {"stages": {"a": {"median_ms": 100.0}, "b": {"median_ms": 2.0}, "c": {"median_ms": 50.0}}}
+    report = {"stages": {"a": {"median_ms": 150.0}, "b": {"median_ms": 4.0}, "c": {"median_ms": 51.0}, "d": {"median_ms": 1.0}}}
+    rows = {row["stage"]: row for row in compare(report, baseline, tolerance=0.2, min_delta_ms=5)}
+    assert rows["a"]["regression"]
+    assert not rows["b"]["regression"]
+    assert not rows["c"]["regression"]
+    assert "d" not in rows
@@ -0,0 +1,55 @@
+from app import prompt_context
+from app.prompt_context import Row, align_rows, build_scenario_context, estimate_tokens, fit
+from app.schemas import Segment, Shot, Transcript
+
+
+def test_segments_are_aligned_to_shots_and_merged():
+    transcript = Transcript(
+        segments=[
+            Segment(text=" Привет ", start=0.1234, end=1.0),
+            Segment(text="мир", start=1.0, end=1.9),
+            Segment(text="после", start=5.0, end=5.5),
+            Segment(text="шотов", start=5.6, end=6.0),
+        ]
+    )
+    shots = [Shot(start_sec=0.0, end_sec=2.0), Shot(start_sec=2.0, end_sec=4.0)]
+
+    rows = align_rows(transcript, shots)
+
+    assert rows == [Row(0.0, 2.0, "Привет мир"), Row(2.0, 4.0, ""), Row(5.0, 6.0, "после шотов")]
+    text = prompt_context.render("тема", rows)
+    assert text.splitlines() == ["topic: тема", "t0|t1|text", "0|2|Привет мир", "2|4|", "5|6|после шотов"]
+
+
+def test_compact_context_is_smaller_than_raw_json():
+    segments = [Segment(text=f"фраза номер {i}", start=i * 1.0001, end=i * 1.0001 + 0.9) for i in range(50)]
+    shots = [Shot(start_sec=i * 5.0, end_sec=i * 5.0 + 5.0) for i in range(10)]
+
+    text, report = build_scenario_context(Transcript(segments=segments), shots, "t", budget=0)
+
+    assert report.compact_tokens < report.raw_tokens / 2
+    assert not report.truncated
+    assert "фраза номер 49" in text
+
+
+def test_budget_trims_longest_rows_first():
+    rows = [Row(0, 1, "коротко"), Row(1, 2, "очень длинная реплика " * 40)]
+
+    text, truncated = fit("t", rows, budget=100)
+
+    assert truncated
+    assert estimate_tokens(text) <= 100
+    assert "|коротко" in text
+    assert prompt_context.ELLIPSIS in text
+
+
+def test_budget_merges_rows_when_lines_are_already_short():
+    rows = [Row(float(i), float(i + 1), f"реплика {i} " * 10) for i in range(40)]
+
+    text, truncated = fit("t", rows, budget=300)
+
+    assert truncated
+    assert estimate_tokens(text) <= 300
+    lines = text.splitlines()[2:]
+    assert len(lines) < 40
+    assert lines[0].startswith("0|") and lines[-1].split("|")[1] == "40"
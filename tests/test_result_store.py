@@ -0,0 +1,42 @@
+import time
+
+from app.result_store import ResultStore
+from app.schemas import AnalysisResult, Segment, Shot, Transcript
+
+
+def _result(text="hi"):
+    return AnalysisResult(
+        transcript=Transcript(segments=[Segment(text=text, start=0.0, end=1.0)]),
+        shots=[Shot(start_sec=0.0, end_sec=1.0)],
+    )
+
+
+def test_store_round_trip_by_version(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_entries=10, max_age_seconds=60)
+    store.put("abc", "v1", _result("привет"))
+
+    assert store.get("abc", "v1").transcript.segments[0].text == "привет"
+    assert store.get("abc", "v2") is None
+    assert store.get("other", "v1") is None
+
+
+def test_store_evicts_least_recently_accessed(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_entries=2, max_age_seconds=60)
+    store.put("a", "v", _result())
+    time.sleep(0.01)
+    store.put("b", "v", _result())
+    time.sleep(0.01)
+    store.get("a", "v")
+    time.sleep(0.01)
+    store.put("c", "v", _result())
+
+    assert store.count() == 2
+    assert store.get("b", "v") is None
+    assert store.get("a", "v") is not None
+
+
+def test_store_expires_old_entries(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_entries=10, max_age_seconds=0)
+    store.put("a", "v", _result())
+
+    assert store.get("a", "v") is None
@@ -0,0 +1,81 @@
+import json
+
+from app import schema_repair
+from app.llm_storyboard import WindowPlan
+from app.schema_repair import RepairStats, close_truncated, repair
+from app.schemas import Scenario, Storyboard
+
+SCENE = {"duration_sec": 5, "visual_description": "v", "voice_lines": [{"role": "n", "text": "hi"}]}
+
+
+def test_valid_input_needs_no_fixes():
+    result = repair(json.dumps({"scenes": [SCENE], "meta": {"topic": "t", "source": "s"}}), Scenario)
+
+    assert result.value.scenes[0].duration_sec == 5
+    assert result.fixes == []
+
+
+def test_mechanical_errors_are_fixed_locally():
+    raw = json.dumps({
+        "storyboard": {
+            "scenes": [dict(SCENE, duration_sec=4.6, tempo=2, transitions="cut", voice_lines={"role": "n", "text": "hi"})],
+            "total_duration_sec": "5.0",
+            "target": "Shorts",
+        }
+    })
+
+    result = repair(f"```json\n{raw}\n```", Storyboard)
+
+    board = result.value
+    assert board.scenes[0].duration_sec == 5
+    assert board.scenes[0].broll_hints == []
+    assert board.scenes[0].tempo == "2"
+    assert board.scenes[0].voice_lines[0].text == "hi"
+    assert board.total_duration_sec == 5
+    assert board.target == "shorts"
+    assert "unwrapped 'storyboard'" in result.fixes
+
+
+def test_truncated_trailing_object_is_dropped():
+    story = dict(SCENE, broll_hints=[], tempo="fast", transitions="cut")
+    full = json.dumps({"scenes": [story, story]})
+    truncated = full[: full.rindex("visual_description")]
+
+    result = repair(truncated, WindowPlan)
+
+    assert close_truncated(truncated) is not None
+    assert len(result.value.scenes) == 1
+    assert "closed truncated JSON" in result.fixes
+
+
+def test_bare_list_is_wrapped_into_single_list_field():
+    result = repair(json.dumps([dict(SCENE, broll_hints=[], tempo="fast", transitions="cut")]), WindowPlan)
+
+    assert result.value.scenes[0].tempo == "fast"
+
+
+def test_unfixable_fields_are_reported_for_reprompt():
+    raw = json.dumps({"scenes": [dict(SCENE, duration_sec=-3, visual_description=None)], "meta": {"topic": "t", "source": "s"}})
+
+    result = repair(raw, Scenario)
+
+    assert result.value is None
+    assert [e.split(":")[0] for e in result.errors] == ["scenes.0.duration_sec", "scenes.0.visual_description"]
+
+
+def test_stats_track_repair_and_reprompt_rates():
+    stats = RepairStats()
+    stats.record("Scenario", repair("{}", Scenario))
+    stats.record("Scenario", repair(json.dumps({"scenario": {"scenes": [], "meta": {"topic": "t", "source": "s"}}}), Scenario))
+
+    report = stats.report()["Scenario"]
+    assert report["calls"] == 2
+    assert report["repair_rate"] == 0.5
+    assert report["reprompt_rate"] == 0.5
+
+
+def test_parse_records_into_module_stats():
+    schema_repair.repair_stats.reset()
+    schema_repair.parse("not json", Scenario)
+
+    assert schema_repair.repair_stats.report()["Scenario"]["reprompted"] == 1
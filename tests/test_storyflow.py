@@ -1,4 +1,6 @@
+import asyncio
 import json
+import pytest
 from app.schemas import Scenario, ScenarioMeta, Scene, VoiceLine
 from app import llm_storyboard
 
@@ -32,3 +34,126 @@ def test_storyboard_generation(monkeypatch):
     board = llm_storyboard.plan_timeline(scenario, "shorts")
     assert board.total_duration_sec == 10
     assert board.scenes[0].tempo == "fast"
+
+
+def test_storyboard_generation_async(monkeypatch):
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=5, visual_description="v", voice_lines=[])],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+
+    async def fake_create(*args, **kwargs):
+        message = type("m", (), {"content": json.dumps({
+            "scenes": [
+                {
+                    "duration_sec": 5,
+                    "visual_description": "v",
+                    "voice_lines": [],
+                    "broll_hints": ["city"],
+                    "tempo": "slow",
+                    "transitions": "fade"
+                }
+            ],
+            "total_duration_sec": 5,
+            "target": "youtube"
+        })})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_storyboard.async_client.chat.completions, "create", fake_create)
+    board = asyncio.run(llm_storyboard.plan_timeline_async(scenario, "youtube"))
+    assert board.target == "youtube"
+    assert board.scenes[0].broll_hints == ["city"]
+
+
+def _echo_window(kwargs, transitions="cut", broll=("city",)):
+    scenes = json.loads(kwargs["messages"][1]["content"])["scenes"]
+    return json.dumps({"scenes": [
+        dict(s, broll_hints=list(broll), tempo="fast", transitions=transitions) for s in scenes
+    ]})
+
+
+def test_storyboard_windows_are_planned_separately_and_retried_alone(monkeypatch):
+    monkeypatch.setattr(llm_storyboard.settings, "STORYBOARD_WINDOW_SCENES", 2)
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=i + 1, visual_description=f"s{i}", voice_lines=[]) for i in range(5)],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+    calls = []
+
+    async def fake_create(*args, **kwargs):
+        first = json.loads(kwargs["messages"][1]["content"])["context"]["first_scene_index"]
+        calls.append(first)
+        if first == 2 and calls.count(2) == 1:
+            content = json.dumps({"scenes": []})
+        else:
+            content = _echo_window(kwargs, transitions="" if first == 0 else "cut")
+        message = type("m", (), {"content": content})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_storyboard.async_client.chat.completions, "create", fake_create)
+    board = asyncio.run(llm_storyboard.plan_timeline_async(scenario, "youtube"))
+
+    assert sorted(calls) == [0, 2, 2, 4]
+    assert [s.visual_description for s in board.scenes] == ["s0", "s1", "s2", "s3", "s4"]
+    assert board.total_duration_sec == 15
+    # edge fixes from the reduce step
+    assert board.scenes[1].transitions == "cut"
+    assert board.scenes[0].transitions == ""
+    assert board.scenes[2].broll_hints == []
+    assert board.scenes[3].broll_hints == ["city"]
+
+
+def test_storyboard_window_failure_raises_after_retry(monkeypatch):
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=1, visual_description="v", voice_lines=[])],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+    calls = []
+
+    def fake_create(*args, **kwargs):
+        calls.append(kwargs["messages"])
+        message = type("m", (), {"content": "not json"})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    monkeypatch.setattr(llm_storyboard.client.chat.completions, "create", fake_create)
+
+    with pytest.raises(RuntimeError, match="Storyboard validation failed"):
+        llm_storyboard.plan_timeline(scenario, "shorts")
+    assert len(calls) == llm_storyboard.WINDOW_ATTEMPTS
+    assert "Storyboard validation failed" in calls[-1][-1]["content"]
+
+
+def test_async_storyboard_cancels_other_windows_when_one_fails(monkeypatch):
+    monkeypatch.setattr(llm_storyboard.settings, "STORYBOARD_WINDOW_SCENES", 1)
+    scenario = Scenario(
+        scenes=[Scene(duration_sec=1, visual_description=f"s{i}", voice_lines=[]) for i in range(2)],
+        meta=ScenarioMeta(topic="t", source="s"),
+    )
+    cancelled = []
+    started = None
+
+    async def fake_create(*args, **kwargs):
+        first = json.loads(kwargs["messages"][1]["content"])["context"]["first_scene_index"]
+        if first == 1:
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(first)
+                raise
+        # fail only once the other window's request is in flight
+        await started.wait()
+        message = type("m", (), {"content": "not json"})
+        return type("obj", (), {"choices": [type("c", (), {"message": message})]})
+
+    async def run():
+        nonlocal started
+        started = asyncio.Event()
+        with pytest.raises(RuntimeError, match="Storyboard validation failed"):
+            await llm_storyboard.plan_timeline_async(scenario, "shorts")
+        await asyncio.sleep(0)
+        # checked before asyncio.run cancels leftover tasks on its own
+        assert cancelled == [1]
+
+    monkeypatch.setattr(llm_storyboard.async_client.chat.completions, "create", fake_create)
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
@@ -1,8 +1,14 @@
+import asyncio
+import threading
 from types import SimpleNamespace
 
+import numpy as np
 import pytest
+from pydantic import ValidationError
 
 from app import stt
+from app.schemas import Segment, Transcript
+from app.vad import Chunk
 
 
 class _DummyClient:
@@ -69,3 +75,97 @@ def test_transcribe_without_segments(monkeypatch, tmp_path):
 
     with pytest.raises(ValueError, match="did not include segments"):
         stt.transcribe(str(_write_audio(tmp_path)))
+
+
+def test_transcribe_async(monkeypatch, tmp_path):
+    response = SimpleNamespace(segments=[SimpleNamespace(text="hey", start=0.0, end=0.5)])
+
+    class _AsyncDummyClient(_DummyClient):
+        async def create(self, *args, **kwargs):
+            return self._response
+
+    monkeypatch.setattr(stt, "async_client", _AsyncDummyClient(response))
+
+    transcript = asyncio.run(stt.transcribe_async(str(_write_audio(tmp_path))))
+
+    assert [s.text for s in transcript.segments] == ["hey"]
+
+
+def test_merge_chunk_segments_offsets_and_dedupes():
+    chunks = [
+        Chunk(start=0.0, end=10.0, logical_start=0.0),
+        Chunk(start=9.0, end=20.0, logical_start=10.0),
+    ]
+    results = [
+        [Segment(text="hello there", start=0.0, end=4.0), Segment(text="my old", start=8.0, end=10.0)],
+        [
+            Segment(text="my old", start=0.0, end=0.8),
+            Segment(text="old friend, how", start=1.0, end=3.0),
+            Segment(text="are you", start=3.0, end=5.0),
+        ],
+    ]
+
+    merged = stt.merge_chunk_segments(chunks, results)
+
+    assert [(s.text, s.start, s.end) for s in merged] == [
+        ("hello there", 0.0, 4.0),
+        ("my old", 8.0, 10.0),
+        ("friend, how", 10.0, 12.0),
+        ("are you", 12.0, 14.0),
+    ]
+
+
+def test_transcribe_chunked_runs_chunks_in_parallel(monkeypatch, tmp_path):
+    rate = stt.PCM_RATE
+    samples = np.concatenate([
+        np.full(rate * 40, 8000, dtype=np.int16),
+        np.zeros(rate, dtype=np.int16),
+        np.full(rate * 20, 8000, dtype=np.int16),
+    ])
+    monkeypatch.setattr(stt, "decode_pcm", lambda path, r: samples)
+    uploads = []
+
+    class _ChunkClient(_DummyClient):
+        def create(self, *args, **kwargs):
+            uploads.append(kwargs["file"].name)
+            return SimpleNamespace(segments=[SimpleNamespace(text=f"part{len(uploads)}", start=0.5, end=1.0)])
+
+    monkeypatch.setattr(stt, "client", _ChunkClient(None))
+
+    transcript = stt.transcribe(str(_write_audio(tmp_path)), chunked=True)
+
+    assert len(uploads) == 2
+    assert all(path.endswith(".wav") for path in uploads)
+    assert [s.start for s in transcript.segments] == [0.5, 41.0]
+
+
+def test_transcript_validates_sdk_segments_in_bulk():
+    # SDK segments carry extra fields; invalid rows still fail validation
+    segments = [SimpleNamespace(id=0, text="привет", start=0.0, end=1.5, tokens=[1, 2], no_speech_prob=0.1)]
+    transcript = stt._transcript_from_response(SimpleNamespace(segments=segments))
+    assert transcript.segments == [Segment(text="привет", start=0.0, end=1.5)]
+    with pytest.raises(ValidationError):
+        stt._transcript_from_response({"segments": [{"text": "x", "start": "soon", "end": 1.0}]})
+
+
+def test_transcribe_chunked_async_writes_chunks_off_the_loop(monkeypatch, tmp_path):
+    rate = stt.PCM_RATE
+    samples = np.concatenate([np.full(rate * 40, 8000, dtype=np.int16), np.zeros(rate, dtype=np.int16)] * 2)
+    monkeypatch.setattr(stt, "decode_pcm", lambda path, r: samples)
+    write_chunks = stt._write_chunks
+    threads = []
+
+    def fake_write_chunks(tmpdir, samples, chunks):
+        threads.append(threading.get_ident())
+        return write_chunks(tmpdir, samples, chunks)
+
+    async def fake_transcribe_file(path):
+        return Transcript(segments=[Segment(text="part", start=0.5, end=1.0)])
+
+    monkeypatch.setattr(stt, "_write_chunks", fake_write_chunks)
+    monkeypatch.setattr(stt, "_transcribe_file_async", fake_transcribe_file)
+
+    transcript = asyncio.run(stt.transcribe_async(str(_write_audio(tmp_path)), chunked=True))
+
+    assert len(transcript.segments) == 2
+    assert threads and threads[0] != threading.get_ident()
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app import trending_index, youtube_client
+from app.schemas import Candidate
+from app.trending_index import TrendingIndex
+
+PUBLISHED = datetime(2025, 8, 1, tzinfo=timezone.utc)
+T0 = PUBLISHED.timestamp() + 10 * 3600
+
+
+def _candidate(video_id, views, likes=0, hours_old=10.0, now=T0):
+    published = datetime.fromtimestamp(now - hours_old * 3600, timezone.utc)
+    return Candidate(
+        video_id=video_id,
+        title=f"title {video_id}",
+        channel_title="C",
+        published_at=published,
+        view_count=views,
+        like_count=likes,
+        is_shorts=True,
+    )
+
+
+def _index(tmp_path, **kwargs):
+    options = {"ttl_seconds": 3600, "stats_ttl_seconds": 600, **kwargs}
+    return TrendingIndex(str(tmp_path / "trending.sqlite3"), **options)
+
+
+def test_ranking_features_use_growth_between_snapshots():
+    features = trending_index.ranking_features(
+        published_at=np.array([0.0, 0.0]),
+        taken_at=np.array([7200.0, 7200.0]),
+        views=np.array([1000.0, 600.0]),
+        likes=np.array([10.0, 60.0]),
+        prev_taken_at=np.array([3600.0, np.nan]),
+        prev_views=np.array([900.0, np.nan]),
+    )
+    assert features["views_per_hour"].tolist() == [500.0, 300.0]
+    # one snapshot: growth falls back to lifetime velocity
+    assert features["growth_per_hour"].tolist() == [100.0, 300.0]
+    assert features["like_ratio"].tolist() == [0.01, 0.1]
+
+
+def test_lookup_ranks_by_velocity_not_lifetime_views(tmp_path):
+    index = _index(tmp_path)
+    query = trending_index.query_key("Айфон  лайфхаки", "RU", "2025-08-01T00:00:00Z", True)
+    old = _candidate("old", 100_000, hours_old=1000)
+    fresh = _candidate("fresh", 20_000, hours_old=2)
+    index.record(query, [old, fresh], depth=2, now=T0)
+
+    ranked = index.lookup(query, 2, now=T0 + 60)
+    assert [c.video_id for c in ranked] == ["fresh", "old"]
+    assert ranked[0] == fresh
+    assert trending_index.query_key("айфон лайфхаки", "RU", "2025-08-01T00:00:00Z", True) == query
+
+
+def test_lookup_misses_when_stale_expired_or_too_shallow(tmp_path):
+    index = _index(tmp_path)
+    query = trending_index.query_key("t", "RU", "", True)
+    index.record(query, [_candidate("a", 10), _candidate("b", 20)], depth=2, now=T0)
+
+    assert index.lookup(query, 2, now=T0 + 60) is not None
+    assert index.lookup(query, 3, now=T0 + 60) is None
+    assert index.lookup("other", 1, now=T0 + 60) is None
+    # stats older than stats_ttl_seconds
+    assert index.lookup(query, 2, now=T0 + 700) is None
+    index.add_snapshots([_candidate("a", 30), _candidate("b", 20)], now=T0 + 650)
+    assert [c.video_id for c in index.lookup(query, 2, now=T0 + 700)] == ["a", "b"]
+    # the search itself expired
+    assert index.lookup(query, 2, now=T0 + 3700) is None
+
+
+def test_snapshots_are_capped_per_video(tmp_path):
+    index = _index(tmp_path, snapshots_per_video=2)
+    index.record("q", [_candidate("a", 1)], depth=1, now=T0)
+    for i in range(1, 5):
+        index.add_snapshots([_candidate("a", 1 + i)], now=T0 + i)
+    rows = index._conn.execute("SELECT taken_at FROM snapshots ORDER BY taken_at").fetchall()
+    assert [r[0] for r in rows] == [T0 + 3, T0 + 4]
+
+
+def test_refresh_polls_stale_videos_in_batches_and_forgets_missing(tmp_path, monkeypatch):
+    index = _index(tmp_path, ttl_seconds=1e12)
+    ids = [f"v{i:03d}" for i in range(120)]
+    index.record("q", [_candidate(v, 10) for v in ids], depth=120, now=T0)
+    calls = []
+
+    def fake_fetch(video_ids, shorts):
+        calls.append(len(video_ids))
+        return [_candidate(v, 20) for v in video_ids if v != "v007"]
+
+    monkeypatch.setattr(youtube_client, "fetch_candidates", fake_fetch)
+    assert trending_index.refresh(index, max_age_seconds=0) == 120
+    assert sorted(calls) == [20, 50, 50]
+    assert index.stale_videos(3600) == []
+    ranked = index.ranked("q", 200)
+    assert len(ranked) == 119
+    assert all(c.view_count == 20 for c in ranked)
+
+
+def test_search_goes_live_only_when_the_index_cannot_answer(tmp_path, monkeypatch):
+    index = _index(tmp_path)
+    monkeypatch.setattr(trending_index, "get_trending_index", lambda: index)
+    live_calls = []
+
+    async def fake_search(topic, n, region, published_after, shorts):
+        live_calls.append(n)
+        now = time.time()
+        return [_candidate("a", 100, hours_old=100, now=now), _candidate("b", 50, hours_old=1, now=now)][:n]
+
+    monkeypatch.setattr(youtube_client, "search_trending_async", fake_search)
+
+    first = asyncio.run(trending_index.search_trending_async("t", 2, "RU", "", True))
+    second = asyncio.run(trending_index.search_trending_async("t", 1, "RU", "", True))
+    assert [c.video_id for c in first] == ["b", "a"]
+    assert [c.video_id for c in second] == ["b"]
+    # the live search fetched a full pool, so a larger n is still answered locally
+    asyncio.run(trending_index.search_trending_async("t", 10, "RU", "", True))
+    assert live_calls == [trending_index.CANDIDATE_POOL]
+
+    asyncio.run(trending_index.search_trending_async("t", 1, "RU", "", True, live=True))
+    asyncio.run(trending_index.search_trending_async("t", 80, "RU", "", True))
+    assert live_calls == [trending_index.CANDIDATE_POOL] * 2 + [80]
+
+
+@pytest.mark.parametrize("ttl", [0, -1])
+def test_index_disabled_by_zero_ttl(monkeypatch, ttl):
+    monkeypatch.setattr(trending_index.settings, "TRENDING_INDEX_TTL_SECONDS", ttl)
+    assert trending_index.get_trending_index() is None
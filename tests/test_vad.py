@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from app import vad
+
+RATE = 16000
+
+
+def _tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+def test_silence_centers_finds_pauses():
+    samples = np.concatenate([_tone(2), _silence(1), _tone(2), _silence(0.1), _tone(1)])
+
+    centers = vad.silence_centers(samples, RATE)
+
+    assert centers == pytest.approx([2.5], abs=0.05)
+
+
+def test_plan_chunks_cuts_at_silence():
+    samples = np.concatenate([_tone(8), _silence(1), _tone(6), _silence(1), _tone(8)])
+
+    chunks = vad.plan_chunks(samples, RATE, target_seconds=10, max_seconds=12, overlap_seconds=1)
+
+    assert [round(c.end, 1) for c in chunks[:-1]] == [8.5, 15.5]
+    assert all(c.overlap == 0 for c in chunks)
+    assert chunks[-1].end == pytest.approx(len(samples) / RATE)
+
+
+def test_plan_chunks_hard_cut_overlaps_next_chunk():
+    samples = _tone(25)
+
+    chunks = vad.plan_chunks(samples, RATE, target_seconds=8, max_seconds=10, overlap_seconds=1)
+
+    assert [(c.start, c.logical_start, c.end) for c in chunks] == [
+        (0.0, 0.0, 10.0),
+        (9.0, 10.0, 20.0),
+        (19.0, 20.0, 25.0),
+    ]
+
+
+def test_plan_chunks_short_audio_is_single_chunk():
+    chunks = vad.plan_chunks(_tone(5), RATE, target_seconds=30, max_seconds=45, overlap_seconds=1)
+
+    assert chunks == [vad.Chunk(start=0.0, end=5.0, logical_start=0.0)]
+
+
+def test_sound_bounds_skip_leading_and_trailing_silence():
+    rate = 16000
+    t = np.arange(rate) / rate
+    tone = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    samples = np.concatenate([np.zeros(2 * rate, np.int16), tone, np.zeros(rate, np.int16)])
+
+    start, end = vad.sound_bounds(samples, rate, pad_seconds=0.1)
+
+    assert 1.85 <= start <= 2.0
+    assert 3.0 <= end <= 3.15
+    assert vad.sound_bounds(np.zeros(rate, np.int16), rate) == (0.0, 1.0)
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from app import video_proxy
+from app.ffmpeg_tools import FFmpegError
+from app.media_probe import MediaCache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"v" * 5000)
+    return str(path)
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    calls = []
+
+    def fake_run(args, timeout=300):
+        calls.append(args)
+        with open(args[-1], "wb") as f:
+            f.write(b"p" * 50)
+        return b""
+
+    monkeypatch.setattr(video_proxy.settings, "VIDEO_PROXY_HEIGHT", 240)
+    monkeypatch.setattr(video_proxy, "run_ffmpeg", fake_run)
+    return calls
+
+
+def test_proxy_is_small_and_temporary(fake_ffmpeg, source):
+    with video_proxy.proxied(source) as path:
+        assert os.path.getsize(path) == 50
+    assert not os.path.exists(path)
+    args = fake_ffmpeg[0]
+    assert "-an" in args
+    assert "scale=-2:240" in args[args.index("-vf") + 1]
+
+
+def test_proxy_is_cached_by_source_hash(monkeypatch, fake_ffmpeg, source, tmp_path):
+    cache = MediaCache(str(tmp_path / "proxies"), max_bytes=10_000)
+    monkeypatch.setattr(video_proxy, "get_proxy_cache", lambda: cache)
+
+    with video_proxy.proxied(source) as first:
+        pass
+    with video_proxy.proxied(source) as second:
+        assert os.path.exists(second)
+
+    assert first == second
+    assert len(fake_ffmpeg) == 1
+
+
+def test_proxy_failure_uploads_original(monkeypatch, source):
+    def broken(args, timeout=300):
+        raise FFmpegError("boom")
+
+    monkeypatch.setattr(video_proxy.settings, "VIDEO_PROXY_HEIGHT", 240)
+    monkeypatch.setattr(video_proxy, "run_ffmpeg", broken)
+
+    with video_proxy.proxied(source) as path:
+        assert path == source
+
+
+def test_disabled_proxy_passes_original_through(source):
+    with video_proxy.proxied(source) as path:
+        assert path == source
@@ -5,6 +5,7 @@ import pytest
 
 from google.cloud import videointelligence
 
+from app.schemas import Shot
 from app.vision_shots import detect_shots
 
 
@@ -86,3 +87,40 @@ def test_detect_shots_handles_empty_annotations(mock_client_cls, tmp_path):
 
     assert shots == []
     assert key_objects == []
+
+
+@patch("app.vision_shots.videointelligence.VideoIntelligenceServiceClient")
+def test_detect_shots_hybrid_uses_local_shots_and_remote_labels(mock_client_cls, tmp_path, monkeypatch):
+    video_path = tmp_path / "sample.mp4"
+    video_path.write_bytes(b"video")
+    monkeypatch.setattr(
+        "app.local_shots.detect_shots_local",
+        lambda path: [Shot(start_sec=0.0, end_sec=1.5), Shot(start_sec=1.5, end_sec=3.0)],
+    )
+
+    mock_client = MagicMock()
+    mock_client.annotate_video.return_value = _make_operation(SimpleNamespace(annotation_results=[]))
+    mock_client_cls.return_value = mock_client
+
+    shots, key_objects = detect_shots(str(video_path), backend="hybrid")
+
+    assert [s.end_sec for s in shots] == [1.5, 3.0]
+    assert key_objects == []
+    features = mock_client.annotate_video.call_args.kwargs["request"]["features"]
+    assert features == [videointelligence.Feature.LABEL_DETECTION]
+
+
+@patch("app.vision_shots.videointelligence.VideoIntelligenceServiceClient")
+def test_detect_shots_local_skips_remote(mock_client_cls, monkeypatch):
+    monkeypatch.setattr("app.local_shots.detect_shots_local", lambda path: [Shot(start_sec=0.0, end_sec=1.0)])
+
+    shots, key_objects = detect_shots("clip.mp4", backend="local")
+
+    assert len(shots) == 1
+    assert key_objects == []
+    mock_client_cls.assert_not_called()
+
+
+def test_detect_shots_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown shot backend"):
+        detect_shots("clip.mp4", backend="magic")
@@ -1,4 +1,23 @@
+import asyncio
+
+import httpx
+import pytest
+
 from app import youtube_client
+from app.api_cache import MemoryBackend, ResponseCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    cache = ResponseCache(
+        MemoryBackend(),
+        ttls={"/search": 60, "/videos": 60},
+        revalidate=frozenset({"/videos"}),
+    )
+    youtube_client.set_response_cache(cache)
+    youtube_client.quota_ledger.reset()
+    yield cache
+    youtube_client.set_response_cache(None)
 
 
 def test_search_trending(monkeypatch):
@@ -25,3 +44,248 @@ def test_search_trending(monkeypatch):
     res = youtube_client.search_trending("test", 1, "RU", "2025-08-01T00:00:00Z")
     assert res[0].video_id == "abc"
     assert res[0].view_count == 10
+
+
+def test_search_trending_async(monkeypatch):
+    calls = []
+
+    async def fake_search_list_async(**params):
+        calls.append(params)
+        return {"items": [{"id": {"videoId": "abc"}}]}
+
+    async def fake_videos_list_async(**params):
+        return {
+            "items": [
+                {
+                    "id": "abc",
+                    "snippet": {"title": "T", "channelTitle": "C", "publishedAt": "2025-08-02T00:00:00Z"},
+                    "statistics": {"viewCount": "7"},
+                }
+            ]
+        }
+
+    monkeypatch.setattr(youtube_client, "search_list_async", fake_search_list_async)
+    monkeypatch.setattr(youtube_client, "videos_list_async", fake_videos_list_async)
+    res = asyncio.run(youtube_client.search_trending_async("test", 1, "RU", "2025-08-01T00:00:00Z"))
+    assert res[0].video_id == "abc"
+    assert res[0].view_count == 7
+    assert res[0].like_count == 0
+    assert calls[0]["videoDuration"] == "short"
+
+
+def test_request_reuses_pooled_client(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"items": []})
+
+    youtube_client.startup(transport=httpx.MockTransport(handler))
+    try:
+        client = youtube_client.get_client()
+        youtube_client.search_list(q="a")
+        youtube_client.videos_list(id="b")
+        assert youtube_client.get_client() is client
+    finally:
+        youtube_client.shutdown()
+
+    assert [r.url.path for r in seen] == ["/youtube/v3/search", "/youtube/v3/videos"]
+    assert seen[0].url.params["key"] == "x"
+    assert client.is_closed
+
+
+def test_request_retries_then_raises(monkeypatch):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(503)
+
+    monkeypatch.setattr(youtube_client.time, "sleep", lambda seconds: None)
+    youtube_client.startup(transport=httpx.MockTransport(handler))
+    try:
+        with pytest.raises(youtube_client.YouTubeAPIRequestError):
+            youtube_client.search_list(q="a")
+    finally:
+        youtube_client.shutdown()
+
+    assert len(attempts) == 3
+
+
+def test_failed_responses_spend_quota(monkeypatch):
+    responses = iter([httpx.Response(500), httpx.Response(200, json={"items": []})])
+    monkeypatch.setattr(youtube_client.time, "sleep", lambda seconds: None)
+    youtube_client.startup(transport=httpx.MockTransport(lambda request: next(responses)))
+    try:
+        youtube_client.search_list(q="a")
+    finally:
+        youtube_client.shutdown()
+
+    report = youtube_client.quota_report()["/search"]
+    assert report["calls"] == 2
+    assert report["failed"] == 1
+    assert report["units_spent"] == 200
+    requests = {
+        labels["status"]: value
+        for name, labels, value in youtube_client._quota_samples()
+        if name == "youtube_requests_total"
+    }
+    assert requests == {"ok": 1, "error": 1}
+
+
+def test_async_request_uses_injected_transport():
+    def handler(request):
+        return httpx.Response(200, json={"items": [{"id": {"videoId": "zz"}}]})
+
+    async def run():
+        youtube_client.startup(async_transport=httpx.MockTransport(handler))
+        try:
+            return await youtube_client.search_list_async(q="a")
+        finally:
+            await youtube_client.shutdown_async()
+
+    assert asyncio.run(run())["items"][0]["id"]["videoId"] == "zz"
+
+
+def _paged_search(pages):
+    calls = []
+
+    def fake_search_list(**params):
+        calls.append(params)
+        index = int(params.get("pageToken", "0"))
+        resp = {"items": [{"id": {"videoId": vid}} for vid in pages[index]]}
+        if index + 1 < len(pages):
+            resp["nextPageToken"] = str(index + 1)
+        return resp
+
+    return calls, fake_search_list
+
+
+def _fake_videos(calls):
+    def fake_videos_list(**params):
+        ids = params["id"].split(",")
+        calls.append(ids)
+        return {
+            "items": [
+                {
+                    "id": vid,
+                    "snippet": {"title": vid, "channelTitle": "C", "publishedAt": "2025-08-02T00:00:00Z"},
+                    "statistics": {"viewCount": "1"},
+                }
+                for vid in ids
+            ]
+        }
+
+    return fake_videos_list
+
+
+def test_search_trending_follows_pages_and_batches(monkeypatch):
+    pages = [[f"v{p}_{i}" for i in range(50)] for p in range(3)]
+    search_calls, fake_search_list = _paged_search(pages)
+    videos_calls = []
+    monkeypatch.setattr(youtube_client, "search_list", fake_search_list)
+    monkeypatch.setattr(youtube_client, "videos_list", _fake_videos(videos_calls))
+
+    res = youtube_client.search_trending("test", 120, "RU", "2025-08-01T00:00:00Z")
+
+    assert [c.video_id for c in res] == [vid for page in pages for vid in page][:120]
+    assert [c.get("pageToken") for c in search_calls] == [None, "1", "2"]
+    assert sorted(len(ids) for ids in videos_calls) == [20, 50, 50]
+
+
+def test_iter_trending_stops_without_next_page(monkeypatch):
+    search_calls, fake_search_list = _paged_search([["a", "b", "a"]])
+    monkeypatch.setattr(youtube_client, "search_list", fake_search_list)
+    monkeypatch.setattr(youtube_client, "videos_list", _fake_videos([]))
+
+    res = list(youtube_client.iter_trending("test", 10, "RU", "2025-08-01T00:00:00Z"))
+
+    assert sorted(c.video_id for c in res) == ["a", "b"]
+    assert len(search_calls) == 1
+
+
+def test_iter_trending_async_batches(monkeypatch):
+    pages = [[f"v{p}_{i}" for i in range(50)] for p in range(2)]
+    _, fake_search_list = _paged_search(pages)
+    videos_calls = []
+    fake_videos_list = _fake_videos(videos_calls)
+
+    async def fake_search_list_async(**params):
+        return fake_search_list(**params)
+
+    async def fake_videos_list_async(**params):
+        return fake_videos_list(**params)
+
+    monkeypatch.setattr(youtube_client, "search_list_async", fake_search_list_async)
+    monkeypatch.setattr(youtube_client, "videos_list_async", fake_videos_list_async)
+
+    res = asyncio.run(youtube_client.search_trending_async("test", 100, "RU", "2025-08-01T00:00:00Z"))
+
+    assert [c.video_id for c in res] == pages[0] + pages[1]
+    assert len(videos_calls) == 2
+
+
+def test_request_serves_fresh_entries_from_cache():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"items": [{"id": {"videoId": "abc"}}]})
+
+    youtube_client.startup(transport=httpx.MockTransport(handler))
+    try:
+        first = youtube_client.search_list(q="cats", part="snippet")
+        second = youtube_client.search_list(part="snippet", q="cats")
+    finally:
+        youtube_client.shutdown()
+
+    assert first == second
+    assert len(seen) == 1
+    report = youtube_client.quota_report()["/search"]
+    assert report["units_spent"] == 100
+    assert report["units_saved"] == 100
+    assert report["cache_hits"] == 1
+
+
+def test_request_revalidates_stale_videos_with_etag(fresh_cache):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"items": [{"id": "abc"}]}, headers={"ETag": '"v1"'})
+
+    fresh_cache.ttls["/videos"] = 0
+    youtube_client.startup(transport=httpx.MockTransport(handler))
+    try:
+        first = youtube_client.videos_list(id="abc")
+        second = youtube_client.videos_list(id="abc")
+    finally:
+        youtube_client.shutdown()
+
+    assert first == second == {"items": [{"id": "abc"}]}
+    assert "If-None-Match" not in seen[0].headers
+    assert seen[1].headers["If-None-Match"] == '"v1"'
+    report = youtube_client.quota_report()["/videos"]
+    assert report["calls"] == 2
+    assert report["revalidated"] == 1
+
+
+def test_stale_search_is_refetched_without_etag(fresh_cache):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"items": [], "etag": "e"})
+
+    fresh_cache.ttls["/search"] = 0
+    youtube_client.startup(transport=httpx.MockTransport(handler))
+    try:
+        youtube_client.search_list(q="a")
+        youtube_client.search_list(q="a")
+    finally:
+        youtube_client.shutdown()
+
+    assert len(seen) == 2
+    assert "If-None-Match" not in seen[1].headers